@@ -0,0 +1,151 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, PROCESSED_DIR, get_country_info, get_processed_path
+from multi_country.long_format import build_long_table, from_month_ordinal, melt_country
+from storage.cache import cached_call, print_cache_stats
+
+CUBE_FILE = os.path.join(PROCESSED_DIR, 'aggregate_cube.csv')
+
+# Finest grain of the cube; currency is constant per country but kept for display
+CUBE_KEYS = ['country_code', 'mkt_name', 'commodity', 'currency', 'month_ordinal']
+CUBE_MEASURES = ['count', 'sum', 'sum_sq', 'min', 'max']
+
+def build_cube(long_df):
+    """Aggregate a long price table to country/market/commodity/month cells
+
+    Each cell stores count, sum, sum of squares, min and max so means and
+    standard deviations can be rolled up to any coarser level.
+    """
+
+    prices = long_df['price_local'].astype('float64')
+    cells = long_df[CUBE_KEYS].assign(price=prices, price_sq=prices ** 2)
+
+    cube = cells.groupby(CUBE_KEYS, observed=True, sort=True).agg(
+        count=('price', 'count'),
+        sum=('price', 'sum'),
+        sum_sq=('price_sq', 'sum'),
+        min=('price', 'min'),
+        max=('price', 'max'),
+    ).reset_index()
+
+    for col in ['country_code', 'mkt_name', 'commodity', 'currency']:
+        cube[col] = cube[col].astype(str)
+    return cube
+
+def refresh_cube(cube, new_long_rows):
+    """Replace the cells covered by newly arrived rows, leaving the rest untouched"""
+
+    new_cells = build_cube(new_long_rows)
+    if cube is None or len(cube) == 0:
+        return new_cells
+
+    keys = ['country_code', 'mkt_name', 'commodity', 'month_ordinal']
+    stale = pd.MultiIndex.from_frame(cube[keys]).isin(pd.MultiIndex.from_frame(new_cells[keys]))
+    return pd.concat([cube[~stale], new_cells], ignore_index=True).sort_values(CUBE_KEYS, ignore_index=True)
+
+def load_cube(path=CUBE_FILE):
+    """Load a saved cube (None if it has not been built yet)"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype={'mkt_name': str, 'commodity': str, 'currency': str})
+
+def save_cube(cube, path=CUBE_FILE):
+    """Persist the cube next to the processed data"""
+    cube.to_csv(path, index=False)
+
+def refresh_saved_cube(df_clean_new, country, path=CUBE_FILE):
+    """Fold newly ingested cleaned rows into the saved cube, if there is one"""
+
+    cube = load_cube(path)
+    if cube is None:
+        return None
+    cube = refresh_cube(cube, melt_country(df_clean_new, country, price_dtype='float64'))
+    save_cube(cube, path)
+    return cube
+
+def rollup(cube, by):
+    """Roll cube cells up to the given dimensions
+
+    Returns count, mean, std (sample, like pandas), min and max per group.
+    'month' (1-12) and 'year' can be used as dimensions as well.
+    """
+
+    cells = cube
+    if 'month' in by or 'year' in by:
+        dates = from_month_ordinal(cube['month_ordinal'])
+        cells = cube.assign(month=dates.dt.month.to_numpy(), year=dates.dt.year.to_numpy())
+
+    totals = cells.groupby(list(by), observed=True)[CUBE_MEASURES].agg({
+        'count': 'sum', 'sum': 'sum', 'sum_sq': 'sum', 'min': 'min', 'max': 'max',
+    })
+
+    n = totals['count']
+    mean = totals['sum'] / n
+    # Sample variance from sums; clip tiny negative values from rounding
+    variance = ((totals['sum_sq'] - n * mean ** 2) / (n - 1)).clip(lower=0)
+
+    return pd.DataFrame({
+        'count': n,
+        'mean': mean,
+        'std': np.sqrt(variance.where(n > 1)),
+        'min': totals['min'],
+        'max': totals['max'],
+    })
+
+def market_summary_from_cube(cube, country, commodities):
+    """Per-market count/mean/std table in the layout of get_<country>_market_summary"""
+
+    iso3 = get_country_info(country)['iso3']
+    country_cells = cube[cube['country_code'] == iso3]
+
+    stats = rollup(country_cells, ['mkt_name', 'commodity'])[['count', 'mean', 'std']]
+    summary = stats.unstack('commodity').swaplevel(axis=1)
+    summary = summary.reindex(columns=pd.MultiIndex.from_product([commodities, ['count', 'mean', 'std']]))
+    count_cols = [(c, 'count') for c in commodities]
+    summary[count_cols] = summary[count_cols].fillna(0).astype('int64')
+    # Round before adding the date columns, which round() would warn about
+    summary = summary.round(2)
+
+    months = country_cells.groupby('mkt_name')['month_ordinal'].agg(['min', 'max'])
+    summary[('price_date', 'min')] = from_month_ordinal(months['min']).to_numpy()
+    summary[('price_date', 'max')] = from_month_ordinal(months['max']).to_numpy()
+
+    summary.index.name = 'mkt_name'
+    return summary
+
+def country_commodity_stats(cube, commodity):
+    """Average price, currency and observation count per country for one commodity"""
+
+    cells = cube[cube['commodity'] == commodity]
+    stats = rollup(cells, ['country_code', 'currency'])
+    return stats.reset_index().set_index('country_code')
+
+def build_cube_from_cleaned(fmt='csv'):
+    """Build the cube from every cleaned country"""
+    # Prices stay float64 here so cube means match the row-level pandas results
+    return build_cube(build_long_table(fmt=fmt, report=False, price_dtype='float64'))
+
+def cached_cube_from_cleaned(fmt='csv'):
+    """Build the cube, reusing the cached one when no cleaned CSV has changed"""
+    if fmt != 'csv':
+        return build_cube_from_cleaned(fmt)
+    inputs = [get_processed_path(c) for c in COUNTRY_REGISTRY if os.path.exists(get_processed_path(c))]
+    return cached_call(build_cube_from_cleaned, fmt, input_files=inputs)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the market x commodity x month aggregate cube")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    args = parser.parse_args()
+
+    cube = cached_cube_from_cleaned(args.format)
+    save_cube(cube)
+    print(f"Aggregate cube saved: {CUBE_FILE} ({len(cube):,} cells)")
+    print_cache_stats()
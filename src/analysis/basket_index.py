@@ -0,0 +1,357 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, PROCESSED_DIR, get_country_info
+from multi_country.long_format import ORDINAL_EPOCH_YEAR, melt_country
+from analysis.aggregate_cube import build_cube, cached_cube_from_cleaned
+from storage.columnar_store import load_cleaned_data
+from processing.rtfp_cleaner import parse_components
+
+BASKET_INDEX_FILE = os.path.join(PROCESSED_DIR, 'basket_index.csv')
+BASKET_STATE_FILE = os.path.join(PROCESSED_DIR, 'basket_state.npz')
+
+# Common cross-country staples basket: item -> quantity (in reference units)
+DEFAULT_BASKET = {'maize': 1.0, 'rice': 1.0, 'sorghum': 1.0}
+
+INDEX_BASE = 100.0
+
+MARKET_KEYS = ['country_code', 'mkt_name', 'currency']
+INDEX_COLUMNS = MARKET_KEYS + ['month', 'month_ordinal', 'basket_index', 'items']
+
+def weights_from_cleaned(df_clean, country):
+    """Weights table for one country, parsing each distinct components string once
+
+    When a country carries more than one version of the string the most
+    frequent wins for items listed in several.
+    """
+
+    counts = df_clean['components'].dropna().value_counts()
+    parts = [parse_components(text) for text in counts.index]
+    if not parts:
+        return pd.DataFrame(columns=['country_code', 'item', 'quantity', 'unit', 'index_weight'])
+    weights = pd.concat(parts, ignore_index=True).drop_duplicates('item', keep='first')
+    weights.insert(0, 'country_code', get_country_info(country)['iso3'])
+    return weights.reset_index(drop=True)
+
+def component_weights(countries=None, fmt='csv'):
+    """Weights table (country_code, item, quantity, unit, index_weight) for every country"""
+
+    if countries is None:
+        countries = list(COUNTRY_REGISTRY)
+
+    parts = []
+    for country in countries:
+        try:
+            df = load_cleaned_data(country, columns=['components'], fmt=fmt)
+        except FileNotFoundError:
+            print(f" Skipping {country}: no cleaned {fmt} data found")
+            continue
+        parts.append(weights_from_cleaned(df, country))
+    return pd.concat(parts, ignore_index=True)
+
+def basket_prices(cube, weights, basket):
+    """Dense market x month x item array of weight-normalised prices
+
+    Each cell mean is multiplied by the item's Index Weight, which converts
+    the per-pack price (e.g. a 50 KG bag) to the reference unit. Items
+    without a weight for a country are left out for it. Returns (markets,
+    first_month, prices).
+    """
+
+    items = list(basket)
+    cells = cube[cube['commodity'].isin(items)]
+    factor = weights.set_index(['country_code', 'item'])['index_weight']
+    cell_factor = factor.reindex(pd.MultiIndex.from_frame(cells[['country_code', 'commodity']])).to_numpy(
+        dtype='float64')
+    cells = cells[~np.isnan(cell_factor)]
+    cell_factor = cell_factor[~np.isnan(cell_factor)]
+
+    rows, uniques = pd.factorize(pd.MultiIndex.from_frame(cells[MARKET_KEYS]), sort=True)
+    month = cells['month_ordinal'].to_numpy()
+    first = int(month.min()) if len(month) else 0
+    item_pos = pd.Index(items).get_indexer(cells['commodity'])
+
+    n_months = int(month.max()) - first + 1 if len(month) else 0
+    prices = np.full((len(uniques), n_months, len(items)), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (cells['sum'] / cells['count']).to_numpy(dtype='float64') * cell_factor
+    prices[rows, month - first, item_pos] = np.where(mean > 0, mean, np.nan)
+
+    return uniques.to_frame(index=False, name=MARKET_KEYS), first, prices
+
+def chain_linked_index(prices, quantities, start_prices=None, start_index=None):
+    """Chain-linked basket index for every market at once, shape (markets, months)
+
+    Each observed month is linked to the previous one by the ratio of basket
+    costs over the items priced so far, each item at its own last observed
+    price (carried forward through the months it is missing), so items can
+    drop in and out without losing or double-counting their moves.
+    start_prices/start_index carry on from a previous run (each item's last
+    price and the index level); otherwise each market starts at INDEX_BASE.
+    Also returns the items priced per month and each item's last price.
+    """
+
+    n_markets, n_months, n_items = prices.shape
+    if start_prices is None:
+        start_prices = np.full((n_markets, n_items), np.nan)
+        start_index = np.full(n_markets, INDEX_BASE)
+
+    # Column 0 holds the carried-over state
+    prices = np.concatenate([start_prices[:, None, :], prices], axis=1)
+    present = ~np.isnan(prices)
+    observed = present.any(axis=2)
+
+    # Per item, the last month before each one in which it was priced
+    position = np.where(present, np.arange(n_months + 1)[None, :, None], -1)
+    last = np.maximum.accumulate(position, axis=1)
+    previous = np.concatenate([np.full((n_markets, 1, n_items), -1), last[:, :-1]], axis=1)
+
+    before = np.take_along_axis(prices, np.maximum(previous, 0), axis=1)
+    matched = previous >= 0
+    current = np.where(present, prices, before)
+
+    q = np.asarray(quantities, dtype='float64')
+    numerator = np.where(matched, current * q, 0.0).sum(axis=2)
+    denominator = np.where(matched, before * q, 0.0).sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        link = np.where(observed & (denominator > 0), numerator / denominator, 1.0)
+
+    index = start_index[:, None] * np.cumprod(link, axis=1)
+    index = np.where(observed, index, np.nan)
+    latest = np.take_along_axis(prices, np.maximum(last[:, -1:], 0), axis=1)[:, 0]
+    latest = np.where(last[:, -1] >= 0, latest, np.nan)
+    return index[:, 1:], present[:, 1:].sum(axis=2), latest
+
+class BasketIndexState:
+    """Where each market's basket index stands, so new months extend it
+
+    Per market (country, market, currency) it keeps the last month indexed,
+    the index level there and each item's last normalised price: enough to
+    chain-link the next month without the history. Index weights are kept
+    per country so incremental updates use the same ones.
+    """
+
+    def __init__(self, basket=DEFAULT_BASKET, weights=None):
+        self.items = list(basket)
+        self.quantities = np.array([basket[i] for i in self.items], dtype='float64')
+        self.weights = weights if weights is not None else pd.DataFrame(
+            columns=['country_code', 'item', 'index_weight'])
+        self.keys = []
+        self.position = {}
+        self.last_month = np.zeros(0, dtype='int64')
+        self.last_index = np.zeros(0)
+        self.last_prices = np.zeros((0, len(self.items)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def basket(self):
+        """The basket as {item: quantity}"""
+        return dict(zip(self.items, self.quantities.tolist()))
+
+    def add_weights(self, weights):
+        """Register index weights for countries not seen before"""
+        new = weights[~weights['country_code'].isin(self.weights['country_code'])]
+        if len(new):
+            self.weights = pd.concat([self.weights, new[['country_code', 'item', 'index_weight']]],
+                                     ignore_index=True)
+
+    def _positions(self, keys):
+        """State rows for market keys, adding rows for markets not seen before"""
+        new = [k for k in dict.fromkeys(keys) if k not in self.position]
+        if new:
+            for k in new:
+                self.position[k] = len(self.keys)
+                self.keys.append(k)
+            extra = len(new)
+            self.last_month = np.concatenate([self.last_month, np.full(extra, -1, dtype='int64')])
+            self.last_index = np.concatenate([self.last_index, np.full(extra, INDEX_BASE)])
+            self.last_prices = np.vstack([self.last_prices, np.full((extra, len(self.items)), np.nan)])
+        return np.fromiter((self.position[k] for k in keys), dtype='int64', count=len(keys))
+
+    def update(self, cube):
+        """Extend every market's index over the months in `cube` and return the new rows
+
+        Months at or before a market's last indexed month are ignored, so
+        overlapping input never rewrites history (rebuild to pick up revisions).
+        """
+
+        markets, first, prices = basket_prices(cube, self.weights, self.items)
+        if len(markets) == 0:
+            return pd.DataFrame(columns=INDEX_COLUMNS)
+
+        pos = self._positions(list(markets.itertuples(index=False, name=None)))
+        months = first + np.arange(prices.shape[1])
+        stale = months[None, :] <= self.last_month[pos][:, None]
+        prices[stale] = np.nan
+
+        index, items, latest_prices = chain_linked_index(prices, self.quantities, self.last_prices[pos],
+                                                         self.last_index[pos])
+
+        rows, cols = np.nonzero(~np.isnan(index))
+        if len(rows) == 0:
+            return pd.DataFrame(columns=INDEX_COLUMNS)
+
+        # The last indexed month per market becomes the new state
+        latest = np.zeros(len(pos), dtype='int64') - 1
+        np.maximum.at(latest, rows, cols)
+        moved = latest >= 0
+        self.last_month[pos[moved]] = months[latest[moved]]
+        self.last_index[pos[moved]] = index[moved, latest[moved]]
+        self.last_prices[pos] = latest_prices
+
+        month = months[cols]
+        result = markets.iloc[rows].reset_index(drop=True)
+        result['month'] = [f"{m // 12 + ORDINAL_EPOCH_YEAR:04d}-{m % 12 + 1:02d}" for m in month]
+        result['month_ordinal'] = month
+        result['basket_index'] = index[rows, cols]
+        result['items'] = items[rows, cols]
+        return result[INDEX_COLUMNS]
+
+    def save(self, path=BASKET_STATE_FILE):
+        """Persist the state atomically as a compressed .npz"""
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path, items=np.array(self.items, dtype=str), quantities=self.quantities,
+            keys=np.array(self.keys, dtype=str).reshape(-1, len(MARKET_KEYS)),
+            last_month=self.last_month, last_index=self.last_index, last_prices=self.last_prices,
+            weight_keys=self.weights[['country_code', 'item']].to_numpy(dtype=str).reshape(-1, 2),
+            weight_values=self.weights['index_weight'].to_numpy(dtype='float64'),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=BASKET_STATE_FILE):
+        """Load a saved state (None if there is none yet)"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            weights = pd.DataFrame(data['weight_keys'], columns=['country_code', 'item'])
+            weights['index_weight'] = data['weight_values']
+            state = cls(dict(zip(data['items'].tolist(), data['quantities'].tolist())), weights)
+            state.keys = [tuple(k) for k in data['keys'].tolist()]
+            state.position = {k: i for i, k in enumerate(state.keys)}
+            state.last_month, state.last_index = data['last_month'], data['last_index']
+            state.last_prices = data['last_prices']
+        return state
+
+def append_index_rows(rows, path=BASKET_INDEX_FILE):
+    """Append index rows to the saved basket index CSV"""
+    if len(rows):
+        rows.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+def load_basket_index(path=BASKET_INDEX_FILE):
+    """Load the saved basket index (None if it has not been built yet)"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype={'mkt_name': str})
+
+def update_saved_basket_index(df_clean_new, country, state_path=BASKET_STATE_FILE, index_path=BASKET_INDEX_FILE):
+    """Extend the saved basket index with newly ingested cleaned rows, if there is one"""
+
+    state = BasketIndexState.load(state_path)
+    if state is None:
+        return None
+    if 'components' in df_clean_new.columns:
+        state.add_weights(weights_from_cleaned(df_clean_new, country))
+    rows = state.update(build_cube(melt_country(df_clean_new, country, price_dtype='float64')))
+    state.save(state_path)
+    append_index_rows(rows, index_path)
+    return rows
+
+def run_basket_index(basket=DEFAULT_BASKET, fmt='csv', state_path=BASKET_STATE_FILE,
+                     index_path=BASKET_INDEX_FILE, rebuild=False):
+    """Bring the saved basket index up to date with the cleaned data
+
+    Markets only get their months after the last indexed one. A different
+    basket from the saved one, or --rebuild, starts the index over.
+    """
+
+    state = None if rebuild else BasketIndexState.load(state_path)
+    if state is not None and state.basket() != {k: float(v) for k, v in basket.items()}:
+        print(" Basket changed since the saved index; rebuilding")
+        state = None
+    if state is None:
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        state = BasketIndexState(basket)
+
+    state.add_weights(component_weights(fmt=fmt))
+    cube = cached_cube_from_cleaned(fmt)
+
+    start = time.perf_counter()
+    rows = state.update(cube)
+    elapsed = time.perf_counter() - start
+
+    state.save(state_path)
+    append_index_rows(rows, index_path)
+    print(f"Basket index: {len(state):,} markets, {len(rows):,} new market-months in {elapsed:.2f}s")
+    return rows
+
+def latest_index_summary(index):
+    """Latest basket index per country: median across markets and market count"""
+    latest = index.sort_values('month_ordinal').groupby(MARKET_KEYS).tail(1)
+    return latest.groupby('country_code').agg(
+        markets=('mkt_name', 'size'),
+        latest_month=('month', 'max'),
+        median_index=('basket_index', 'median'),
+        max_index=('basket_index', 'max'),
+    )
+
+def check_alternating_items():
+    """Self-check: items priced in alternate months must not drift the index
+
+    Maize falls 27.43 -> 9.14 across a rice-only month and then recovers;
+    rice is flat. The index must follow the basket cost back to where it
+    started, in one pass and when split across two incremental runs.
+    """
+
+    nan = np.nan
+    # months x (maize, rice), one market
+    prices = np.array([[27.43, 10.0], [nan, 10.0], [9.14, nan], [nan, 10.0], [11.43, nan], [27.43, 10.0]])
+    expected = INDEX_BASE * np.array([1.0, 1.0, 19.14 / 37.43, 19.14 / 37.43, 21.43 / 37.43, 1.0])
+    q = np.ones(2)
+
+    index, _, _ = chain_linked_index(prices[None], q)
+    split, _, carried = chain_linked_index(prices[None, :3], q)
+    rest, _, _ = chain_linked_index(prices[None, 3:], q, carried, split[:, -1])
+    resumed = np.concatenate([split, rest], axis=1)
+    return np.allclose(index[0], expected) and np.allclose(resumed[0], expected)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chain-linked custom basket price index per market")
+    parser.add_argument('--basket', nargs='+', default=list(DEFAULT_BASKET), help="Basket items")
+    parser.add_argument('--quantities', type=float, nargs='+',
+                        help="Quantity of each item in reference units (default 1 each)")
+    parser.add_argument('--rebuild', action='store_true', help="Recompute the whole history")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    parser.add_argument('--check', action='store_true', help="Run the chain-linking self-check and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        ok = check_alternating_items()
+        print(f"• Alternating items chain-link correctly: {ok}")
+        sys.exit(0 if ok else 1)
+
+    quantities = args.quantities or [1.0] * len(args.basket)
+    if len(quantities) != len(args.basket):
+        parser.error("--quantities needs one value per basket item")
+
+    run_basket_index(dict(zip(args.basket, quantities)), args.format, rebuild=args.rebuild)
+
+    index = load_basket_index()
+    if index is not None and len(index):
+        print(f"\n BASKET INDEX ({', '.join(args.basket)}; first month = {INDEX_BASE:.0f})")
+        print("=" * 40)
+        for iso3, row in latest_index_summary(index).iterrows():
+            print(f"• {iso3}: median {row['median_index']:.1f} across {row['markets']} markets "
+                  f"(max {row['max_index']:.1f}) as of {row['latest_month']}")
+        print(f"\nBasket index saved: {BASKET_INDEX_FILE}")
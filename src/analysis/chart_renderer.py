@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # headless: charts are only ever written to files
+import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import PROCESSED_DIR, get_country_info, get_country_name
+from multi_country.long_format import from_month_ordinal
+from analysis.aggregate_cube import cached_cube_from_cleaned
+
+CHART_DIR = os.path.join(PROCESSED_DIR, 'charts')
+RENDER_MANIFEST = os.path.join(CHART_DIR, 'render_manifest.json')
+
+DEFAULT_DPI = 150
+
+# Points per plotted line; longer series are reduced to per-bucket min/max
+MAX_POINTS = 120
+
+# Markets drawn individually on a commodity chart (the rest are in the band)
+TOP_MARKETS = 5
+BAR_MARKETS = 15
+
+# Bump when the drawing code changes so every chart is re-rendered
+RENDER_VERSION = 1
+
+def downsample(x, y, max_points=MAX_POINTS):
+    """Reduce a series to at most max_points, keeping each bucket's min and max
+
+    Peaks and troughs survive, which plain striding would drop.
+    """
+
+    x, y = np.asarray(x), np.asarray(y, dtype='float64')
+    if len(y) <= max_points:
+        return x, y
+
+    buckets = max(1, max_points // 2)
+    size = int(np.ceil(len(y) / buckets))
+    padded = np.pad(y, (0, buckets * size - len(y)), constant_values=np.nan).reshape(buckets, size)
+    valid = ~np.isnan(padded).all(axis=1)
+    offsets = np.arange(buckets)[valid] * size
+    lo = offsets + np.nanargmin(padded[valid], axis=1)
+    hi = offsets + np.nanargmax(padded[valid], axis=1)
+
+    keep = np.unique(np.concatenate([lo, hi]))
+    return x[keep], y[keep]
+
+def cell_prices(cube):
+    """Cube cells as (country_code, mkt_name, commodity, currency, month_ordinal, price) with mean prices"""
+    cells = cube[['country_code', 'mkt_name', 'commodity', 'currency', 'month_ordinal']].copy()
+    cells['price'] = (cube['sum'] / cube['count']).to_numpy(dtype='float64')
+    return cells
+
+def overview_table(cube):
+    """Per-country observations, markets and commodities plus registry region and population"""
+
+    table = cube.groupby('country_code').agg(
+        observations=('count', 'sum'),
+        markets=('mkt_name', 'nunique'),
+        commodities=('commodity', 'nunique'),
+    ).reset_index()
+    info = table['country_code'].map(get_country_info)
+    table['name'] = table['country_code'].map(get_country_name)
+    table['region'] = info.map(lambda i: i['region'])
+    table['population_millions'] = info.map(lambda i: i['population_millions'])
+    return table
+
+def chart_jobs(cube, countries=None, commodities=None):
+    """(name, kind, title, payload) for every chart: country x commodity, per-country and overview"""
+
+    cells = cell_prices(cube)
+    if countries is not None:
+        cells = cells[cells['country_code'].isin([get_country_info(c)['iso3'] for c in countries])]
+    if commodities is not None:
+        cells = cells[cells['commodity'].isin(commodities)]
+
+    jobs = []
+    for iso3, country_cells in cells.groupby('country_code', sort=True):
+        name = get_country_name(iso3)
+        for commodity, rows in country_cells.groupby('commodity', sort=True):
+            title = f"{name}: {commodity.replace('_', ' ')} ({rows['currency'].iloc[0]})"
+            jobs.append((f"{iso3.lower()}_{commodity}", 'commodity', title,
+                         rows[['mkt_name', 'month_ordinal', 'price']].reset_index(drop=True)))
+        jobs.append((f"{iso3.lower()}_overview", 'country', f"{name}: median price by commodity",
+                     country_cells[['commodity', 'month_ordinal', 'price']].reset_index(drop=True)))
+
+    jobs.append(('overview', 'overview', f"PricePulse: {cells['country_code'].nunique()}-Country Overview",
+                 overview_table(cube[cube['country_code'].isin(cells['country_code'].unique())])))
+    return jobs
+
+def data_hash(kind, title, payload, dpi, max_points):
+    """Hash of everything a chart is drawn from"""
+    h = hashlib.sha256(f"{RENDER_VERSION}|{kind}|{title}|{dpi}|{max_points}".encode())
+    h.update(pd.util.hash_pandas_object(payload, index=False).to_numpy().tobytes())
+    h.update(','.join(payload.columns).encode())
+    return h.hexdigest()
+
+def _dates(months):
+    return from_month_ordinal(pd.Series(months)).to_numpy()
+
+def _draw_commodity(fig, title, rows, max_points):
+    """Median and interquartile band across markets, the best-covered markets, and average by market"""
+
+    trend_ax, bar_ax = fig.subplots(1, 2, gridspec_kw={'width_ratios': [2, 1]})
+    by_month = rows.groupby('month_ordinal')['price']
+    months = np.array(sorted(rows['month_ordinal'].unique()))
+    q25, median, q75 = (by_month.quantile(q).reindex(months).to_numpy() for q in (0.25, 0.5, 0.75))
+
+    x, y = downsample(_dates(months), median, max_points)
+    trend_ax.fill_between(_dates(months), q25, q75, alpha=0.2, label='Interquartile range')
+    trend_ax.plot(x, y, color='black', linewidth=2, label='Median')
+
+    top = rows['mkt_name'].value_counts().head(TOP_MARKETS).index
+    for market in top:
+        series = rows[rows['mkt_name'] == market].sort_values('month_ordinal')
+        x, y = downsample(_dates(series['month_ordinal']), series['price'], max_points)
+        trend_ax.plot(x, y, linewidth=0.8, alpha=0.7, label=market)
+    trend_ax.set_title(title)
+    trend_ax.set_ylabel('Price')
+    trend_ax.legend(fontsize=7)
+    trend_ax.tick_params(axis='x', rotation=45)
+
+    avg = rows.groupby('mkt_name')['price'].mean().sort_values().tail(BAR_MARKETS)
+    bar_ax.barh(range(len(avg)), avg.to_numpy())
+    bar_ax.set_yticks(range(len(avg)), avg.index, fontsize=7)
+    bar_ax.set_title("Average price by market" if len(avg) < BAR_MARKETS else
+                     f"Average price, top {BAR_MARKETS} markets")
+
+def _draw_country(fig, title, rows, max_points):
+    """National median of each commodity, indexed to its first year = 100"""
+
+    ax = fig.subplots()
+    medians = rows.groupby(['commodity', 'month_ordinal'])['price'].median()
+    for commodity, series in medians.groupby(level='commodity'):
+        series = series.droplevel('commodity')
+        base = series.iloc[:12].mean()
+        x, y = downsample(_dates(series.index), series.to_numpy() / base * 100, max_points)
+        ax.plot(x, y, linewidth=1, label=commodity.replace('_', ' '))
+    ax.axhline(100, color='grey', linewidth=0.5)
+    ax.set_title(title)
+    ax.set_ylabel('Index (first year = 100)')
+    ax.legend(fontsize=7, ncol=2)
+
+def _draw_overview(fig, title, table, max_points):
+    """The 2x2 multi-country overview: observations, regions, markets and population"""
+
+    axes = fig.subplots(2, 2)
+    fig.suptitle(title, fontsize=16, fontweight='bold')
+    table = table.sort_values('observations', ascending=False)
+    regions = table.groupby('region').agg(observations=('observations', 'sum'),
+                                          population=('population_millions', 'sum'))
+
+    axes[0, 0].bar(table['name'], table['observations'])
+    axes[0, 0].set_title('Observations by Country')
+    axes[0, 0].tick_params(axis='x', rotation=45)
+    axes[0, 1].pie(regions['observations'], labels=regions.index, autopct='%1.1f%%')
+    axes[0, 1].set_title('Regional Distribution')
+    by_name = table.sort_values('name')
+    axes[1, 0].bar(by_name['name'], by_name['markets'])
+    axes[1, 0].set_title('Markets by Country')
+    axes[1, 0].tick_params(axis='x', rotation=45)
+    axes[1, 1].bar(regions.index, regions['population'])
+    axes[1, 1].set_title('Population Coverage by Region (Millions)')
+    axes[1, 1].tick_params(axis='x', rotation=45)
+
+DRAWERS = {
+    'commodity': (_draw_commodity, (14, 6)),
+    'country': (_draw_country, (12, 6)),
+    'overview': (_draw_overview, (16, 12)),
+}
+
+def render_chart(name, kind, title, payload, chart_dir=CHART_DIR, dpi=DEFAULT_DPI, max_points=MAX_POINTS):
+    """Draw one chart to <chart_dir>/<name>.png (runs in a worker process)"""
+
+    start = time.perf_counter()
+    draw, size = DRAWERS[kind]
+    fig = plt.figure(figsize=size)
+    try:
+        draw(fig, title, payload, max_points)
+        fig.tight_layout()
+        path = os.path.join(chart_dir, f"{name}.png")
+        fig.savefig(path, dpi=dpi)
+    finally:
+        plt.close(fig)
+    return name, time.perf_counter() - start
+
+def load_manifest(path=RENDER_MANIFEST):
+    """Data hash of every chart rendered so far"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, path=RENDER_MANIFEST):
+    """Write the manifest atomically"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def render_all(countries=None, commodities=None, fmt='csv', workers=None, dpi=DEFAULT_DPI,
+               max_points=MAX_POINTS, force=False, chart_dir=CHART_DIR):
+    """Render every chart whose data changed since the last run, across a process pool
+
+    Returns (rendered, skipped) chart names.
+    """
+
+    os.makedirs(chart_dir, exist_ok=True)
+    manifest_path = os.path.join(chart_dir, os.path.basename(RENDER_MANIFEST))
+    manifest = {} if force else load_manifest(manifest_path)
+
+    pending, skipped = [], []
+    for name, kind, title, payload in chart_jobs(cached_cube_from_cleaned(fmt), countries, commodities):
+        digest = data_hash(kind, title, payload, dpi, max_points)
+        if manifest.get(name) == digest and os.path.exists(os.path.join(chart_dir, f"{name}.png")):
+            skipped.append(name)
+        else:
+            pending.append((digest, (name, kind, title, payload, chart_dir, dpi, max_points)))
+
+    rendered = []
+    try:
+        if workers == 1 or len(pending) <= 1:
+            for digest, job in pending:
+                render_chart(*job)
+                manifest[job[0]] = digest
+                rendered.append(job[0])
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(render_chart, *job): (digest, job[0]) for digest, job in pending}
+                for future in as_completed(futures):
+                    digest, name = futures[future]
+                    future.result()
+                    manifest[name] = digest
+                    rendered.append(name)
+    finally:
+        # Charts finished before a failure are not redrawn next time
+        save_manifest(manifest, manifest_path)
+
+    return sorted(rendered), skipped
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render all PricePulse charts headlessly")
+    parser.add_argument('--countries', nargs='*', help="Default: every country in the registry")
+    parser.add_argument('--commodities', nargs='*', help="Default: every commodity")
+    parser.add_argument('--workers', type=int, default=None, help="Render processes (default: one per core)")
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI)
+    parser.add_argument('--max-points', type=int, default=MAX_POINTS, help="Points per line after downsampling")
+    parser.add_argument('--force', action='store_true', help="Re-render charts whose data did not change")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rendered, skipped = render_all(args.countries, args.commodities, args.format, args.workers,
+                                   args.dpi, args.max_points, args.force)
+    print(f"Rendered {len(rendered)} charts, {len(skipped)} unchanged, "
+          f"in {time.perf_counter() - start:.1f}s: {CHART_DIR}")
@@ -0,0 +1,305 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, PROCESSED_DIR, get_country_info
+from multi_country.long_format import ORDINAL_EPOCH_YEAR, to_month_ordinal
+from storage.columnar_store import load_cleaned_data
+
+ALERT_STATE_FILE = os.path.join(PROCESSED_DIR, 'alert_state.npz')
+ALERTS_FILE = os.path.join(PROCESSED_DIR, 'price_alerts.csv')
+
+# Observations a series needs before z-score and percentile alerts fire
+MIN_HISTORY = 12
+
+# Months kept per series for the rolling percentile
+WINDOW_MONTHS = 24
+
+Z_THRESHOLD = 3.0
+EWMA_ALPHA = 0.2
+MOM_JUMP_THRESHOLD = 0.25         # +25% on the previous month
+PERCENTILE = 95
+INFLATION_THRESHOLD = 50.0        # inflation_<commodity> is year-on-year %
+
+ALERT_COLUMNS = ['country_code', 'mkt_name', 'commodity', 'month', 'price', 'alert', 'value', 'threshold']
+
+def observations_from_cleaned(df_clean, country):
+    """Long rows (country_code, mkt_name, commodity, month_ordinal, price, inflation) from a cleaned frame"""
+
+    iso3 = get_country_info(country)['iso3']
+    commodities = [c for c in get_country_info(country)['commodities'] if c in df_clean.columns]
+    months = to_month_ordinal(df_clean['price_date']).to_numpy()
+
+    parts = []
+    for commodity in commodities:
+        price = df_clean[commodity].to_numpy(dtype='float64')
+        inflation_col = f'inflation_{commodity}'
+        inflation = (df_clean[inflation_col].to_numpy(dtype='float64') if inflation_col in df_clean.columns
+                     else np.full(len(df_clean), np.nan))
+        keep = ~np.isnan(price) & (price > 0)
+        parts.append(pd.DataFrame({
+            'country_code': iso3,
+            'mkt_name': df_clean['mkt_name'].astype(str).to_numpy()[keep],
+            'commodity': commodity,
+            'month_ordinal': months[keep],
+            'price': price[keep],
+            'inflation': inflation[keep],
+        }))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+class AlertState:
+    """Per-series running statistics, stored as parallel arrays (one row per series)
+
+    Each series (country, market, commodity) keeps a Welford mean/variance and
+    an EWMA mean/variance of log prices, the last month and price seen, and a
+    ring buffer of the last WINDOW_MONTHS log prices for percentiles. A new
+    month touches only the rows of the series observed in it.
+    """
+
+    FLOAT_FIELDS = ['mean', 'm2', 'ewma', 'ewm_var', 'last_price']
+
+    def __init__(self, window=WINDOW_MONTHS):
+        self.window_months = window
+        self.keys = []
+        self.position = {}
+        self.n = np.zeros(0, dtype='int64')
+        self.last_month = np.zeros(0, dtype='int64')
+        for field in self.FLOAT_FIELDS:
+            setattr(self, field, np.zeros(0))
+        self.window = np.zeros((0, window))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _positions(self, keys):
+        """State rows for series keys, adding rows for series not seen before"""
+        new = [k for k in dict.fromkeys(keys) if k not in self.position]
+        if new:
+            for k in new:
+                self.position[k] = len(self.keys)
+                self.keys.append(k)
+            extra = len(new)
+            self.n = np.concatenate([self.n, np.zeros(extra, dtype='int64')])
+            self.last_month = np.concatenate([self.last_month, np.full(extra, -1, dtype='int64')])
+            for field in self.FLOAT_FIELDS:
+                setattr(self, field, np.concatenate([getattr(self, field), np.zeros(extra)]))
+            self.window = np.vstack([self.window, np.full((extra, self.window_months), np.nan)])
+        return np.fromiter((self.position[k] for k in keys), dtype='int64', count=len(keys))
+
+    def update(self, observations, inflation_threshold=INFLATION_THRESHOLD):
+        """Fold observations in month order and return the alerts they trigger
+
+        Rows for a month a series has already passed are ignored, so feeding
+        overlapping data never double-counts or recomputes history.
+        """
+
+        if observations is None or len(observations) == 0:
+            return pd.DataFrame(columns=ALERT_COLUMNS)
+
+        alerts = []
+        for month, rows in observations.groupby('month_ordinal', sort=True):
+            rows = rows.drop_duplicates(['country_code', 'mkt_name', 'commodity'], keep='last')
+            keys = list(zip(rows['country_code'], rows['mkt_name'], rows['commodity']))
+            pos = self._positions(keys)
+
+            fresh = self.last_month[pos] < month
+            if not fresh.any():
+                continue
+            rows, pos = rows[fresh], pos[fresh]
+            alerts.append(self._evaluate(int(month), rows, pos, inflation_threshold))
+            self._fold(int(month), rows['price'].to_numpy(dtype='float64'), pos)
+
+        alerts = [a for a in alerts if len(a)]
+        return pd.concat(alerts, ignore_index=True) if alerts else pd.DataFrame(columns=ALERT_COLUMNS)
+
+    def _evaluate(self, month, rows, pos, inflation_threshold):
+        """Alerts for one month, judged against the state before it is folded in"""
+
+        price = rows['price'].to_numpy(dtype='float64')
+        x = np.log(price)
+        n = self.n[pos]
+        established = n >= MIN_HISTORY
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2[pos] / (n - 1))
+            zscore = (x - self.mean[pos]) / std
+            ewma_z = (x - self.ewma[pos]) / np.sqrt(self.ewm_var[pos])
+            mom = price / self.last_price[pos] - 1
+        previous_month = self.last_month[pos] == month - 1
+
+        upper = np.full(len(pos), np.nan)
+        if established.any():
+            upper[established] = np.nanpercentile(self.window[pos[established]], PERCENTILE, axis=1)
+
+        checks = [
+            ('zscore_spike', zscore, established & (zscore > Z_THRESHOLD), Z_THRESHOLD),
+            ('ewma_spike', ewma_z, established & (ewma_z > Z_THRESHOLD), Z_THRESHOLD),
+            ('mom_jump', mom, previous_month & (mom > MOM_JUMP_THRESHOLD), MOM_JUMP_THRESHOLD),
+            (f'above_p{PERCENTILE}', price / np.exp(upper), established & (x > upper), 1.0),
+        ]
+        inflation = rows['inflation'].to_numpy(dtype='float64')
+        checks.append(('inflation_breach', inflation, inflation > inflation_threshold, inflation_threshold))
+
+        label = f"{month // 12 + ORDINAL_EPOCH_YEAR:04d}-{month % 12 + 1:02d}"
+        found = []
+        for name, value, fired, threshold in checks:
+            if fired.any():
+                found.append(pd.DataFrame({
+                    'country_code': rows['country_code'].to_numpy()[fired],
+                    'mkt_name': rows['mkt_name'].to_numpy()[fired],
+                    'commodity': rows['commodity'].to_numpy()[fired],
+                    'month': label,
+                    'price': price[fired],
+                    'alert': name,
+                    'value': value[fired],
+                    'threshold': threshold,
+                }))
+        return pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=ALERT_COLUMNS)
+
+    def _fold(self, month, price, pos):
+        """Welford, EWMA and ring-buffer updates for one month's observations"""
+
+        x = np.log(price)
+        first = self.n[pos] == 0
+
+        # Welford running mean / sum of squared deviations
+        n = self.n[pos] + 1
+        delta = x - self.mean[pos]
+        mean = self.mean[pos] + delta / n
+        self.m2[pos] += delta * (x - mean)
+        self.mean[pos] = mean
+
+        # Exponentially weighted mean / variance; the first value seeds the mean
+        diff = x - self.ewma[pos]
+        incr = EWMA_ALPHA * diff
+        self.ewm_var[pos] = np.where(first, 0.0, (1 - EWMA_ALPHA) * (self.ewm_var[pos] + diff * incr))
+        self.ewma[pos] = np.where(first, x, self.ewma[pos] + incr)
+
+        self.window[pos, self.n[pos] % self.window_months] = x
+        self.n[pos] = n
+        self.last_month[pos] = month
+        self.last_price[pos] = price
+
+    def last_months(self):
+        """Latest month folded in per country (month ordinal)"""
+        if not self.keys:
+            return {}
+        countries = np.array([k[0] for k in self.keys])
+        return {c: int(self.last_month[countries == c].max()) for c in np.unique(countries)}
+
+    def save(self, path=ALERT_STATE_FILE):
+        """Persist the state atomically as a compressed .npz"""
+        keys = np.array(self.keys, dtype=str).reshape(-1, 3)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path, keys=keys, n=self.n, last_month=self.last_month, window=self.window,
+            **{field: getattr(self, field) for field in self.FLOAT_FIELDS},
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=ALERT_STATE_FILE):
+        """Load a saved state (None if there is none yet)"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            state = cls(window=data['window'].shape[1])
+            state.keys = [tuple(k) for k in data['keys'].tolist()]
+            state.position = {k: i for i, k in enumerate(state.keys)}
+            state.n, state.last_month, state.window = data['n'], data['last_month'], data['window']
+            for field in cls.FLOAT_FIELDS:
+                setattr(state, field, data[field])
+        return state
+
+def append_alerts(alerts, path=ALERTS_FILE):
+    """Append alerts to the alert log CSV"""
+    if len(alerts):
+        alerts[ALERT_COLUMNS].to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+def update_saved_alerts(df_clean_new, country, state_path=ALERT_STATE_FILE, alerts_path=ALERTS_FILE):
+    """Evaluate newly ingested cleaned rows against the saved state, if there is one"""
+
+    state = AlertState.load(state_path)
+    if state is None:
+        return None
+    alerts = state.update(observations_from_cleaned(df_clean_new, country))
+    state.save(state_path)
+    append_alerts(alerts, alerts_path)
+    return alerts
+
+def run_alerts(countries=None, fmt='csv', state_path=ALERT_STATE_FILE, alerts_path=ALERTS_FILE,
+               rebuild=False):
+    """Catch the saved state up with the cleaned data and log the alerts raised
+
+    Only years from each country's last processed month onward are read; a
+    rebuild starts from an empty state.
+    """
+
+    state = None if rebuild else AlertState.load(state_path)
+    state = state or AlertState()
+    seen = state.last_months()
+
+    if countries is None:
+        countries = list(COUNTRY_REGISTRY)
+
+    parts = []
+    for country in countries:
+        iso3 = get_country_info(country)['iso3']
+        years = None
+        if iso3 in seen:
+            first_year = seen[iso3] // 12 + ORDINAL_EPOCH_YEAR
+            years = range(first_year, pd.Timestamp.now().year + 2)
+        try:
+            df = load_cleaned_data(country, years=years, fmt=fmt)
+        except FileNotFoundError:
+            print(f" Skipping {country}: no cleaned {fmt} data found")
+            continue
+        parts.append(observations_from_cleaned(df, country))
+
+    observations = pd.concat(parts, ignore_index=True) if parts else None
+    start = time.perf_counter()
+    months = 0 if observations is None else observations['month_ordinal'].nunique()
+    alerts = state.update(observations)
+    elapsed = time.perf_counter() - start
+
+    state.save(state_path)
+    if rebuild and os.path.exists(alerts_path):
+        os.remove(alerts_path)
+    append_alerts(alerts, alerts_path)
+
+    print(f"Alert state: {len(state):,} series, {months} months evaluated in {elapsed:.2f}s "
+          f"({elapsed / max(months, 1) * 1000:.1f} ms/month), {len(alerts):,} alerts")
+    return alerts
+
+def print_alert_summary(alerts, last=1):
+    """Print the alerts of the latest months"""
+
+    if len(alerts) == 0:
+        print("No new alerts")
+        return
+    recent = sorted(alerts['month'].unique())[-last:]
+    for month in recent:
+        rows = alerts[alerts['month'] == month]
+        print(f"\n PRICE ALERTS {month} ({len(rows)})")
+        print("=" * 40)
+        for (iso3, market, commodity), group in rows.groupby(['country_code', 'mkt_name', 'commodity']):
+            kinds = ', '.join(sorted(group['alert']))
+            print(f"• {market} ({iso3}) {commodity}: {group['price'].iloc[0]:,.2f} - {kinds}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental price anomaly alerts per market x commodity")
+    parser.add_argument('--countries', nargs='*', help="Default: every country in the registry")
+    parser.add_argument('--rebuild', action='store_true', help="Start from an empty state")
+    parser.add_argument('--show-months', type=int, default=1, help="Recent months to print")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    args = parser.parse_args()
+
+    alerts = run_alerts(args.countries, args.format, rebuild=args.rebuild)
+    print_alert_summary(alerts, args.show_months)
@@ -0,0 +1,274 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import PROCESSED_DIR
+from analysis.aggregate_cube import cached_cube_from_cleaned
+from analysis.spatial_index import MarketIndex, haversine
+from storage.cache import print_cache_stats
+
+INTEGRATION_FILE = os.path.join(PROCESSED_DIR, 'market_integration.csv')
+
+# Markets per block in the all-pairs path; memory grows with block x markets x months
+DEFAULT_BLOCK_SIZE = 256
+
+# Pairs per block when only a list of pairs (e.g. within a radius) is computed
+PAIR_BLOCK_SIZE = 20_000
+
+# Months two markets must share before their correlation is reported
+DEFAULT_MIN_OVERLAP = 12
+
+DEFAULT_MAX_LAG = 3
+
+def price_matrix(cube, commodity):
+    """Pivot one commodity into a markets x months matrix of mean prices
+
+    Returns (markets, months, prices): a frame of country_code/mkt_name/currency
+    per row, the month ordinals of the columns (every month in the range, so
+    gaps stay visible) and the float64 price matrix with NaN for missing months.
+    A commodity that is not in the cube gives no markets and no months.
+    """
+
+    cells = cube[cube['commodity'] == commodity]
+    if cells.empty:
+        return pd.DataFrame(columns=['country_code', 'mkt_name', 'currency']), np.arange(0), np.empty((0, 0))
+    keys = cells[['country_code', 'mkt_name']]
+    rows, uniques = pd.factorize(pd.MultiIndex.from_frame(keys), sort=True)
+
+    first, last = cells['month_ordinal'].min(), cells['month_ordinal'].max()
+    months = np.arange(first, last + 1)
+    prices = np.full((len(uniques), len(months)), np.nan)
+    prices[rows, cells['month_ordinal'].to_numpy() - first] = (cells['sum'] / cells['count']).to_numpy()
+
+    markets = uniques.to_frame(index=False, name=['country_code', 'mkt_name'])
+    currency = cells.groupby(['country_code', 'mkt_name'])['currency'].first()
+    markets['currency'] = currency.reindex(pd.MultiIndex.from_frame(markets)).to_numpy()
+    return markets, months, prices
+
+def log_returns(log_prices):
+    """Month-over-month log returns; NaN unless both months are observed"""
+    returns = np.full_like(log_prices, np.nan)
+    returns[:, 1:] = log_prices[:, 1:] - log_prices[:, :-1]
+    return returns
+
+def _shift(values, lag):
+    """Align values[:, t + lag] with month t (NaN past the ends)"""
+    if lag == 0:
+        return values
+    shifted = np.full_like(values, np.nan)
+    if lag > 0:
+        shifted[:, :-lag] = values[:, lag:]
+    else:
+        shifted[:, -lag:] = values[:, :lag]
+    return shifted
+
+def _pairwise_sums(a, b, paired):
+    """Sums over months observed in both series, for every (a row, b row) combination
+
+    With paired=True, a and b have the same number of rows and only row i of a
+    is matched with row i of b. Missing months are NaN and drop out pairwise.
+    """
+
+    mask_a, mask_b = ~np.isnan(a), ~np.isnan(b)
+    xa, xb = np.where(mask_a, a, 0.0), np.where(mask_b, b, 0.0)
+    ma, mb = mask_a.astype('float64'), mask_b.astype('float64')
+
+    if paired:
+        dot = lambda p, q: np.einsum('pt,pt->p', p, q)
+    else:
+        dot = lambda p, q: p @ q.T
+
+    return {
+        'n': dot(ma, mb),
+        'sx': dot(xa, mb),
+        'sy': dot(ma, xb),
+        'sxx': dot(xa * xa, mb),
+        'syy': dot(ma, xb * xb),
+        'sxy': dot(xa, xb),
+    }
+
+def _correlation(s, min_overlap):
+    """Pearson correlation from pairwise sums, NaN with too little overlap or no variance"""
+    n = s['n']
+    cov = n * s['sxy'] - s['sx'] * s['sy']
+    var = (n * s['sxx'] - s['sx'] ** 2) * (n * s['syy'] - s['sy'] ** 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = cov / np.sqrt(var)
+    return np.where((n >= min_overlap) & (var > 1e-18), np.clip(r, -1, 1), np.nan)
+
+def _pair_metrics(log_a, log_b, ret_a, ret_b, paired, max_lag, min_overlap):
+    """Correlations, spreads and lead/lag for two blocks of markets"""
+
+    levels = _pairwise_sums(log_a, log_b, paired)
+    returns = _pairwise_sums(ret_a, ret_b, paired)
+
+    lag_corrs = np.stack([
+        _correlation(_pairwise_sums(ret_a, _shift(ret_b, lag), paired), min_overlap)
+        for lag in range(-max_lag, max_lag + 1)
+    ])
+    has_lag = ~np.isnan(lag_corrs).all(axis=0)
+    best = np.argmax(np.where(np.isnan(lag_corrs), -np.inf, lag_corrs), axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        spread = (levels['sx'] - levels['sy']) / levels['n']
+
+    return {
+        'overlap_months': levels['n'].astype('int64'),
+        'price_corr': _correlation(levels, min_overlap),
+        'return_corr': _correlation(returns, min_overlap),
+        'mean_log_spread': np.where(levels['n'] >= min_overlap, spread, np.nan),
+        'best_lag': np.where(has_lag, best - max_lag, 0),
+        'lag_corr': np.where(has_lag, np.take_along_axis(lag_corrs, best[None], axis=0)[0], np.nan),
+    }
+
+def _all_pairs(log_prices, returns, max_lag, min_overlap, block_size):
+    """Metrics for every market pair i < j, computed block by block"""
+
+    n = len(log_prices)
+    parts = []
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        metrics = _pair_metrics(log_prices[start:stop], log_prices[start:], returns[start:stop], returns[start:],
+                                paired=False, max_lag=max_lag, min_overlap=min_overlap)
+        i, j = np.nonzero(np.arange(start, stop)[:, None] < np.arange(start, n)[None, :])
+        keep = metrics['overlap_months'][i, j] >= min_overlap
+        i, j = i[keep], j[keep]
+        parts.append({'a': i + start, 'b': j + start, **{k: v[i, j] for k, v in metrics.items()}})
+    return parts
+
+def _listed_pairs(log_prices, returns, pairs_a, pairs_b, max_lag, min_overlap):
+    """Metrics for an explicit list of pairs, gathered in blocks"""
+
+    parts = []
+    for start in range(0, len(pairs_a), PAIR_BLOCK_SIZE):
+        a, b = pairs_a[start:start + PAIR_BLOCK_SIZE], pairs_b[start:start + PAIR_BLOCK_SIZE]
+        metrics = _pair_metrics(log_prices[a], log_prices[b], returns[a], returns[b],
+                                paired=True, max_lag=max_lag, min_overlap=min_overlap)
+        keep = metrics['overlap_months'] >= min_overlap
+        parts.append({'a': a[keep], 'b': b[keep], **{k: v[keep] for k, v in metrics.items()}})
+    return parts
+
+def integration_pairs(cube, commodity, index=None, radius_km=None, max_lag=DEFAULT_MAX_LAG,
+                      min_overlap=DEFAULT_MIN_OVERLAP, block_size=DEFAULT_BLOCK_SIZE):
+    """Price and return correlation, spread and lead/lag for market pairs of one commodity
+
+    Every pair is computed unless radius_km is given, in which case only pairs
+    within that distance (from the spatial index) are. mean_log_spread is
+    mean(log price a - log price b) and is only reported within a currency.
+    best_lag > 0 means market a's returns lead market b's by that many months.
+    """
+
+    markets, months, prices = price_matrix(cube, commodity)
+    if markets.empty:
+        return pd.DataFrame()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_prices = np.log(np.where(prices > 0, prices, np.nan))
+    returns = log_returns(log_prices)
+
+    located = None
+    if index is not None or radius_km is not None:
+        index = index if index is not None else MarketIndex.from_cleaned()
+        positions = index.markets.reset_index().set_index(['country_code', 'mkt_name'])['index']
+        keys = pd.MultiIndex.from_frame(markets[['country_code', 'mkt_name']])
+        located = positions.reindex(keys).to_numpy(dtype='float64')
+
+    if radius_km is None:
+        parts = _all_pairs(log_prices, returns, max_lag, min_overlap, block_size)
+    else:
+        # Map spatial-index pairs back to matrix rows, dropping markets without this commodity
+        valid = ~np.isnan(located)
+        row_of = pd.Series(np.arange(len(markets))[valid], index=located[valid].astype('int64'))
+        close = index.pairs_within(radius_km)
+        a = row_of.reindex(close['market']).to_numpy()
+        b = row_of.reindex(close['neighbour']).to_numpy()
+        both = ~(np.isnan(a) | np.isnan(b))
+        a, b = a[both].astype('int64'), b[both].astype('int64')
+        a, b = np.minimum(a, b), np.maximum(a, b)
+        parts = _listed_pairs(log_prices, returns, a, b, max_lag, min_overlap)
+
+    columns = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]} if parts else {}
+    if not columns or not len(columns['a']):
+        return pd.DataFrame()
+    a, b = columns.pop('a'), columns.pop('b')
+
+    result = pd.DataFrame({
+        'commodity': commodity,
+        'country_a': markets['country_code'].to_numpy()[a],
+        'market_a': markets['mkt_name'].to_numpy()[a],
+        'country_b': markets['country_code'].to_numpy()[b],
+        'market_b': markets['mkt_name'].to_numpy()[b],
+        **columns,
+    })
+    same_currency = markets['currency'].to_numpy()[a] == markets['currency'].to_numpy()[b]
+    result['mean_log_spread'] = result['mean_log_spread'].where(same_currency)
+
+    if located is not None:
+        pos_a, pos_b = located[a], located[b]
+        known = ~(np.isnan(pos_a) | np.isnan(pos_b))
+        distance = np.full(len(result), np.nan)
+        pa, pb = pos_a[known].astype('int64'), pos_b[known].astype('int64')
+        distance[known] = haversine(index.lat[pa], index.lon[pa], index.lat[pb], index.lon[pb])
+        result['distance_km'] = distance
+
+    return result
+
+def market_integration(cube, commodities=None, **kwargs):
+    """integration_pairs for several commodities (default: all in the cube), stacked"""
+    if commodities is None:
+        commodities = sorted(cube['commodity'].unique())
+    available = set(cube['commodity'].unique())
+    for commodity in commodities:
+        if commodity not in available:
+            print(f" Skipping {commodity}: not in the aggregate cube")
+    parts = [integration_pairs(cube, c, **kwargs) for c in commodities if c in available]
+    parts = [p for p in parts if len(p)]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def print_integration_summary(pairs):
+    """Print the most integrated cross-border market pairs per commodity"""
+
+    print(f"\n MARKET INTEGRATION SUMMARY")
+    print("=" * 40)
+    if pairs.empty:
+        print("No market pairs with enough overlapping months")
+        return
+    for commodity, rows in pairs.groupby('commodity'):
+        within = rows[rows['country_a'] == rows['country_b']]
+        cross = rows[(rows['country_a'] != rows['country_b']) & rows['return_corr'].notna()]
+        print(f"\n{commodity.upper()}: {len(rows):,} pairs, median return correlation "
+              f"{within['return_corr'].median():.2f} within countries"
+              + (f", {cross['return_corr'].median():.2f} across borders" if len(cross) else ""))
+        for _, row in cross.nlargest(3, 'return_corr').iterrows():
+            distance = f", {row['distance_km']:.0f}km" if 'distance_km' in row and pd.notna(row['distance_km']) else ""
+            print(f"• {row['market_a']} ({row['country_a']}) - {row['market_b']} ({row['country_b']}): "
+                  f"r = {row['return_corr']:.2f}, best lag {row['best_lag']:+d} months{distance}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pairwise market integration (correlation, spread, lead/lag)")
+    parser.add_argument('--commodities', nargs='*', help="Default: every commodity in the cube")
+    parser.add_argument('--radius', type=float, help="Only pairs within this many km")
+    parser.add_argument('--max-lag', type=int, default=DEFAULT_MAX_LAG)
+    parser.add_argument('--min-overlap', type=int, default=DEFAULT_MIN_OVERLAP)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    parser.add_argument('--output', default=INTEGRATION_FILE)
+    args = parser.parse_args()
+
+    cube = cached_cube_from_cleaned(args.format)
+    index = MarketIndex.from_cleaned(fmt=args.format)
+
+    start = time.perf_counter()
+    pairs = market_integration(cube, args.commodities, index=index, radius_km=args.radius,
+                               max_lag=args.max_lag, min_overlap=args.min_overlap)
+    print(f"Computed {len(pairs):,} market pairs in {time.perf_counter() - start:.2f}s")
+
+    print_integration_summary(pairs)
+    pairs.round(4).to_csv(args.output, index=False)
+    print(f"\nMarket integration table saved: {args.output}")
+    print_cache_stats()
@@ -1,13 +1,24 @@
+import os
+import sys
+
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
 
-def load_clean_data():
-    """Load the cleaned data"""
-    return pd.read_csv('../../data_sources/processed/kenya_prices_clean.csv')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import PROCESSED_DIR
+from storage.columnar_store import load_cleaned_data
+from analysis.aggregate_cube import cached_cube_from_cleaned, rollup
+from analysis.spatial_index import MarketIndex
+from analysis.seasonality import cached_seasonal_profiles
+from analysis.volatility import load_ohlc, volatility_ranking
+from monitoring.telemetry import instrumented
 
+@instrumented
+def load_clean_data(columns=None, years=None, fmt='csv'):
+    """Load the cleaned Kenya data, optionally only some columns and years"""
+    return load_cleaned_data('Kenya', columns=columns, years=years, fmt=fmt)
+
+@instrumented
 def analyze_price_trends(df):
     """Analyze price trends over time"""
     
@@ -22,9 +33,15 @@ def analyze_price_trends(df):
     
     return maize_data
 
+@instrumented
 def create_price_visualizations(df):
     """Create price visualizations"""
     
+    # Plotting is imported here so text-only analysis starts fast
+    import matplotlib
+    matplotlib.use('Agg')  # charts are saved to files, never shown
+    import matplotlib.pyplot as plt
+    
     # 1. Price trends by market
     plt.figure(figsize=(15, 8))
     
@@ -44,8 +61,8 @@ def create_price_visualizations(df):
     plt.tight_layout()
     
     # Save the plot
-    plt.savefig('../../data_sources/processed/maize_price_trends.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    plt.savefig(os.path.join(PROCESSED_DIR, 'maize_price_trends.png'), dpi=300, bbox_inches='tight')
+    plt.close()
     
     # 2. Average prices by market
     plt.figure(figsize=(12, 6))
@@ -58,11 +75,12 @@ def create_price_visualizations(df):
     plt.title('Average Maize Prices by Market')
     plt.tight_layout()
     
-    plt.savefig('../../data_sources/processed/average_prices_by_market.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    plt.savefig(os.path.join(PROCESSED_DIR, 'average_prices_by_market.png'), dpi=300, bbox_inches='tight')
+    plt.close()
     
     return avg_prices
 
+@instrumented
 def price_insights(df):
     """Generate key insights"""
     
@@ -93,62 +111,90 @@ def price_insights(df):
     print(f"• {price_diff:.2f} KES/kg difference between markets")
     print(f"• {(price_diff/avg_by_market.min()*100):.1f}% price variation")
 
-def advanced_insights(df):
-    """Generate advanced insights"""
+@instrumented
+def advanced_insights(df, cube=None, markets=None, profiles=None, ranking=None):
+    """Generate advanced insights (answered from the aggregate cube if given)"""
     
     print("\n" + "="*60)
     print("ADVANCED MARKET ANALYSIS")
     print("="*60)
     
-    # Volatility analysis
-    volatility = df.groupby('mkt_name')['maize'].std().sort_values(ascending=False)
+    if cube is not None:
+        maize_cells = cube[(cube['country_code'] == 'KEN') & (cube['commodity'] == 'maize')]
+        by_market = rollup(maize_cells, ['mkt_name'])
+        volatility = by_market['std'].sort_values(ascending=False)
+        seasonal = rollup(maize_cells, ['month'])['mean']
+        avg_prices_by_market = by_market['mean']
+    else:
+        volatility = df.groupby('mkt_name')['maize'].std().sort_values(ascending=False)
+        df['month'] = pd.to_datetime(df['price_date']).dt.month
+        seasonal = df.groupby('month')['maize'].mean()
+        avg_prices_by_market = df.groupby('mkt_name')['maize'].mean()
     
+    # Volatility analysis
     print(f"\nPRICE VOLATILITY RANKING:")
     for i, (market, vol) in enumerate(volatility.head().items(), 1):
         print(f"{i}. {market}: {vol:.2f} KES/kg std deviation")
     
-    # Seasonal patterns
-    df['month'] = pd.to_datetime(df['price_date']).dt.month
-    seasonal = df.groupby('month')['maize'].mean()
+    # Range-based volatility from the monthly high/low/open/close bars
+    if ranking is not None:
+        kenya_maize = ranking[(ranking['country_code'] == 'KEN') & (ranking['item'] == 'maize')
+                              & ranking['garman_klass'].notna()]
+        print(f"\nHIGH/LOW VOLATILITY RANKING (Garman-Klass, annualised):")
+        for i, row in enumerate(kenya_maize.head().itertuples(), 1):
+            print(f"{i}. {row.mkt_name}: {row.garman_klass:.0%} "
+                  f"(Parkinson {row.parkinson:.0%}, close-to-close {row.close_to_close:.0%})")
     
+    # Seasonal patterns
     print(f"\nSEASONAL PATTERNS:")
     print(f"• Highest prices: Month {seasonal.idxmax()} ({seasonal.max():.2f} KES/kg)")
     print(f"• Lowest prices: Month {seasonal.idxmin()} ({seasonal.min():.2f} KES/kg)")
     
-    # Market accessibility (price vs distance from Nairobi)
-    market_coords = {
-        'Kitui': (-1.367, 38.01),
-        'Mandera': (3.93, 41.87), 
-        'Marsabit': (2.34, 37.99),
-        'Lodwar (Turkana)': (3.12, 35.60),
-        'Marigat (Baringo)': (0.48, 35.98)
-    }
-    
-    nairobi = (-1.29, 36.82)
+    # Detrended per-market seasonality, when the seasonal profiles have been built
+    if profiles is not None:
+        kenya_maize = profiles[(profiles['country_code'] == 'KEN') & (profiles['commodity'] == 'maize')
+                               & profiles['complete']]
+        if len(kenya_maize):
+            print(f"• Detrended across {len(kenya_maize)} markets: lean-season peak most often in month "
+                  f"{kenya_maize['peak_month'].mode().iloc[0]}, harvest trough in month "
+                  f"{kenya_maize['trough_month'].mode().iloc[0]}, "
+                  f"median amplitude {kenya_maize['amplitude'].median():.0%}")
+    
+    # Market accessibility (price vs distance from the capital)
+    if markets is None:
+        markets = MarketIndex.from_cleaned(['Kenya'])
+    distances = markets.distance_to_capital().set_index('mkt_name')
+    distances = distances[distances.index.isin(avg_prices_by_market.index)].sort_values('distance_km')
     
     print(f"\nDISTANCE IMPACT:")
-    avg_prices_by_market = df.groupby('mkt_name')['maize'].mean()
-    
-    for market in market_coords:
-        if market in avg_prices_by_market.index:
-            # Calculate rough distance (simplified)
-            lat_diff = market_coords[market][0] - nairobi[0]
-            lon_diff = market_coords[market][1] - nairobi[1]
-            distance = (lat_diff**2 + lon_diff**2)**0.5 * 111  # Rough km conversion
-            
-            price = avg_prices_by_market[market]
-            print(f"• {market}: ~{distance:.0f}km from Nairobi, avg price {price:.2f} KES/kg")
+    
+    for market, row in distances.iterrows():
+        price = avg_prices_by_market[market]
+        print(f"• {market}: {row['distance_km']:.0f}km from {row['capital']}, avg price {price:.2f} KES/kg")
+    
+    if len(distances) > 2:
+        r = distances['distance_km'].corr(avg_prices_by_market.reindex(distances.index))
+        print(f"• Distance vs price correlation across {len(distances)} markets: r = {r:.2f}")
 
-if __name__ == "__main__":
-    # Load and analyze data
-    df = load_clean_data()
+@instrumented
+def run_analysis(charts=True, fmt='csv'):
+    """The full Kenya maize analysis; charts=False keeps it text-only (no plotting imports)"""
+    
+    # Load and analyze data (only the columns the analysis uses)
+    df = load_clean_data(columns=['mkt_name', 'price_date', 'maize'], fmt=fmt)
     maize_data = analyze_price_trends(df)
     
     # Create visualizations
-    avg_prices = create_price_visualizations(maize_data)
+    if charts:
+        create_price_visualizations(maize_data)
     
     # Generate insights
     price_insights(maize_data)
     
     # Add advanced analysis
-    advanced_insights(maize_data)
\ No newline at end of file
+    series, _, ohlc = load_ohlc(['Kenya'], fmt=fmt)
+    advanced_insights(maize_data, cube=cached_cube_from_cleaned(fmt), profiles=cached_seasonal_profiles(fmt),
+                      ranking=volatility_ranking(series, ohlc))
+
+if __name__ == "__main__":
+    run_analysis()
@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, PROCESSED_DIR, get_processed_path
+from multi_country.long_format import ORDINAL_EPOCH_YEAR
+from analysis.aggregate_cube import cached_cube_from_cleaned
+from storage.cache import cached_call, print_cache_stats
+
+SEASONAL_FILE = os.path.join(PROCESSED_DIR, 'seasonal_profiles.csv')
+
+SERIES_KEYS = ['country_code', 'mkt_name', 'commodity']
+MONTH_COLUMNS = [f'm{m:02d}' for m in range(1, 13)]
+
+# Years a calendar month needs (after detrending) before it gets a factor
+MIN_YEARS_PER_MONTH = 2
+
+# Share of the moving-average window that must be observed
+MIN_WINDOW_COVERAGE = 0.5
+
+def seasonal_array(cube):
+    """Dense series x years x 12 array of mean log prices (NaN where missing)
+
+    Returns (series, first_year, values) with one row of series keys per
+    first-axis entry.
+    """
+
+    keys = pd.MultiIndex.from_frame(cube[SERIES_KEYS])
+    rows, uniques = pd.factorize(keys, sort=True)
+
+    month = cube['month_ordinal'].to_numpy()
+    first_year = int(month.min() // 12)
+    n_years = int(month.max() // 12) - first_year + 1
+
+    values = np.full((len(uniques), n_years * 12), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prices = np.log((cube['sum'] / cube['count']).to_numpy(dtype='float64'))
+    values[rows, month - first_year * 12] = np.where(np.isfinite(prices), prices, np.nan)
+
+    series = uniques.to_frame(index=False, name=SERIES_KEYS)
+    return series, first_year + ORDINAL_EPOCH_YEAR, values.reshape(len(uniques), n_years, 12)
+
+def centered_moving_average(values, min_coverage=MIN_WINDOW_COVERAGE):
+    """2x12 centred moving average along the last axis, skipping missing months
+
+    The window is the mean of the two 12-month windows around each month;
+    positions with under min_coverage of it observed are NaN.
+    """
+
+    mask = ~np.isnan(values)
+    filled = np.where(mask, values, 0.0)
+    pad = [(0, 0)] * (values.ndim - 1) + [(7, 7)]
+    total = np.cumsum(np.pad(filled, pad), axis=-1)
+    count = np.cumsum(np.pad(mask.astype('float64'), pad), axis=-1)
+
+    t = np.arange(values.shape[-1]) + 7
+
+    # Windows t-6..t+5 and t-5..t+6 on the padded axis (cumsum[i] covers 0..i)
+    def window(c):
+        return (c[..., t + 5] - c[..., t - 7]) + (c[..., t + 6] - c[..., t - 6])
+
+    weight = window(count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ma = window(total) / weight
+    return np.where(weight >= 24 * min_coverage, ma, np.nan)
+
+def _nanvar(values):
+    """Row-wise variance ignoring NaN (NaN for rows without data)"""
+    mask = ~np.isnan(values)
+    n = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(mask, values, 0.0).sum(axis=1) / n
+        return np.where(mask, (values - mean[:, None]) ** 2, 0.0).sum(axis=1) / n
+
+def seasonal_profiles(cube, min_coverage=MIN_WINDOW_COVERAGE, min_years=MIN_YEARS_PER_MONTH):
+    """Seasonal indices, peak/trough timing and amplitude for every series in one pass
+
+    Log prices are detrended with a centred moving average; each calendar
+    month's factor is its mean deviation, normalised so the twelve factors
+    average to zero. seasonal index = exp(factor), so 1.10 means 10% above
+    the trend in that month.
+    """
+
+    series, first_year, values = seasonal_array(cube)
+    n_series, n_years, _ = values.shape
+
+    trend = centered_moving_average(values.reshape(n_series, -1), min_coverage).reshape(values.shape)
+    deviation = values - trend
+
+    years_per_month = (~np.isnan(deviation)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        factors = np.nansum(deviation, axis=1) / years_per_month
+    factors = np.where(years_per_month >= min_years, factors, np.nan)
+
+    complete = ~np.isnan(factors).any(axis=1)
+    factors = np.where(complete[:, None], factors - np.nanmean(np.where(complete[:, None], factors, 0.0),
+                                                               axis=1, keepdims=True), np.nan)
+    index = np.exp(factors)
+
+    # Share of detrended variance explained by the month-of-year factors
+    residual = deviation - factors[:, None, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        strength = 1 - _nanvar(residual.reshape(n_series, -1)) / _nanvar(deviation.reshape(n_series, -1))
+
+    safe = np.where(complete[:, None], factors, 0.0)
+    profiles = series.assign(**{col: index[:, i] for i, col in enumerate(MONTH_COLUMNS)})
+    profiles['peak_month'] = np.where(complete, safe.argmax(axis=1) + 1, 0)
+    profiles['trough_month'] = np.where(complete, safe.argmin(axis=1) + 1, 0)
+    profiles['amplitude'] = np.where(complete, np.exp(safe.max(axis=1)) / np.exp(safe.min(axis=1)) - 1, np.nan)
+    profiles['seasonal_strength'] = np.where(complete, strength, np.nan)
+    profiles['years'] = (~np.isnan(values)).any(axis=2).sum(axis=1)
+    profiles['first_year'] = first_year
+    profiles['complete'] = complete
+    return profiles
+
+def _profiles_from_cleaned(profile_func, fmt, **params):
+    """Run a profile function over the cube of the cleaned data"""
+    return profile_func(cached_cube_from_cleaned(fmt), **params)
+
+def cached_seasonal_profiles(fmt='csv', min_coverage=MIN_WINDOW_COVERAGE, min_years=MIN_YEARS_PER_MONTH):
+    """Seasonal profiles of the cleaned data, reused from the cache while nothing has changed
+
+    The profile function and its thresholds are part of the cache key, so
+    tuning either recomputes.
+    """
+    params = {'min_coverage': min_coverage, 'min_years': min_years}
+    if fmt != 'csv':
+        return _profiles_from_cleaned(seasonal_profiles, fmt, **params)
+    inputs = [get_processed_path(c) for c in COUNTRY_REGISTRY if os.path.exists(get_processed_path(c))]
+    return cached_call(_profiles_from_cleaned, seasonal_profiles, fmt, input_files=inputs, **params)
+
+def load_seasonal_profiles(path=SEASONAL_FILE):
+    """Load saved profiles (None if they have not been built yet)"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype={'mkt_name': str})
+
+def save_seasonal_profiles(profiles, path=SEASONAL_FILE):
+    """Persist the profiles next to the processed data"""
+    profiles.round(4).to_csv(path, index=False)
+
+def seasonal_summary(profiles):
+    """Typical peak/trough month and amplitude per country and commodity"""
+    complete = profiles[profiles['complete']]
+    return complete.groupby(['country_code', 'commodity']).agg(
+        series=('mkt_name', 'size'),
+        peak_month=('peak_month', lambda m: m.mode().iloc[0]),
+        trough_month=('trough_month', lambda m: m.mode().iloc[0]),
+        median_amplitude=('amplitude', 'median'),
+        median_strength=('seasonal_strength', 'median'),
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seasonal price profiles for every market x commodity series")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    profiles = cached_seasonal_profiles(args.format)
+    save_seasonal_profiles(profiles)
+    print(f"Seasonal profiles for {len(profiles):,} series ({profiles['complete'].sum():,} complete) "
+          f"in {time.perf_counter() - start:.2f}s: {SEASONAL_FILE}")
+
+    summary = seasonal_summary(profiles)
+    print(f"\n SEASONAL CALENDAR (lean-season peak / harvest trough)")
+    print("=" * 40)
+    for (iso3, commodity), row in summary.iterrows():
+        print(f"• {iso3} {commodity}: peak month {row['peak_month']:.0f}, trough month {row['trough_month']:.0f}, "
+              f"median amplitude {row['median_amplitude']:.0%} across {row['series']:.0f} markets")
+    print_cache_stats()
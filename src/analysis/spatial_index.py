@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, get_country_info
+from storage.columnar_store import load_cleaned_data
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # optional: fall back to blocked brute force
+    cKDTree = None
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Query rows compared against every market at once in the brute-force path
+QUERY_BLOCK = 2048
+
+LOCATION_COLUMNS = ['ISO3', 'adm1_name', 'mkt_name', 'geo_id', 'lat', 'lon']
+
+def to_unit_vectors(lat, lon):
+    """Latitude/longitude in degrees to 3D points on the unit sphere"""
+    lat = np.radians(np.asarray(lat, dtype='float64'))
+    lon = np.radians(np.asarray(lon, dtype='float64'))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; arguments broadcast like numpy arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype='float64')) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def haversine_matrix(lat1, lon1, lat2=None, lon2=None):
+    """Pairwise distance matrix in km (n x m, or n x n if the second set is omitted)"""
+    if lat2 is None:
+        lat2, lon2 = lat1, lon1
+    lat1, lon1 = np.asarray(lat1)[:, None], np.asarray(lon1)[:, None]
+    lat2, lon2 = np.asarray(lat2)[None, :], np.asarray(lon2)[None, :]
+    return haversine(lat1, lon1, lat2, lon2)
+
+def _km_to_chord(km):
+    """Straight-line distance through the unit sphere for an arc length in km"""
+    return 2 * np.sin(np.minimum(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+def market_locations(countries=None, fmt='csv'):
+    """One row per market (country_code, adm1_name, mkt_name, geo_id, lat, lon)"""
+
+    if countries is None:
+        countries = list(COUNTRY_REGISTRY)
+
+    parts = []
+    for country in countries:
+        try:
+            df = load_cleaned_data(country, columns=LOCATION_COLUMNS, fmt=fmt)
+        except FileNotFoundError:
+            print(f" Skipping {country}: no cleaned {fmt} data found")
+            continue
+        parts.append(df.drop_duplicates('mkt_name'))
+
+    markets = pd.concat(parts, ignore_index=True).rename(columns={'ISO3': 'country_code'})
+    markets = markets.dropna(subset=['lat', 'lon'])
+    for col in ['country_code', 'adm1_name', 'mkt_name', 'geo_id']:
+        markets[col] = markets[col].astype(str)
+    return markets.sort_values(['country_code', 'mkt_name'], ignore_index=True)
+
+class MarketIndex:
+    """Spatial index over market coordinates
+
+    Markets are stored as unit-sphere vectors so nearest neighbours can be
+    found with Euclidean (chord) distances, through a KD-tree when scipy is
+    installed and blocked matrix products otherwise. Reported distances are
+    always exact haversine kilometres.
+    """
+
+    def __init__(self, markets):
+        self.markets = markets.reset_index(drop=True)
+        self.lat = self.markets['lat'].to_numpy(dtype='float64')
+        self.lon = self.markets['lon'].to_numpy(dtype='float64')
+        self.points = to_unit_vectors(self.lat, self.lon)
+        self.tree = cKDTree(self.points) if cKDTree is not None else None
+
+    @classmethod
+    def from_cleaned(cls, countries=None, fmt='csv'):
+        """Build the index from the cleaned country files"""
+        return cls(market_locations(countries, fmt))
+
+    def __len__(self):
+        return len(self.markets)
+
+    def _knn_positions(self, query_points, k):
+        """Positions of the k nearest markets for each query point, closest first"""
+
+        k = min(k, len(self))
+        if self.tree is not None:
+            _, idx = self.tree.query(query_points, k=k)
+            return idx.reshape(len(query_points), k)
+
+        result = np.empty((len(query_points), k), dtype='int64')
+        for start in range(0, len(query_points), QUERY_BLOCK):
+            # Larger dot product means a closer point on the unit sphere
+            similarity = query_points[start:start + QUERY_BLOCK] @ self.points.T
+            top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(similarity, top, axis=1), axis=1, kind='stable')
+            result[start:start + QUERY_BLOCK] = np.take_along_axis(top, order, axis=1)
+        return result
+
+    def knn(self, lat, lon, k=5):
+        """(distances_km, positions) of the k nearest markets to each query point"""
+        lat, lon = np.atleast_1d(lat), np.atleast_1d(lon)
+        idx = self._knn_positions(to_unit_vectors(lat, lon), k)
+        return haversine(lat[:, None], lon[:, None], self.lat[idx], self.lon[idx]), idx
+
+    def nearest(self, lat, lon, k=5):
+        """The k markets closest to one point, with their distance in km"""
+        distances, idx = self.knn(lat, lon, k)
+        return self.markets.iloc[idx[0]].assign(distance_km=distances[0]).reset_index(drop=True)
+
+    def within(self, lat, lon, radius_km):
+        """Every market within radius_km of one point, closest first"""
+
+        if self.tree is not None:
+            idx = np.asarray(self.tree.query_ball_point(to_unit_vectors(lat, lon), _km_to_chord(radius_km)),
+                             dtype='int64')
+            distances = haversine(lat, lon, self.lat[idx], self.lon[idx])
+        else:
+            distances = haversine(lat, lon, self.lat, self.lon)
+            idx = np.flatnonzero(distances <= radius_km)
+            distances = distances[idx]
+
+        order = np.argsort(distances, kind='stable')
+        return self.markets.iloc[idx[order]].assign(distance_km=distances[order]).reset_index(drop=True)
+
+    def neighbours(self, k=5):
+        """The k nearest other markets for every market, as (market, neighbour, distance_km) rows"""
+
+        # Ask for one extra so each market's own position can be dropped
+        idx = self._knn_positions(self.points, k + 1)
+        own = np.arange(len(self))[:, None]
+        keep = idx != own
+        # A market with an exact duplicate location may not come first; keep k per row
+        keep &= np.cumsum(keep, axis=1) <= k
+
+        rows = np.broadcast_to(own, idx.shape)[keep]
+        cols = idx[keep]
+        return pd.DataFrame({
+            'market': rows,
+            'neighbour': cols,
+            'distance_km': haversine(self.lat[rows], self.lon[rows], self.lat[cols], self.lon[cols]),
+        })
+
+    def pairs_within(self, radius_km):
+        """All market pairs (i < j) closer than radius_km, as (market, neighbour, distance_km) rows"""
+
+        if self.tree is not None:
+            pairs = self.tree.query_pairs(_km_to_chord(radius_km), output_type='ndarray')
+            rows, cols = pairs[:, 0], pairs[:, 1]
+        else:
+            rows, cols = [], []
+            for start in range(0, len(self), QUERY_BLOCK):
+                block = haversine_matrix(self.lat[start:start + QUERY_BLOCK], self.lon[start:start + QUERY_BLOCK],
+                                         self.lat, self.lon)
+                i, j = np.nonzero(block <= radius_km)
+                i += start
+                rows.append(i[i < j])
+                cols.append(j[i < j])
+            rows, cols = np.concatenate(rows), np.concatenate(cols)
+
+        distances = haversine(self.lat[rows], self.lon[rows], self.lat[cols], self.lon[cols])
+        keep = distances <= radius_km
+        return pd.DataFrame({'market': rows[keep], 'neighbour': cols[keep], 'distance_km': distances[keep]})
+
+    def distance_matrix(self):
+        """Full market x market distance matrix in km"""
+        return haversine_matrix(self.lat, self.lon)
+
+    def distance_to_hubs(self, hubs):
+        """Distance in km from every market to each hub ({name: (lat, lon)}), one column per hub"""
+        names = list(hubs)
+        hub_lat = np.array([hubs[n][0] for n in names], dtype='float64')
+        hub_lon = np.array([hubs[n][1] for n in names], dtype='float64')
+        return pd.DataFrame(haversine_matrix(self.lat, self.lon, hub_lat, hub_lon),
+                            columns=names, index=self.markets.index)
+
+    def distance_to_capital(self):
+        """Each market with the distance to its own country's capital (from the registry)"""
+
+        capitals = {iso3: get_country_info(iso3)['capital'] for iso3 in self.markets['country_code'].unique()}
+        hub = self.markets['country_code'].map(lambda iso3: capitals[iso3])
+        hub_lat = hub.map(lambda c: c[1]).to_numpy(dtype='float64')
+        hub_lon = hub.map(lambda c: c[2]).to_numpy(dtype='float64')
+
+        return self.markets[['country_code', 'mkt_name', 'lat', 'lon']].assign(
+            capital=hub.map(lambda c: c[0]),
+            distance_km=haversine(self.lat, self.lon, hub_lat, hub_lon),
+        )
+
+def distance_price_table(index, mean_prices):
+    """Join per-market mean prices (indexed by country_code, mkt_name) to capital distances"""
+    distances = index.distance_to_capital().set_index(['country_code', 'mkt_name'])
+    table = distances.join(mean_prices.rename('mean_price'), how='inner')
+    return table.reset_index()
+
+def distance_price_correlation(table):
+    """Per-country correlation between distance to the capital and mean price"""
+    return table.groupby('country_code').apply(
+        lambda g: pd.Series({
+            'markets': len(g),
+            'max_distance_km': g['distance_km'].max(),
+            'pearson_r': g['distance_km'].corr(g['mean_price']),
+            # Spearman as Pearson on ranks, which avoids needing scipy
+            'spearman_r': g['distance_km'].rank().corr(g['mean_price'].rank()),
+        }),
+        include_groups=False,
+    )
+
+if __name__ == "__main__":
+    from analysis.aggregate_cube import cached_cube_from_cleaned, rollup
+
+    parser = argparse.ArgumentParser(description="Market spatial index and distance-vs-price analysis")
+    parser.add_argument('--commodity', default='maize')
+    parser.add_argument('--k', type=int, default=3, help="Neighbours per market")
+    parser.add_argument('--radius', type=float, default=50.0, help="Radius (km) for close market pairs")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = MarketIndex.from_cleaned(fmt=args.format)
+    print(f"Indexed {len(index)} markets in {time.perf_counter() - start:.3f}s "
+          f"({'KD-tree' if index.tree is not None else 'brute force'})")
+
+    start = time.perf_counter()
+    neighbours = index.neighbours(args.k)
+    pairs = index.pairs_within(args.radius)
+    print(f"{len(neighbours):,} nearest-neighbour links and {len(pairs):,} pairs within "
+          f"{args.radius:.0f}km in {time.perf_counter() - start:.3f}s")
+
+    cube = cached_cube_from_cleaned(args.format)
+    mean_prices = rollup(cube[cube['commodity'] == args.commodity], ['country_code', 'mkt_name'])['mean']
+    table = distance_price_table(index, mean_prices)
+
+    print(f"\n DISTANCE TO CAPITAL VS {args.commodity.upper()} PRICE")
+    print("=" * 40)
+    print(distance_price_correlation(table).round(2).to_string())
@@ -0,0 +1,224 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, PROCESSED_DIR, get_country_info
+from multi_country.long_format import to_month_ordinal
+from storage.columnar_store import load_cleaned_data
+
+VOLATILITY_FILE = os.path.join(PROCESSED_DIR, 'volatility_ranking.csv')
+
+# Series with open/high/low/close columns besides the commodities themselves
+EXTRA_ITEMS = ['food_price_index']
+
+OHLC_PREFIXES = ['o_', 'h_', 'l_', 'c_']
+SERIES_KEYS = ['country_code', 'mkt_name', 'item']
+ESTIMATORS = ['parkinson', 'garman_klass', 'close_to_close']
+
+DEFAULT_WINDOWS = [6, 12]
+
+# Share of a rolling window that must be observed for a value
+MIN_WINDOW_SHARE = 0.5
+
+# Months of bars a series needs before it is ranked
+MIN_MONTHS = 12
+
+PARKINSON_FACTOR = 1 / (4 * np.log(2))
+GARMAN_KLASS_FACTOR = 2 * np.log(2) - 1
+
+def load_ohlc(countries=None, fmt='csv'):
+    """Dense open/high/low/close arrays for every market x item series
+
+    Items are each country's commodities plus the food price index. Returns
+    (series, first_month, ohlc): series keys per row, the month ordinal of the
+    first column, and a float64 array of shape (4, series, months) with NaN
+    where a month is missing or its bar is unusable.
+    """
+
+    if countries is None:
+        countries = list(COUNTRY_REGISTRY)
+
+    parts = []
+    for country in countries:
+        info = get_country_info(country)
+        items = info['commodities'] + EXTRA_ITEMS
+        columns = ['mkt_name', 'price_date'] + [f'{p}{i}' for i in items for p in OHLC_PREFIXES]
+        try:
+            df = load_cleaned_data(country, columns=columns, fmt=fmt)
+        except FileNotFoundError:
+            print(f" Skipping {country}: no cleaned {fmt} data found")
+            continue
+
+        months = to_month_ordinal(df['price_date']).to_numpy()
+        markets = df['mkt_name'].astype(str).to_numpy()
+        for item in items:
+            bars = df[[f'{p}{item}' for p in OHLC_PREFIXES]].to_numpy(dtype='float64')
+            keep = ~np.isnan(bars).any(axis=1)
+            if keep.any():
+                parts.append(pd.DataFrame({
+                    'country_code': info['iso3'], 'mkt_name': markets[keep], 'item': item,
+                    'month_ordinal': months[keep],
+                    'o': bars[keep, 0], 'h': bars[keep, 1], 'l': bars[keep, 2], 'c': bars[keep, 3],
+                }))
+
+    bars = pd.concat(parts, ignore_index=True)
+    rows, uniques = pd.factorize(pd.MultiIndex.from_frame(bars[SERIES_KEYS]), sort=True)
+    first = int(bars['month_ordinal'].min())
+    cols = bars['month_ordinal'].to_numpy() - first
+
+    ohlc = np.full((4, len(uniques), cols.max() + 1), np.nan)
+    for k, name in enumerate('ohlc'):
+        ohlc[k, rows, cols] = bars[name].to_numpy()
+
+    # Bars with non-positive prices or a high below the low cannot be used
+    o, h, l, c = ohlc
+    bad = (np.fmin(np.fmin(o, h), np.fmin(l, c)) <= 0) | (h < l)
+    ohlc[:, bad] = np.nan
+
+    return uniques.to_frame(index=False, name=SERIES_KEYS), first, ohlc
+
+def bar_estimates(ohlc):
+    """Per-month variance estimates and close-to-close log returns, all (series, months)
+
+    parkinson = ln(H/L)^2 / (4 ln 2)
+    garman_klass = 0.5 ln(H/L)^2 - (2 ln 2 - 1) ln(C/O)^2
+    Returns need the previous month's close, so gaps leave them NaN.
+    """
+
+    o, h, l, c = np.log(ohlc)
+    hl = (h - l) ** 2
+    co = (c - o) ** 2
+    returns = np.full_like(c, np.nan)
+    returns[:, 1:] = c[:, 1:] - c[:, :-1]
+    return {
+        'parkinson': PARKINSON_FACTOR * hl,
+        'garman_klass': 0.5 * hl - GARMAN_KLASS_FACTOR * co,
+        'returns': returns,
+    }
+
+def _rolling_sums(values, window):
+    """Rolling (count, sum, sum of squares) over the last `window` months, NaN skipped"""
+    mask = ~np.isnan(values)
+    filled = np.where(mask, values, 0.0)
+
+    # cumsum[t + 1] covers months 0..t; windows near the start are truncated
+    end = np.arange(values.shape[1]) + 1
+    start = np.maximum(end - window, 0)
+
+    sums = []
+    for v in (mask.astype('float64'), filled, filled ** 2):
+        total = np.cumsum(np.pad(v, [(0, 0), (1, 0)]), axis=1)
+        sums.append(total[:, end] - total[:, start])
+    return sums
+
+def rolling_volatility(ohlc, window, annualize=True):
+    """Rolling Parkinson, Garman-Klass and close-to-close volatility for every series
+
+    Each is (series, months): the square root of the mean variance estimate
+    over the last `window` months (sample std of returns for close-to-close),
+    NaN when under MIN_WINDOW_SHARE of the window is observed.
+    """
+
+    estimates = bar_estimates(ohlc)
+    scale = np.sqrt(12) if annualize else 1.0
+    min_obs = max(2, int(np.ceil(window * MIN_WINDOW_SHARE)))
+
+    result = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for name in ['parkinson', 'garman_klass']:
+            n, total, _ = _rolling_sums(estimates[name], window)
+            variance = np.clip(total / n, 0, None)
+            result[name] = np.where(n >= min_obs, np.sqrt(variance) * scale, np.nan)
+
+        n, total, total_sq = _rolling_sums(estimates['returns'], window)
+        variance = np.clip((total_sq - total ** 2 / n) / (n - 1), 0, None)
+        result['close_to_close'] = np.where(n >= min_obs, np.sqrt(variance) * scale, np.nan)
+    return result
+
+def full_period_volatility(ohlc, annualize=True):
+    """Each estimator over a series' whole history, as (series,) arrays"""
+
+    estimates = bar_estimates(ohlc)
+    scale = np.sqrt(12) if annualize else 1.0
+
+    def mean(values):
+        n = (~np.isnan(values)).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.nansum(values, axis=1) / n, n
+
+    result = {}
+    for name in ['parkinson', 'garman_klass']:
+        variance, n = mean(estimates[name])
+        result[name] = np.where(n >= 2, np.sqrt(np.clip(variance, 0, None)) * scale, np.nan)
+
+    returns = estimates['returns']
+    r_mean, n = mean(returns)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = np.nansum((returns - r_mean[:, None]) ** 2, axis=1) / (n - 1)
+    result['close_to_close'] = np.where(n >= 2, np.sqrt(variance) * scale, np.nan)
+    result['months'] = (~np.isnan(ohlc[3])).sum(axis=1)
+    return result
+
+def volatility_ranking(series, ohlc, windows=DEFAULT_WINDOWS, annualize=True, by='garman_klass',
+                       min_months=MIN_MONTHS):
+    """One row per series: full-period estimators plus the latest rolling value per window
+
+    Sorted with the most volatile series (by `by`) first; series with fewer
+    than min_months bars keep NaN full-period values and sort last.
+    """
+
+    full = full_period_volatility(ohlc, annualize)
+    enough = full['months'] >= min_months
+    ranking = series.assign(months=full['months'],
+                            **{name: np.where(enough, full[name], np.nan) for name in ESTIMATORS})
+
+    observed = ~np.isnan(ohlc[3])
+    last = np.where(observed.any(axis=1), ohlc.shape[2] - 1 - np.argmax(observed[:, ::-1], axis=1), 0)
+    for window in windows:
+        rolling = rolling_volatility(ohlc, window, annualize)
+        for name in ESTIMATORS:
+            ranking[f'{name}_{window}m'] = rolling[name][np.arange(len(series)), last]
+
+    return ranking.sort_values(by, ascending=False, na_position='last', ignore_index=True)
+
+def volatility_panel(series, first_month, ohlc, window, annualize=True):
+    """Long (series, month) table of rolling volatility where the series has a bar"""
+
+    rolling = rolling_volatility(ohlc, window, annualize)
+    rows, cols = np.nonzero(~np.isnan(ohlc[3]))
+    panel = series.iloc[rows].reset_index(drop=True)
+    panel['month_ordinal'] = cols + first_month
+    for name in ESTIMATORS:
+        panel[name] = rolling[name][rows, cols]
+    return panel
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="High/low-based price volatility for every market and item")
+    parser.add_argument('--windows', type=int, nargs='+', default=DEFAULT_WINDOWS,
+                        help="Rolling windows in months")
+    parser.add_argument('--by', choices=ESTIMATORS, default='garman_klass', help="Ranking estimator")
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    args = parser.parse_args()
+
+    series, first_month, ohlc = load_ohlc(fmt=args.format)
+    start = time.perf_counter()
+    ranking = volatility_ranking(series, ohlc, args.windows, by=args.by)
+    print(f"Volatility for {len(series):,} series x {ohlc.shape[2]} months "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    print(f"\n MOST VOLATILE SERIES ({args.by.replace('_', '-')}, annualised)")
+    print("=" * 40)
+    for i, row in enumerate(ranking.head(args.top).itertuples(), 1):
+        print(f"{i}. {row.mkt_name} ({row.country_code}) {row.item}: {getattr(row, args.by):.0%} "
+              f"(Parkinson {row.parkinson:.0%}, close-to-close {row.close_to_close:.0%})")
+
+    ranking.round(4).to_csv(VOLATILITY_FILE, index=False)
+    print(f"\nVolatility ranking saved: {VOLATILITY_FILE}")
@@ -0,0 +1,272 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+import contextlib
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import PROCESSED_DIR, REPO_ROOT
+from benchmarks.synthetic_rtfp import register_synthetic_countries, write_synthetic_dataset
+
+BENCHMARK_FILE = os.path.join(PROCESSED_DIR, 'benchmark_results.csv')
+
+# countries x markets x years; the middle one is about the size of the real data
+DEFAULT_SCALES = ['6x20x5', '6x60x12', '12x100x18']
+
+# Pipeline order: each stage reads what the previous ones wrote
+STAGE_ORDER = ['clean', 'unify', 'summary', 'analyses', 'render']
+
+# A stage is flagged when it is this much slower than the last run at the same
+# scale, and by more than the noise floor (seconds)
+DEFAULT_TOLERANCE = 0.25
+NOISE_FLOOR = 0.05
+
+def country_cleaner(country):
+    """The clean_<country>_data function for a country (synthetic copies use their template's)"""
+    from multi_country.country_registry import get_country_info
+    from pricepulse import CLEANERS, GENERIC_CLEANER
+
+    module, func = CLEANERS.get(get_country_info(country).get('template', country), GENERIC_CLEANER)
+    return getattr(importlib.import_module(module), func)
+
+# Each stage function does its setup (untimed) and returns the timed step,
+# which returns the number of rows it processed
+
+def stage_clean(countries):
+    """Raw files to cleaned CSVs and star tables, with each country's own cleaner"""
+    from multi_country.country_registry import get_raw_path
+    from storage.columnar_store import save_cleaned_data
+
+    def run():
+        rows = 0
+        for country in countries:
+            df_clean = country_cleaner(country)(pd.read_csv(get_raw_path(country)))
+            save_cleaned_data(df_clean, country)
+            rows += len(df_clean)
+        return rows
+    return run
+
+def stage_unify(countries):
+    """Cleaned CSVs to the unified dataset"""
+    from multi_country.multi_country_processor import (analyze_shared_commodities, process_multi_country_data,
+                                                       save_unified_dataset)
+
+    def run():
+        df_combined = process_multi_country_data()
+        analyze_shared_commodities(df_combined)
+        save_unified_dataset(df_combined)
+        return len(df_combined)
+    return run
+
+def stage_summary(countries):
+    """Summary report and the aggregate cube"""
+    from multi_country.multi_country_processor import UNIFIED_FILE, analyze_shared_commodities, generate_summary_report
+    from analysis.aggregate_cube import build_cube_from_cleaned, save_cube
+
+    df_combined = pd.read_csv(UNIFIED_FILE, parse_dates=['price_date'])
+
+    def run():
+        generate_summary_report(df_combined, analyze_shared_commodities(df_combined))
+        save_cube(build_cube_from_cleaned())
+        return len(df_combined)
+    return run
+
+def stage_analyses(countries):
+    """Seasonal profiles, volatility ranking, basket index and the price_analyzer insights"""
+    from analysis.aggregate_cube import load_cube
+    from analysis.seasonality import save_seasonal_profiles, seasonal_profiles
+    from analysis.volatility import load_ohlc, volatility_ranking
+    from analysis.basket_index import run_basket_index
+    from analysis.price_analyzer import run_analysis
+
+    def run():
+        cube = load_cube()
+        save_seasonal_profiles(seasonal_profiles(cube))
+        series, _, ohlc = load_ohlc()
+        volatility_ranking(series, ohlc)
+        run_basket_index(rebuild=True)
+        run_analysis(charts=False)
+        return len(cube)
+    return run
+
+def stage_render(countries):
+    """The full headless chart set, redrawn from scratch"""
+    from analysis.chart_renderer import render_all
+
+    def run():
+        rendered, _ = render_all(force=True)
+        return len(rendered)
+    return run
+
+STAGES = {
+    'clean': stage_clean,
+    'unify': stage_unify,
+    'summary': stage_summary,
+    'analyses': stage_analyses,
+    'render': stage_render,
+}
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its finished children (MB)"""
+    import resource
+
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def cpu_seconds():
+    """CPU time of this process plus its finished children (render workers)"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def run_stage(stage, countries):
+    """Time one stage in this process (data roots come from the environment)"""
+
+    names = register_synthetic_countries(countries)
+    run = STAGES[stage](names)
+
+    start_mb = peak_rss_mb()
+    start, start_cpu = time.perf_counter(), cpu_seconds()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = run()
+    return {
+        'seconds': time.perf_counter() - start,
+        'cpu_seconds': cpu_seconds() - start_cpu,
+        'rows': rows,
+        'peak_mb': peak_rss_mb(),
+        'setup_mb': start_mb,
+    }
+
+def parse_scale(text):
+    """'6x40x10' -> (countries, markets, years)"""
+    countries, markets, years = (int(part) for part in text.lower().split('x'))
+    return countries, markets, years
+
+def git_commit():
+    """Short hash of the checked-out commit, or '' outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def benchmark_scale(scale, data_dir, stages=STAGE_ORDER, seed=0):
+    """Generate a synthetic dataset and run each stage on it in a fresh interpreter
+
+    A fresh process per stage keeps one stage's imports, caches and memory
+    from flattering the next, and makes peak memory per stage measurable.
+    """
+
+    countries, markets, years = parse_scale(scale)
+    shutil.rmtree(data_dir, ignore_errors=True)
+    raw_rows = write_synthetic_dataset(os.path.join(data_dir, 'raw'), countries, markets, years, seed)
+    os.makedirs(os.path.join(data_dir, 'processed'))
+
+    env = {k: v for k, v in os.environ.items() if k not in ('PRICEPULSE_RAW_DIR', 'PRICEPULSE_PROCESSED_DIR')}
+    env.update(PRICEPULSE_DATA_DIR=data_dir, PRICEPULSE_CACHE='0', MPLBACKEND='Agg',
+               PRICEPULSE_CACHE_DIR=os.path.join(data_dir, 'processed', '.cache'))
+
+    results = []
+    for stage in stages:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--stage', stage,
+                               '--countries', str(countries)], env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Stage {stage} failed at scale {scale}:\n{proc.stderr}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(dict(scale=scale, countries=countries, markets=markets, years=years,
+                            raw_rows=sum(raw_rows.values()), stage=stage, **result))
+    return results
+
+def load_results(path=BENCHMARK_FILE):
+    """Every stored benchmark row"""
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_csv(path, dtype={'commit': str})
+
+def compare_with_previous(results, previous, tolerance=DEFAULT_TOLERANCE):
+    """Attach the last stored time per scale and stage, the change and a regression flag"""
+
+    results = results.copy()
+    if len(previous):
+        last = previous.groupby(['scale', 'stage']).tail(1).set_index(['scale', 'stage'])
+        keys = pd.MultiIndex.from_frame(results[['scale', 'stage']])
+        results['previous_seconds'] = last['seconds'].reindex(keys).to_numpy()
+        results['previous_commit'] = last['commit'].reindex(keys).to_numpy()
+    else:
+        results['previous_seconds'] = float('nan')
+        results['previous_commit'] = None
+    results['change'] = results['seconds'] / results['previous_seconds'] - 1
+    results['regression'] = ((results['change'] > tolerance)
+                             & (results['seconds'] - results['previous_seconds'] > NOISE_FLOOR))
+    return results
+
+def print_results(results):
+    for scale, rows in results.groupby('scale', sort=False):
+        first = rows.iloc[0]
+        print(f"\n BENCHMARK {scale} ({first['countries']} countries x {first['markets']} markets x "
+              f"{first['years']} years, {first['raw_rows']:,} raw rows)")
+        print("=" * 40)
+        for row in rows.itertuples():
+            line = (f"• {row.stage}: {row.seconds:.2f}s (cpu {row.cpu_seconds:.2f}s), "
+                    f"{row.rows:,} rows, peak {row.peak_mb:.0f}MB")
+            if pd.notna(row.previous_seconds):
+                line += f", {row.change:+.0%} vs {row.previous_commit or 'last run'}"
+            if row.regression:
+                line += "  REGRESSION"
+            print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic RTFP data")
+    parser.add_argument('--scales', nargs='*', default=DEFAULT_SCALES,
+                        help="countries x markets x years, e.g. 6x40x10 (default: %(default)s)")
+    parser.add_argument('--stages', nargs='*', choices=STAGE_ORDER, default=STAGE_ORDER,
+                        help="Later stages read earlier stages' outputs, so run a prefix")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', help="Keep the synthetic data here (default: a temporary directory)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown vs the last stored run that counts as a regression")
+    parser.add_argument('--no-save', action='store_true', help="Do not append the results to the history")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--stage', choices=STAGE_ORDER, help=argparse.SUPPRESS)
+    parser.add_argument('--countries', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Worker mode: one stage, one scale, result as a JSON line
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args.countries)))
+        sys.exit(0)
+
+    stages = [s for s in STAGE_ORDER if s in args.stages]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='pricepulse_bench_')
+    rows = []
+    try:
+        for scale in args.scales:
+            rows += benchmark_scale(scale, os.path.join(work_dir, scale), stages, args.seed)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = pd.DataFrame(rows)
+    results.insert(0, 'commit', git_commit())
+    results.insert(0, 'run_at', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    results = compare_with_previous(results, load_results(), args.tolerance)
+    print_results(results)
+
+    if not args.no_save:
+        history = results.drop(columns=['previous_seconds', 'previous_commit', 'change', 'regression'])
+        history.to_csv(BENCHMARK_FILE, mode='a', header=not os.path.exists(BENCHMARK_FILE), index=False)
+        print(f"\nResults appended to {BENCHMARK_FILE}")
+
+    if args.fail_on_regression and results['regression'].any():
+        sys.exit(1)
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.long_format import build_long_table
+from service.price_service import DEFAULT_HOST, _month_label
+
+SERVICE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'service', 'price_service.py')
+
+# The service's target for point lookups under hundreds of concurrent clients
+POINT_P99_TARGET_MS = 10.0
+
+DEFAULT_CLIENTS = 200
+DEFAULT_REQUESTS = 50
+# Mean pause between one client's requests; 200 clients at 100ms offer
+# about 2,000 requests/s. With no pause every client sends back to back and
+# latency is just queueing behind the other clients (clients / throughput).
+DEFAULT_THINK_MS = 100.0
+DEFAULT_PORT = 8799
+
+def point_targets(n, seed=0):
+    """n /price request targets for observed (country, commodity, market, month) cells"""
+    from urllib.parse import urlencode
+
+    long_df = build_long_table(report=False)
+    sample = long_df.sample(n=min(n, len(long_df)), random_state=seed)
+    return [
+        '/price?' + urlencode({'country': row.country_code, 'commodity': row.commodity,
+                               'market': row.mkt_name, 'month': _month_label(int(row.month_ordinal))})
+        for row in sample.itertuples(index=False)
+    ]
+
+async def _request(reader, writer, host, target):
+    """Send one GET on a keep-alive connection and return the body"""
+
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b'\r\n', b''):
+            break
+        if header.lower().startswith(b'content-length:'):
+            length = int(header.split(b':')[1])
+    return await reader.readexactly(length)
+
+async def _client(host, port, targets, latencies, think_ms, rng):
+    """One keep-alive client, pausing a random think time (mean think_ms) between requests"""
+
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for target in targets:
+            if think_ms:
+                await asyncio.sleep(rng.expovariate(1000 / think_ms))
+            start = time.perf_counter()
+            await _request(reader, writer, host, target)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        writer.close()
+
+async def run_load(host, port, targets, clients, requests, think_ms=0.0):
+    """Latencies (ms) of clients x requests point lookups, as seen by the clients"""
+
+    latencies = []
+    rng = random.Random(0)
+    await asyncio.gather(*(_client(host, port, rng.choices(targets, k=requests), latencies, think_ms, rng)
+                           for _ in range(clients)))
+    return np.array(latencies)
+
+async def service_stats(host, port):
+    """The service's own /stats (its latency excludes the network and client)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return json.loads(await _request(reader, writer, host, '/stats'))
+    finally:
+        writer.close()
+
+def start_service(host, port, fmt='csv', timeout=120):
+    """Start the price service in its own process and wait until it answers"""
+
+    proc = subprocess.Popen([sys.executable, SERVICE_SCRIPT, '--host', host, '--port', str(port),
+                             '--format', fmt], stdout=subprocess.DEVNULL)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Price service exited with status {proc.returncode}")
+        try:
+            asyncio.run(run_load(host, port, ['/health'], 1, 1))
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"Price service did not start within {timeout}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Point-lookup latency of the price service under concurrent load")
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS, help="Concurrent keep-alive connections")
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help="Requests per client")
+    parser.add_argument('--think-ms', type=float, default=DEFAULT_THINK_MS,
+                        help="Mean pause between a client's requests (0: back to back)")
+    parser.add_argument('--targets', type=int, default=5000, help="Distinct point lookups to draw from")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--target-ms', type=float, default=POINT_P99_TARGET_MS)
+    args = parser.parse_args()
+
+    targets = point_targets(args.targets)
+    service = start_service(DEFAULT_HOST, args.port, args.format)
+    try:
+        # One untimed pass fills the connection setup and response cache paths
+        asyncio.run(run_load(DEFAULT_HOST, args.port, targets, 1, 100))
+        start = time.perf_counter()
+        latencies = asyncio.run(run_load(DEFAULT_HOST, args.port, targets, args.clients, args.requests,
+                                         args.think_ms))
+        elapsed = time.perf_counter() - start
+        stats = asyncio.run(service_stats(DEFAULT_HOST, args.port))['latency']
+    finally:
+        service.terminate()
+        service.wait()
+
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"\n PRICE SERVICE LOAD ({args.clients} clients x {args.requests} point lookups, "
+          f"{args.think_ms:.0f}ms think time)")
+    print("=" * 40)
+    print(f"• {len(latencies):,} requests in {elapsed:.2f}s ({len(latencies) / elapsed:,.0f}/s)")
+    print(f"• Client p50 {p50:.2f}ms, p99 {p99:.2f}ms, max {latencies.max():.2f}ms")
+    print(f"• Service p50 {stats['p50_ms']:.3f}ms, p99 {stats['p99_ms']:.3f}ms (time inside the handler)")
+    print(f"• Client p99 target {args.target_ms:.0f}ms: {'met' if p99 <= args.target_ms else 'MISSED'}")
+    sys.exit(0 if p99 <= args.target_ms else 1)
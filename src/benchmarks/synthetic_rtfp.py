@@ -0,0 +1,184 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, RTFP_RELEASE
+
+# Local currency of each registry country (the registry does not carry it)
+TEMPLATE_CURRENCIES = {'KEN': 'KES', 'NGA': 'NGN', 'MLI': 'XOF', 'MOZ': 'MZN', 'SEN': 'XOF', 'SOM': 'SOS'}
+
+# Per-item column families of a raw RTFP file, after the plain price column
+ITEM_FIELDS = ['o', 'h', 'l', 'c', 'inflation', 'trust']
+INDEX_ITEM = 'food_price_index'
+
+START_YEAR = 2007
+AVERAGE_MARKET = 'Market Average'
+
+# Price process: log prices follow a country trend plus a per-market random
+# walk and a seasonal cycle; surveys observe a share of the modelled closes
+MONTHLY_DRIFT = 0.005
+MONTHLY_SHOCK = 0.06
+SEASONAL_AMPLITUDE = 0.08
+OBSERVED_SHARE = 0.4
+
+def synthetic_countries(n):
+    """(name, registry entry) for n countries: the registry ones, then numbered copies of them
+
+    Copies keep their template's commodities (and so its cleaner) and get
+    their own ISO3 code, e.g. 'Kenya 2' / 'K06'.
+    """
+
+    templates = [(name, info) for name, info in COUNTRY_REGISTRY.items() if 'template' not in info]
+    countries = []
+    for i in range(n):
+        name, info = templates[i % len(templates)]
+        if i >= len(templates):
+            name = f"{name} {i // len(templates) + 1}"
+            info = dict(info, iso3=f"{info['iso3'][0]}{i:02d}", template=templates[i % len(templates)][0],
+                        processed_file=f"{name.lower().replace(' ', '_')}_prices_clean.csv")
+        countries.append((name, info))
+    return countries
+
+def register_synthetic_countries(n):
+    """Add the copies among the first n synthetic countries to the registry; returns their names"""
+    countries = synthetic_countries(n)
+    for name, info in countries:
+        COUNTRY_REGISTRY.setdefault(name, info)
+    return [name for name, _ in countries]
+
+def raw_file_name(info):
+    """File name the registry expects for a country's raw market file"""
+    return f"{info['iso3']}_RTFP_mkt_{RTFP_RELEASE}.csv"
+
+def _mean_over_markets(values):
+    """NaN-ignoring mean over the market axis (NaN where no market has a value)"""
+    present = ~np.isnan(values)
+    count = present.sum(axis=0)
+    total = np.where(present, values, 0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+def _year_on_year(close):
+    """Percent change over 12 months along the month axis"""
+    inflation = np.full_like(close, np.nan)
+    inflation[:, 12:] = (close[:, 12:] / close[:, :-12] - 1) * 100
+    return inflation
+
+def _bars(close, rng):
+    """(open, high, low) around monthly closes of shape (markets, months, ...)"""
+    first = close[:, :1] * np.exp(rng.normal(0, 0.02, close[:, :1].shape))
+    open_ = np.concatenate([first, close[:, :-1]], axis=1)
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.03, close.shape)))
+    low = np.minimum(open_, close) / np.exp(np.abs(rng.normal(0, 0.03, close.shape)))
+    return open_, high, low
+
+def synthetic_country(name, info, markets, years, seed=0):
+    """One country's raw RTFP market file as a frame, in the layout the cleaners read
+
+    Rows are markets x months (plus the 'Market Average' rows the cleaners
+    drop); items are the country's registry commodities and the food price
+    index, each with its o_/h_/l_/c_/inflation_/trust_ columns.
+    """
+
+    rng = np.random.default_rng([seed, sum(map(ord, info['iso3']))])
+    commodities = info['commodities']
+    dates = pd.date_range(f"{START_YEAR}-01-01", periods=years * 12, freq='MS')
+    n_months, n_items = len(dates), len(commodities)
+
+    # Modelled monthly closes, shape (markets, months, items)
+    base = rng.lognormal(np.log(50), 1.0, n_items)
+    trend = np.cumsum(rng.normal(MONTHLY_DRIFT, MONTHLY_SHOCK / 2, (n_months, n_items)), axis=0)
+    phase = rng.integers(0, 12, n_items)
+    season = SEASONAL_AMPLITUDE * np.sin(2 * np.pi * (dates.month.to_numpy()[:, None] - phase) / 12)
+    walk = np.cumsum(rng.normal(0, MONTHLY_SHOCK, (markets, n_months, n_items)), axis=1)
+    level = rng.normal(0, 0.2, (markets, 1, n_items))
+    close = base * np.exp(level + trend + season + walk)
+
+    open_, high, low = _bars(close, rng)
+    fields = {
+        'o': open_, 'h': high, 'l': low, 'c': close,
+        'inflation': _year_on_year(close),
+        'trust': np.clip(10 - np.abs(rng.normal(0, 0.3, close.shape)), 0, 10),
+    }
+    price = np.where(rng.random(close.shape) < OBSERVED_SHARE, close, np.nan)
+
+    # Food price index: geometric mean of the items relative to their base price
+    index_fields = {f: np.exp(np.log(fields[f] / base).mean(axis=2)) for f in ['o', 'h', 'l', 'c']}
+    index_fields['inflation'] = _year_on_year(index_fields['c'])
+    index_fields['trust'] = fields['trust'].mean(axis=2)
+
+    # The aggregate market row, as in the real files
+    price = np.concatenate([price, _mean_over_markets(price)[None]])
+    fields = {f: np.concatenate([v, _mean_over_markets(v)[None]]) for f, v in fields.items()}
+    index_fields = {f: np.concatenate([v, _mean_over_markets(v)[None]]) for f, v in index_fields.items()}
+
+    n_rows = (markets + 1) * n_months
+    _, capital_lat, capital_lon = info['capital']
+    lat = np.append(np.round(capital_lat + rng.uniform(-4, 4, markets), 2), np.nan)
+    lon = np.append(np.round(capital_lon + rng.uniform(-4, 4, markets), 2), np.nan)
+    regions = max(1, int(np.sqrt(markets)))
+    market_ids = np.arange(markets)
+
+    def per_market(values):
+        return np.repeat(np.asarray(values, dtype=object), n_months)
+
+    weights = np.round(np.concatenate([[1.0], rng.uniform(0.01, 1, n_items - 1)]), 2)
+    columns = {
+        'ISO3': info['iso3'],
+        'country': name,
+        'adm1_name': per_market([f"Region {m % regions + 1}" for m in market_ids] + [np.nan]),
+        'adm2_name': per_market([f"District {m + 1}" for m in market_ids] + [np.nan]),
+        'mkt_name': per_market([f"Market {m + 1:03d}" for m in market_ids] + [AVERAGE_MARKET]),
+        'lat': np.repeat(lat, n_months),
+        'lon': np.repeat(lon, n_months),
+        'geo_id': per_market([f"gid_{info['iso3'].lower()}{m:05d}" for m in market_ids] + [np.nan]),
+        'price_date': np.tile(dates.strftime('%Y-%m-%d').to_numpy(), markets + 1),
+        'year': np.tile(dates.year.to_numpy(), markets + 1),
+        'month': np.tile(dates.month.to_numpy(), markets + 1),
+        'currency': TEMPLATE_CURRENCIES.get(COUNTRY_REGISTRY.get(info.get('template'), info)['iso3'], 'USD'),
+        'components': ', '.join(f"{c} (1 KG, Index Weight = {w:g})" for c, w in zip(commodities, weights)),
+        'start_dense_data': dates[0].strftime('%b %Y'),
+        'last_survey_point': dates[-1].strftime('%b %Y'),
+        'data_coverage': round(OBSERVED_SHARE * 100, 2),
+        'data_coverage_recent': round(OBSERVED_SHARE * 100, 2),
+        'index_confidence_score': round(rng.uniform(0.8, 1.0), 2),
+        'spatially_interpolated': 0,
+    }
+    for i, commodity in enumerate(commodities):
+        columns[commodity] = np.round(price[:, :, i].reshape(n_rows), 2)
+    for i, commodity in enumerate(commodities):
+        for f in ITEM_FIELDS:
+            columns[f"{f}_{commodity}"] = np.round(fields[f][:, :, i].reshape(n_rows), 2)
+    for f in ITEM_FIELDS:
+        columns[f"{f}_{INDEX_ITEM}"] = np.round(index_fields[f].reshape(n_rows), 2)
+
+    return pd.DataFrame(columns)
+
+def write_synthetic_dataset(raw_dir, countries, markets, years, seed=0):
+    """Write raw files for the first `countries` synthetic countries; returns rows per country"""
+
+    os.makedirs(raw_dir, exist_ok=True)
+    rows = {}
+    for name, info in synthetic_countries(countries):
+        df = synthetic_country(name, info, markets, years, seed)
+        df.to_csv(os.path.join(raw_dir, raw_file_name(info)), index=False)
+        rows[name] = len(df)
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic RTFP-shaped raw market files")
+    parser.add_argument('--raw-dir', required=True, help="Where to write the files (not the real raw data)")
+    parser.add_argument('--countries', type=int, default=len(COUNTRY_REGISTRY),
+                        help="Registry countries first, then numbered copies of them")
+    parser.add_argument('--markets', type=int, default=40, help="Markets per country")
+    parser.add_argument('--years', type=int, default=10, help="Years of monthly data from 2007")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = write_synthetic_dataset(args.raw_dir, args.countries, args.markets, args.years, args.seed)
+    print(f"Wrote {len(rows)} raw files ({sum(rows.values()):,} rows) to {args.raw_dir}")
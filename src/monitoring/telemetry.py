@@ -0,0 +1,287 @@
+import os
+import sys
+import json
+import time
+import inspect
+import cProfile
+import argparse
+import functools
+import threading
+import contextlib
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import PROCESSED_DIR
+
+TELEMETRY_DIR = os.environ.get('PRICEPULSE_TELEMETRY_DIR', os.path.join(PROCESSED_DIR, 'telemetry'))
+
+# Set PRICEPULSE_TELEMETRY=1 to record stages; instrumented functions run untouched otherwise
+ENABLED = os.environ.get('PRICEPULSE_TELEMETRY', '0') != '0'
+
+# 'rss' reads the process memory (cheap); 'tracemalloc' traces allocations for an
+# exact per-stage peak but slows Python-heavy stages down noticeably
+MEMORY_MODE = os.environ.get('PRICEPULSE_TELEMETRY_MEMORY', 'rss')
+
+# Stages to profile with cProfile (comma-separated names)
+PROFILE_STAGES = set(filter(None, os.environ.get('PRICEPULSE_PROFILE', '').split(',')))
+
+MB = 1024 * 1024
+
+_local = threading.local()
+_lock = threading.Lock()
+_profile_counts = {}
+_header_written = set()
+
+def enable(memory=None, profile=None):
+    """Turn telemetry on for this process and the processes it starts"""
+
+    global ENABLED, MEMORY_MODE, PROFILE_STAGES
+    ENABLED = True
+    os.environ['PRICEPULSE_TELEMETRY'] = '1'
+    if memory:
+        MEMORY_MODE = os.environ['PRICEPULSE_TELEMETRY_MEMORY'] = memory
+    if profile:
+        PROFILE_STAGES = set(profile)
+        os.environ['PRICEPULSE_PROFILE'] = ','.join(profile)
+    # Fix the run id now so worker processes write to the same manifest
+    return manifest_path()
+
+def run_id():
+    """Id of the current run, shared with child processes through the environment"""
+    rid = os.environ.get('PRICEPULSE_RUN_ID')
+    if rid is None:
+        rid = os.environ['PRICEPULSE_RUN_ID'] = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+    return rid
+
+# Turned on through the environment: fix the run id before any worker
+# process starts, so the whole run writes one manifest
+if ENABLED:
+    run_id()
+
+def manifest_path(rid=None):
+    """JSON-lines manifest of a run"""
+    return os.path.join(TELEMETRY_DIR, f"run_{rid or run_id()}.jsonl")
+
+def _frames(obj):
+    """The DataFrames in obj (a frame, or a list/tuple holding some)"""
+    if isinstance(obj, pd.DataFrame):
+        return [obj]
+    if isinstance(obj, (list, tuple)):
+        return [o for o in obj if isinstance(o, pd.DataFrame)]
+    return []
+
+def _shape(obj):
+    """(rows, columns) of the frames in obj, rows summed; (None, None) if it has none"""
+    frames = _frames(obj)
+    if not frames:
+        return None, None
+    return sum(len(f) for f in frames), max(f.shape[1] for f in frames)
+
+def _rss_mb():
+    """(current, peak) resident memory of this process in MB; current is None off Linux"""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (MB if sys.platform == 'darwin' else 1024)
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError):
+        current = None
+    return current, peak
+
+def _write(event):
+    """Append one JSON line to the run manifest (safe across threads and processes)"""
+
+    path = manifest_path()
+    line = json.dumps(event, default=str) + '\n'
+    with _lock:
+        os.makedirs(TELEMETRY_DIR, exist_ok=True)
+        if os.getpid() not in _header_written:
+            _header_written.add(os.getpid())
+            line = json.dumps({
+                'event': 'process', 'run_id': run_id(), 'pid': os.getpid(), 'argv': sys.argv,
+                'started_at': datetime.now().isoformat(timespec='seconds'), 'memory_mode': MEMORY_MODE,
+            }) + '\n' + line
+        # One write per line on an append-mode file keeps lines whole across processes
+        with open(path, 'a') as f:
+            f.write(line)
+
+class StageRecord:
+    """Measurements of one running stage; use through stage() or @instrumented"""
+
+    def __init__(self, name, inputs=None, detail=None):
+        self.name = name
+        self.detail = detail
+        self.rows_in, self.cols_in = _shape(inputs)
+        self.rows_out = self.cols_out = None
+        self.traced_peak = 0
+        self.profiler = None
+
+    def output(self, result):
+        """Record the rows and columns a stage produced"""
+        self.rows_out, self.cols_out = _shape(result)
+
+    def start(self):
+        stack = _local.__dict__.setdefault('stack', [])
+        self.parent = stack[-1].name if stack else None
+        self.depth = len(stack)
+
+        if MEMORY_MODE == 'tracemalloc':
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            # Hand the enclosing stage its peak so far before resetting the counter
+            if stack:
+                stack[-1].traced_peak = max(stack[-1].traced_peak, peak)
+            tracemalloc.reset_peak()
+            self.traced_start = current
+
+        # cProfile cannot nest, so an enclosing profiled stage covers this one
+        if self.name in PROFILE_STAGES and not any(s.profiler for s in stack):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+        stack.append(self)
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+        self.wall_start, self.cpu_start = time.perf_counter(), time.process_time()
+
+    def finish(self, error=None):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        _local.stack.pop()
+
+        event = {
+            'event': 'stage', 'run_id': run_id(), 'pid': os.getpid(), 'thread': threading.current_thread().name,
+            'stage': self.name, 'detail': self.detail, 'parent': self.parent, 'depth': self.depth,
+            'started_at': self.started_at, 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+            'rows_in': self.rows_in, 'cols_in': self.cols_in, 'rows_out': self.rows_out, 'cols_out': self.cols_out,
+            'status': 'ok' if error is None else 'error',
+        }
+        if error is not None:
+            event['error'] = f"{type(error).__name__}: {error}"
+
+        if MEMORY_MODE == 'tracemalloc' and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            event['peak_mb'] = round((max(self.traced_peak, peak) - self.traced_start) / MB, 3)
+            event['net_mb'] = round((current - self.traced_start) / MB, 3)
+        else:
+            current, peak = _rss_mb()
+            event['rss_mb'] = None if current is None else round(current, 1)
+            event['max_rss_mb'] = round(peak, 1)
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            with _lock:
+                count = _profile_counts[self.name] = _profile_counts.get(self.name, 0) + 1
+            os.makedirs(TELEMETRY_DIR, exist_ok=True)
+            event['profile'] = os.path.join(TELEMETRY_DIR, f"run_{run_id()}_{self.name}_{os.getpid()}_{count}.prof")
+            self.profiler.dump_stats(event['profile'])
+
+        _write(event)
+
+class _NoStage:
+    """Stand-in yielded by stage() while telemetry is off"""
+    def output(self, result):
+        pass
+
+@contextlib.contextmanager
+def stage(name, inputs=None, detail=None):
+    """Time a block as a named stage: with stage('concat', frames) as s: ...; s.output(df)"""
+
+    if not ENABLED:
+        yield _NoStage()
+        return
+
+    record = StageRecord(name, inputs, detail)
+    record.start()
+    try:
+        yield record
+    except BaseException as exc:
+        record.finish(error=exc)
+        raise
+    record.finish()
+
+def instrumented(func=None, *, name=None, detail=None):
+    """Record every call of func as a stage while telemetry is on
+
+    Rows/columns in come from the first DataFrame argument (or list of them),
+    rows/columns out from the result. detail names an argument whose value is
+    stored with the stage, e.g. detail='country'.
+    """
+
+    if func is None:
+        return functools.partial(instrumented, name=name, detail=detail)
+
+    stage_name = name or func.__name__
+    signature = inspect.signature(func) if detail else None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+
+        inputs = next((a for a in list(args) + list(kwargs.values()) if _frames(a)), None)
+        value = signature.bind_partial(*args, **kwargs).arguments.get(detail) if detail else None
+        with stage(stage_name, inputs, value) as record:
+            result = func(*args, **kwargs)
+            record.output(result)
+        return result
+
+    return wrapper
+
+def load_manifest(path=None):
+    """Stage events of a run manifest (default: the latest run) as a frame"""
+
+    if path is None:
+        runs = sorted(f for f in os.listdir(TELEMETRY_DIR) if f.startswith('run_') and f.endswith('.jsonl')) \
+            if os.path.isdir(TELEMETRY_DIR) else []
+        if not runs:
+            raise FileNotFoundError(f"No telemetry runs in {TELEMETRY_DIR}")
+        path = os.path.join(TELEMETRY_DIR, runs[-1])
+
+    with open(path) as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    return pd.DataFrame([e for e in events if e.get('event') == 'stage'])
+
+def stage_summary(events):
+    """Calls, total wall/CPU time, memory and rows per stage, slowest first"""
+
+    memory = 'peak_mb' if 'peak_mb' in events.columns else 'max_rss_mb'
+    summary = events.groupby('stage').agg(
+        calls=('wall_s', 'size'),
+        wall_s=('wall_s', 'sum'),
+        cpu_s=('cpu_s', 'sum'),
+        memory_mb=(memory, 'max'),
+        rows_in=('rows_in', lambda s: s.sum(min_count=1)),
+        rows_out=('rows_out', lambda s: s.sum(min_count=1)),
+        errors=('status', lambda s: int((s == 'error').sum())),
+    )
+    return summary.sort_values('wall_s', ascending=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise a PricePulse telemetry run")
+    parser.add_argument('manifest', nargs='?', help="Run manifest (default: the latest in the telemetry directory)")
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    events = load_manifest(args.manifest)
+    summary = stage_summary(events)
+    memory_label = 'peak alloc' if 'peak_mb' in events.columns else 'max RSS'
+
+    print(f"\n PIPELINE HOT SPOTS ({events['run_id'].iloc[0]}, {len(events)} stage calls)")
+    print("=" * 40)
+    for row in summary.head(args.top).itertuples():
+        rows = ''
+        if pd.notna(row.rows_out):
+            rows = f", rows {row.rows_in:,.0f} -> {row.rows_out:,.0f}" if pd.notna(row.rows_in) else \
+                f", {row.rows_out:,.0f} rows out"
+        errors = f", {row.errors} failed" if row.errors else ''
+        print(f"• {row.Index}: {row.wall_s:.3f}s wall, {row.cpu_s:.3f}s cpu over {row.calls} call(s), "
+              f"{memory_label} {row.memory_mb:.1f}MB{rows}{errors}")
+    profiles = events['profile'].dropna() if 'profile' in events.columns else []
+    for path in profiles:
+        print(f"  profile: {path}")
@@ -0,0 +1,148 @@
+import os
+import json
+
+import pandas as pd
+
+# Data locations: data_sources/ at the repository root unless overridden, so scripts
+# work from any directory. PRICEPULSE_DATA_DIR moves both; the others move one.
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+DATA_DIR = os.environ.get('PRICEPULSE_DATA_DIR', os.path.join(REPO_ROOT, 'data_sources'))
+RAW_DIR = os.environ.get('PRICEPULSE_RAW_DIR', os.path.join(DATA_DIR, 'raw'))
+PROCESSED_DIR = os.environ.get('PRICEPULSE_PROCESSED_DIR', os.path.join(DATA_DIR, 'processed'))
+
+# Snapshot suffix of the World Bank RTFP release we currently work from
+RTFP_RELEASE = '2007_2025-06-30'
+
+# Countries onboarded by dropping their raw file into RAW_DIR; written by
+# processing/rtfp_cleaner.py and merged below the hand-written entries
+DISCOVERED_FILE = os.path.join(PROCESSED_DIR, 'discovered_countries.json')
+
+# One entry per RTFP country. Adding a country means adding an entry here
+# (or dropping its raw file in and running processing/rtfp_cleaner.py).
+# 'capital' is (name, lat, lon), the default hub for distance analysis.
+COUNTRY_REGISTRY = {
+    'Kenya': {
+        'iso3': 'KEN',
+        'region': 'East Africa',
+        'sub_region': 'East Africa',
+        'population_millions': 54.0,
+        'processed_file': 'kenya_prices_clean.csv',
+        'capital': ('Nairobi', -1.29, 36.82),
+        'commodities': ['maize', 'potatoes', 'sorghum'],
+    },
+    'Nigeria': {
+        'iso3': 'NGA',
+        'region': 'West Africa',
+        'sub_region': 'West Africa',
+        'population_millions': 218.0,
+        'processed_file': 'nigeria_prices_clean.csv',
+        'capital': ('Abuja', 9.06, 7.49),
+        'commodities': ['bananas', 'beans', 'eggs', 'fish', 'maize_flour', 'meat_beef', 'meat_goat', 'millet',
+                        'onions', 'oranges', 'rice', 'salt', 'sorghum', 'tomatoes', 'watermelons', 'yam'],
+    },
+    'Mali': {
+        'iso3': 'MLI',
+        'region': 'Sahel',
+        'sub_region': 'West Africa',
+        'population_millions': 22.0,
+        'processed_file': 'mali_prices_clean.csv',
+        'capital': ('Bamako', 12.64, -8.00),
+        'commodities': ['beans', 'groundnuts', 'maize', 'millet', 'rice', 'sorghum'],
+    },
+    'Mozambique': {
+        'iso3': 'MOZ',
+        'region': 'Southern Africa',
+        'sub_region': 'SADC',
+        'population_millions': 32.0,
+        'processed_file': 'mozambique_prices_clean.csv',
+        'capital': ('Maputo', -25.97, 32.57),
+        'commodities': ['cowpeas', 'groundnuts', 'maize', 'maize_meal', 'oil', 'rice', 'sugar', 'wheat_flour'],
+    },
+    'Senegal': {
+        'iso3': 'SEN',
+        'region': 'West Africa',
+        'sub_region': 'Coastal West Africa',
+        'population_millions': 17.0,
+        'processed_file': 'senegal_prices_clean.csv',
+        'capital': ('Dakar', 14.69, -17.44),
+        'commodities': ['maize', 'millet', 'rice', 'sorghum'],
+    },
+    'Somalia': {
+        'iso3': 'SOM',
+        'region': 'Horn of Africa',
+        'sub_region': 'East Africa',
+        'population_millions': 17.0,
+        'processed_file': 'somalia_prices_clean.csv',
+        'capital': ('Mogadishu', 2.05, 45.32),
+        'commodities': ['maize', 'oil', 'rice', 'sorghum'],
+    },
+}
+
+def register_country(name, info):
+    """Add a country to the registry for this process; existing entries are kept"""
+    return COUNTRY_REGISTRY.setdefault(name, info)
+
+def load_discovered_countries(path=DISCOVERED_FILE):
+    """Register the countries recorded in the discovered-countries file"""
+
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        discovered = json.load(f)
+    for name, info in discovered.items():
+        info['capital'] = tuple(info['capital'])
+        register_country(name, info)
+    return discovered
+
+def get_country_info(country):
+    """Look up a registry entry by country name or ISO3 code"""
+
+    if country in COUNTRY_REGISTRY:
+        return COUNTRY_REGISTRY[country]
+
+    for info in COUNTRY_REGISTRY.values():
+        if info['iso3'] == country:
+            return info
+
+    raise KeyError(f"Unknown country: {country}")
+
+def get_country_name(iso3):
+    """Return the registry country name for an ISO3 code"""
+
+    for name, info in COUNTRY_REGISTRY.items():
+        if info['iso3'] == iso3:
+            return name
+
+    raise KeyError(f"Unknown ISO3 code: {iso3}")
+
+def get_processed_path(country):
+    """Path of the cleaned CSV for a country"""
+    return os.path.join(PROCESSED_DIR, get_country_info(country)['processed_file'])
+
+def get_raw_path(country):
+    """Path of the raw RTFP market file for a country"""
+    info = get_country_info(country)
+    # Discovered countries keep the file name they arrived with (any release)
+    return os.path.join(RAW_DIR, info.get('raw_file', f"{info['iso3']}_RTFP_mkt_{RTFP_RELEASE}.csv"))
+
+def add_country_metadata(df, country):
+    """Attach registry metadata columns (country, region, population...) to a frame"""
+
+    info = get_country_info(country)
+    if country not in COUNTRY_REGISTRY:
+        country = get_country_name(country)
+
+    metadata = pd.DataFrame({
+        'country': country,
+        'country_code': info['iso3'],
+        'region': info['region'],
+        'sub_region': info['sub_region'],
+        'population_millions': info['population_millions'],
+    }, index=df.index)
+
+    # Overwrite columns the cleaned file already has (e.g. 'country'), append the rest
+    existing = [col for col in metadata.columns if col in df.columns]
+    df[existing] = metadata[existing]
+    return pd.concat([df, metadata.drop(columns=existing)], axis=1)
+
+load_discovered_countries()
@@ -0,0 +1,285 @@
+import os
+import sys
+import argparse
+from dataclasses import dataclass, replace
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import (COUNTRY_REGISTRY, add_country_metadata, get_country_info,
+                                            get_processed_path)
+from multi_country.stats_engine import PortfolioAccumulator
+from storage.columnar_store import DATASET_PARTITIONS, _country_partitions, _require_pyarrow
+
+# Rows per chunk; memory scales with this, not with the number of countries
+DEFAULT_CHUNKSIZE = 100_000
+
+# Columns add_country_metadata attaches to every row
+METADATA_COLUMNS = ['country', 'country_code', 'region', 'sub_region', 'population_millions']
+
+# How each aggregation's partial results combine across chunks
+AGGREGATIONS = {
+    'size': 'sum',
+    'count': 'sum',
+    'sum': 'sum',
+    'min': 'min',
+    'max': 'max',
+    'first': 'first',
+    'mean': None,     # kept as a sum and a count
+    'nunique': None,  # kept as the distinct (group, value) pairs
+}
+
+@dataclass(frozen=True)
+class LazyFrame:
+    """A deferred scan of the cleaned countries, evaluated one chunk at a time
+
+    select/filter/dropna only narrow the scan: columns are pushed into the
+    readers (usecols, Parquet column projection), countries prune whole
+    files or partitions, and years are pushed into the Parquet filter
+    (CSV chunks are filtered as they are read). Nothing is read until
+    iter_chunks, groupby_agg, portfolio_stats or write_csv runs.
+
+    Counts, minima, maxima, firsts and distinct counts match the pandas
+    path exactly; sums and means are added up per chunk, so they can differ
+    from a single pandas pass in the last bits.
+    """
+    countries: tuple = None
+    columns: tuple = None
+    years: tuple = None
+    notna: tuple = ()
+    fmt: str = 'csv'
+    chunksize: int = DEFAULT_CHUNKSIZE
+
+    def select(self, *columns):
+        """Project the scan onto these columns"""
+        return replace(self, columns=tuple(dict.fromkeys(columns)))
+
+    def filter(self, countries=None, years=None):
+        """Restrict the scan to some countries (names or ISO3) and years"""
+        if countries is not None:
+            names = [c if c in COUNTRY_REGISTRY else _country_name(c) for c in countries]
+            countries = tuple(c for c in (names if self.countries is None else self.countries) if c in names)
+        if years is not None:
+            years = tuple(int(y) for y in years if self.years is None or int(y) in self.years)
+        return replace(self, countries=countries if countries is not None else self.countries,
+                       years=years if years is not None else self.years)
+
+    def dropna(self, *columns):
+        """Keep rows where every one of these columns has a value"""
+        return replace(self, notna=self.notna + columns)
+
+    def scanned_countries(self):
+        """Countries with cleaned data the scan will read, in registry order"""
+        countries = self.countries if self.countries is not None else tuple(COUNTRY_REGISTRY)
+        if self.fmt == 'parquet':
+            present = {iso3 for iso3, _ in _country_partitions('cleaned', countries)}
+            return [c for c in countries if get_country_info(c)['iso3'] in present]
+        return [c for c in countries if os.path.exists(get_processed_path(c))]
+
+    def iter_chunks(self):
+        """Yield the scan as frames of at most chunksize rows, metadata attached"""
+        for country in self.scanned_countries():
+            reader = self._read_parquet(country) if self.fmt == 'parquet' else self._read_csv(country)
+            for chunk in reader:
+                chunk = add_country_metadata(chunk, country)
+                for col in self.notna:
+                    chunk = chunk[chunk[col].notna()] if col in chunk.columns else chunk.iloc[0:0]
+                if self.columns is not None:
+                    chunk = chunk.reindex(columns=list(self.columns))
+                if len(chunk):
+                    yield chunk.reset_index(drop=True)
+
+    def _file_columns(self, header):
+        """Columns to read from a file with this header (projection pushdown)"""
+        if self.columns is None:
+            return list(header)
+        wanted = set(self.columns) | set(self.notna)
+        if self.years is not None:
+            wanted.add('year')
+        return [c for c in header if c in wanted and c not in METADATA_COLUMNS[1:]]
+
+    def _read_csv(self, country):
+        path = get_processed_path(country)
+        usecols = self._file_columns(pd.read_csv(path, nrows=0).columns)
+        parse_dates = ['price_date'] if 'price_date' in usecols else None
+        for chunk in pd.read_csv(path, usecols=usecols, parse_dates=parse_dates, chunksize=self.chunksize):
+            if self.years is not None:
+                chunk = chunk[chunk['year'].isin(self.years)]
+            yield chunk
+
+    def _read_parquet(self, country):
+        pq = _require_pyarrow()
+        import pyarrow.dataset as ds
+
+        country_col, year_col = DATASET_PARTITIONS['cleaned']
+        [(iso3, path)] = _country_partitions('cleaned', [country])
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+        expression = pq.filters_to_expression([(year_col, 'in', list(self.years))]) if self.years else None
+        columns = self._file_columns(dataset.schema.names)
+        for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=self.chunksize):
+            chunk = batch.to_pandas()
+            if year_col in chunk.columns:
+                chunk[year_col] = chunk[year_col].astype('int32')
+            chunk[country_col] = iso3
+            yield chunk
+
+    def count_rows(self):
+        """Rows the scan yields"""
+        return sum(len(chunk) for chunk in self.select('mkt_name').iter_chunks())
+
+    def groupby_agg(self, by, sort=True, **aggs):
+        """Memory-bounded groupby: name=(column, func) for the funcs in AGGREGATIONS
+
+        Each chunk is reduced to one partial row per group and merged into
+        the running partials, so memory grows with the number of groups.
+        With sort=False groups come out in order of first appearance, as in
+        pandas.
+        """
+
+        by = [by] if isinstance(by, str) else list(by)
+        for name, (_, func) in aggs.items():
+            if func not in AGGREGATIONS:
+                raise ValueError(f"Unsupported aggregation for {name}: {func}")
+
+        needed = by + [col for col, _ in aggs.values()]
+        combine = {}
+        partial = None
+        distinct = {}
+        for chunk in self.select(*needed).iter_chunks():
+            grouped = chunk.groupby(by, sort=False, observed=True)
+            part = {}
+            for name, (col, func) in aggs.items():
+                if func == 'mean':
+                    part[f"{name}__sum"] = grouped[col].sum()
+                    part[f"{name}__count"] = grouped[col].count()
+                    combine[f"{name}__sum"] = combine[f"{name}__count"] = 'sum'
+                elif func == 'nunique':
+                    pairs = chunk[by + [col]].dropna(subset=[col]).drop_duplicates()
+                    distinct[name] = pairs if name not in distinct else \
+                        pd.concat([distinct[name], pairs], ignore_index=True).drop_duplicates()
+                    part[f"{name}__rows"] = grouped.size()
+                    combine[f"{name}__rows"] = 'sum'
+                else:
+                    part[name] = grouped.size() if func == 'size' else grouped[col].agg(func)
+                    combine[name] = AGGREGATIONS[func]
+            part = pd.DataFrame(part)
+            if partial is not None:
+                part = pd.concat([partial, part]).groupby(level=by, sort=False).agg(combine)
+            partial = part
+
+        columns = {}
+        for name, (col, func) in aggs.items():
+            if partial is None:
+                columns[name] = pd.Series(dtype='float64')
+            elif func == 'mean':
+                columns[name] = partial[f"{name}__sum"] / partial[f"{name}__count"].where(
+                    partial[f"{name}__count"] > 0)
+            elif func == 'nunique':
+                counts = distinct[name].groupby(by, sort=False, observed=True)[col].size()
+                columns[name] = counts.reindex(partial.index, fill_value=0)
+            else:
+                columns[name] = partial[name]
+        result = pd.DataFrame(columns)
+        return result.sort_index() if sort else result
+
+    def portfolio_stats(self, commodities=None):
+        """PortfolioStats of the scanned rows (same result as compute_portfolio_stats)"""
+        accumulator = PortfolioAccumulator(commodities)
+        wanted = ['country', 'mkt_name', 'price_date', 'region', 'currency', 'population_millions']
+        scan = self.select(*(wanted + accumulator.commodities)) if self.columns is None else self
+        for chunk in scan.iter_chunks():
+            accumulator.add(chunk)
+        return accumulator.result()
+
+    def country_columns(self, country):
+        """Columns one country contributes: its file's columns, then the metadata ones"""
+        if self.fmt == 'parquet':
+            import pyarrow.dataset as ds
+            [(_, path)] = _country_partitions('cleaned', [country])
+            names = ds.dataset(path, format='parquet', partitioning='hive').schema.names
+            names = names + [DATASET_PARTITIONS['cleaned'][0]]
+        else:
+            names = list(pd.read_csv(get_processed_path(country), nrows=0).columns)
+        return list(dict.fromkeys(names + METADATA_COLUMNS))
+
+    def integer_columns(self):
+        """Columns that stay integers over the whole scan
+
+        pd.concat of whole files makes a column float when any file has a
+        gap in it, lacks it or stores it as float; a chunk only sees its own
+        rows. This pass reads every chunk once to settle the column types.
+        """
+
+        countries = self.scanned_countries()
+        integer = None
+        for country in countries:
+            columns = set(self.country_columns(country))
+            integer = columns if integer is None else integer & columns
+            for chunk in replace(self, countries=(country,)).iter_chunks():
+                integer &= {col for col in chunk.columns if pd.api.types.is_integer_dtype(chunk[col])}
+        return integer or set()
+
+    def write_csv(self, path):
+        """Stream the scan into one CSV, the same file pandas writes from the concatenated frame
+
+        Reads the data twice (integer_columns, then the write) so memory
+        stays at one chunk.
+        """
+
+        if self.columns is not None:
+            header = list(self.columns)
+        else:
+            # pd.concat orders columns by first appearance across the frames
+            header = list(dict.fromkeys(col for c in self.scanned_countries() for col in self.country_columns(c)))
+        integer = self.integer_columns()
+
+        rows = 0
+        for chunk in self.iter_chunks():
+            chunk = chunk.reindex(columns=header)
+            for col in chunk.columns:
+                if col not in integer and pd.api.types.is_integer_dtype(chunk[col]):
+                    chunk[col] = chunk[col].astype('float64')
+            chunk.to_csv(path, mode='w' if rows == 0 else 'a', header=(rows == 0), index=False)
+            rows += len(chunk)
+        return rows
+
+def _country_name(iso3):
+    from multi_country.country_registry import get_country_name
+    return get_country_name(iso3)
+
+def scan_cleaned(countries=None, columns=None, years=None, fmt='csv', chunksize=DEFAULT_CHUNKSIZE):
+    """Lazy scan of the cleaned country data (what load_all_countries + pd.concat would hold)"""
+    scan = LazyFrame(fmt=fmt, chunksize=chunksize)
+    if columns is not None:
+        scan = scan.select(*columns)
+    if countries is not None or years is not None:
+        scan = scan.filter(countries=countries, years=years)
+    return scan
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the lazy backend against the pandas path")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    import io
+    import contextlib
+    from multi_country.multi_country_processor import load_all_countries
+    from multi_country.stats_engine import compute_portfolio_stats
+
+    scan = scan_cleaned(fmt=args.format, chunksize=args.chunksize)
+    with contextlib.redirect_stdout(io.StringIO()):
+        frames, _ = load_all_countries(fmt=args.format)
+    df_combined = pd.concat(frames, ignore_index=True)
+
+    print(f"\n LAZY VS PANDAS ({args.format}, chunks of {args.chunksize:,} rows)")
+    print("=" * 40)
+    same = repr(scan.portfolio_stats()) == repr(compute_portfolio_stats(df_combined))
+    print(f"• Portfolio stats identical: {same}")
+    aggs = dict(avg_price=('sorghum', 'mean'), observations=('sorghum', 'count'), markets=('mkt_name', 'nunique'))
+    lazy = scan.dropna('sorghum').groupby_agg('country', **aggs)
+    rows = df_combined[df_combined['sorghum'].notna()].groupby('country').agg(**aggs)
+    exact = lazy[['observations', 'markets']].equals(rows[['observations', 'markets']])
+    close = ((lazy['avg_price'] - rows['avg_price']).abs() <= 1e-9 * rows['avg_price'].abs()).all()
+    print(f"• Sorghum groupby identical: {exact and close} (means within 1e-9)")
@@ -0,0 +1,132 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, PROCESSED_DIR, get_country_info
+from storage.columnar_store import load_cleaned_data
+
+LONG_OUTPUT_FILE = os.path.join(PROCESSED_DIR, 'unified_multi_country.csv')
+
+# Month ordinals count months since January 1970
+ORDINAL_EPOCH_YEAR = 1970
+
+# Columns of the compact fact table
+LONG_COLUMNS = [
+    'country_code', 'mkt_name', 'commodity', 'currency',
+    'month_ordinal', 'lat', 'lon', 'price_local',
+]
+
+def to_month_ordinal(dates):
+    """Convert dates to int32 months since January 1970"""
+    dates = pd.to_datetime(dates)
+    return ((dates.dt.year - ORDINAL_EPOCH_YEAR) * 12 + dates.dt.month - 1).astype('int32')
+
+def from_month_ordinal(ordinals):
+    """Convert month ordinals back to first-of-month timestamps"""
+    ordinals = np.asarray(ordinals, dtype='int64')
+    return pd.to_datetime({
+        'year': ordinals // 12 + ORDINAL_EPOCH_YEAR,
+        'month': ordinals % 12 + 1,
+        'day': 1,
+    })
+
+def melt_country(df, country, commodity_cols=None, price_dtype='float32'):
+    """Melt one cleaned (wide) country frame into long rows with a price"""
+
+    info = get_country_info(country)
+    if commodity_cols is None:
+        commodity_cols = [c for c in info['commodities'] if c in df.columns]
+
+    id_cols = ['mkt_name', 'price_date', 'lat', 'lon', 'currency']
+    long_df = df[id_cols + commodity_cols].melt(
+        id_vars=id_cols, value_vars=commodity_cols,
+        var_name='commodity', value_name='price_local',
+    )
+    long_df = long_df[long_df['price_local'].notna()]
+
+    return pd.DataFrame({
+        'country_code': info['iso3'],
+        'mkt_name': long_df['mkt_name'].to_numpy(),
+        'commodity': long_df['commodity'].to_numpy(),
+        'currency': long_df['currency'].to_numpy(),
+        'month_ordinal': to_month_ordinal(long_df['price_date']).to_numpy(),
+        'lat': long_df['lat'].to_numpy(dtype='float32'),
+        'lon': long_df['lon'].to_numpy(dtype='float32'),
+        'price_local': long_df['price_local'].to_numpy(dtype=price_dtype),
+    })
+
+def encode_long_table(long_df):
+    """Encode the repeated string columns of a long table as categoricals"""
+    for col in ['country_code', 'mkt_name', 'commodity', 'currency']:
+        long_df[col] = long_df[col].astype('category')
+    return long_df[LONG_COLUMNS]
+
+def build_long_table(countries=None, fmt='csv', report=True, price_dtype='float32'):
+    """Melt every cleaned country into one compact long-format fact table
+
+    Returns the table (categorical keys, int32 month ordinals, float32
+    prices) and, when report is set, prints the memory saved compared with
+    concatenating the wide frames.
+    """
+
+    if countries is None:
+        countries = list(COUNTRY_REGISTRY)
+
+    parts = []
+    wide_bytes = 0
+    for country in countries:
+        try:
+            df = load_cleaned_data(country, fmt=fmt)
+        except FileNotFoundError:
+            print(f" Skipping {country}: no cleaned {fmt} data found")
+            continue
+        wide_bytes += df.memory_usage(deep=True).sum()
+        parts.append(melt_country(df, country, price_dtype=price_dtype))
+
+    long_df = encode_long_table(pd.concat(parts, ignore_index=True))
+
+    if report:
+        long_bytes = long_df.memory_usage(deep=True).sum()
+        print(f"Long table: {len(long_df):,} price observations, "
+              f"{long_df['mkt_name'].nunique()} markets, {long_df['commodity'].nunique()} commodities")
+        print(f"Memory: wide frames {wide_bytes / 1e6:.1f} MB -> long table {long_bytes / 1e6:.1f} MB "
+              f"({wide_bytes / max(long_bytes, 1):.1f}x smaller)")
+
+    return long_df
+
+def decode_long_table(long_df):
+    """Expand a compact long table to the readable unified_multi_country schema"""
+
+    country_names = {info['iso3']: name for name, info in COUNTRY_REGISTRY.items()}
+    country_code = long_df['country_code'].astype(str)
+
+    return pd.DataFrame({
+        'country_code': country_code,
+        'country_name': country_code.map(country_names),
+        'mkt_name': long_df['mkt_name'].astype(str),
+        'price_date': from_month_ordinal(long_df['month_ordinal']).dt.strftime('%Y-%m-%d').to_numpy(),
+        'lat': long_df['lat'].astype('float64').round(2),
+        'lon': long_df['lon'].astype('float64').round(2),
+        'commodity': long_df['commodity'].astype(str),
+        'price_local': long_df['price_local'].astype('float64').round(2),
+    })
+
+def save_long_table(long_df, output_file=LONG_OUTPUT_FILE):
+    """Save the long table in the unified_multi_country.csv layout"""
+    decode_long_table(long_df).to_csv(output_file, index=False)
+    print(f"Long-format dataset saved: {output_file}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the long-format unified price table")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    parser.add_argument('--output', default=LONG_OUTPUT_FILE)
+    args = parser.parse_args()
+
+    long_df = build_long_table(fmt=args.format)
+    save_long_table(long_df, args.output)
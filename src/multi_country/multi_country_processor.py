@@ -1,133 +1,197 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import (COUNTRY_REGISTRY, PROCESSED_DIR, add_country_metadata, get_country_info,
+                                            get_country_name, get_processed_path)
+from storage.columnar_store import (load_cleaned_data, dataset_path, write_partitioned, append_partitioned,
+                                    clear_country_partition)
+from analysis.aggregate_cube import cached_cube_from_cleaned, country_commodity_stats
+from multi_country.stats_engine import compute_portfolio_stats
+from multi_country.lazy_backend import DEFAULT_CHUNKSIZE, LazyFrame, scan_cleaned
+from storage.cache import cached_call, print_cache_stats
+from monitoring.telemetry import enable as enable_telemetry, instrumented, manifest_path, stage
+
+UNIFIED_FILE = os.path.join(PROCESSED_DIR, 'unified_six_country.csv')
+SUMMARY_FILE = os.path.join(PROCESSED_DIR, 'six_country_summary.txt')
+OVERVIEW_CHART = os.path.join(PROCESSED_DIR, 'six_country_overview.png')
+
+# 'pandas' holds the combined rows in memory; 'lazy' scans the cleaned files
+# in bounded chunks and gives the same outputs
+BACKENDS = ['pandas', 'lazy']
+DEFAULT_BACKEND = os.environ.get('PRICEPULSE_BACKEND', 'pandas')
+
+@instrumented(detail='country')
+def load_country_data(country, columns=None, years=None, fmt='csv'):
+    """Load a cleaned country file (from the cache if it is unchanged) and add its registry metadata
+
+    Metadata is attached outside the cached read, so it always comes from
+    the current registry.
+    """
+    df = cached_call(load_cleaned_data, country, columns=columns, years=years, fmt=fmt,
+                     input_files=[_country_source(country, fmt)])
+    return add_country_metadata(df, country)
+
+def _country_source(country, fmt):
+    """File or partition directory a country's cleaned data is read from"""
+    if fmt == 'parquet':
+        iso3 = get_country_info(country)['iso3']
+        return os.path.join(dataset_path('cleaned'), f"ISO3={iso3}")
+    return get_processed_path(country)
+
+def _timed_load(country, columns=None, years=None, fmt='csv'):
+    """Load one country (from the cache if its data is unchanged) with its load time"""
+    start = time.perf_counter()
+    df = load_country_data(country, columns=columns, years=years, fmt=fmt)
+    return df, time.perf_counter() - start
+
 def load_kenya_data():
     """Load and process Kenya data"""
-    kenya_file = '../../data_sources/processed/kenya_prices_clean.csv'
-    df_kenya = pd.read_csv(kenya_file)
-    df_kenya['country'] = 'Kenya'
-    df_kenya['country_code'] = 'KEN'
-    df_kenya['region'] = 'East Africa'
-    df_kenya['sub_region'] = 'East Africa'
-    df_kenya['population_millions'] = 54.0
-    return df_kenya
+    return load_country_data('Kenya')
 
 def load_nigeria_data():
     """Load and process Nigeria data"""
-    nigeria_file = '../../data_sources/processed/nigeria_prices_clean.csv'
-    df_nigeria = pd.read_csv(nigeria_file)
-    df_nigeria['country'] = 'Nigeria'
-    df_nigeria['country_code'] = 'NGA'
-    df_nigeria['region'] = 'West Africa'
-    df_nigeria['sub_region'] = 'West Africa'
-    df_nigeria['population_millions'] = 218.0
-    return df_nigeria
+    return load_country_data('Nigeria')
 
 def load_mali_data():
     """Load and process Mali data"""
-    mali_file = '../../data_sources/processed/mali_prices_clean.csv'
-    df_mali = pd.read_csv(mali_file)
-    df_mali['country'] = 'Mali'
-    df_mali['country_code'] = 'MLI'
-    df_mali['region'] = 'Sahel'
-    df_mali['sub_region'] = 'West Africa'
-    df_mali['population_millions'] = 22.0
-    return df_mali
+    return load_country_data('Mali')
 
 def load_mozambique_data():
     """Load and process Mozambique data"""
-    moz_file = '../../data_sources/processed/mozambique_prices_clean.csv'
-    df_moz = pd.read_csv(moz_file)
-    df_moz['country'] = 'Mozambique'
-    df_moz['country_code'] = 'MOZ'
-    df_moz['region'] = 'Southern Africa'
-    df_moz['sub_region'] = 'SADC'
-    df_moz['population_millions'] = 32.0
-    return df_moz
+    return load_country_data('Mozambique')
 
 def load_senegal_data():
     """Load and process Senegal data"""
-    sen_file = '../../data_sources/processed/senegal_prices_clean.csv'
-    df_sen = pd.read_csv(sen_file)
-    df_sen['country'] = 'Senegal'
-    df_sen['country_code'] = 'SEN'
-    df_sen['region'] = 'West Africa'
-    df_sen['sub_region'] = 'Coastal West Africa'
-    df_sen['population_millions'] = 17.0
-    return df_sen
+    return load_country_data('Senegal')
 
 def load_somalia_data():
     """Load and process Somalia data"""
-    som_file = '../../data_sources/processed/somalia_prices_clean.csv'
-    df_som = pd.read_csv(som_file)
-    df_som['country'] = 'Somalia'
-    df_som['country_code'] = 'SOM'
-    df_som['region'] = 'Horn of Africa'
-    df_som['sub_region'] = 'East Africa'
-    df_som['population_millions'] = 17.0
-    return df_som
-
-def process_multi_country_data():
-    """Process all 6 countries and create unified dataset"""
-    
-    print("=== PRICEPULSE 6-COUNTRY EXPANSION ===")
-    print("Loading all country datasets...")
-    
-    # Load existing countries
-    df_kenya = load_kenya_data()
-    df_nigeria = load_nigeria_data()
+    return load_country_data('Somalia')
+
+def _country_available(country, fmt):
+    """Check that a country has cleaned data in the requested format"""
+    return os.path.exists(_country_source(country, fmt))
+
+def load_all_countries(countries=None, workers=None, use_processes=False,
+                       columns=None, years=None, fmt='csv'):
+    """Load every registered country concurrently
+
+    columns/years restrict what is read (only partitions and columns needed
+    are touched in Parquet mode). Countries without cleaned data are skipped
+    with a warning. Returns the frames in registry order plus per-country
+    load times (seconds).
+    """
+    if countries is None:
+        countries = list(COUNTRY_REGISTRY)
+
+    available = []
+    for country in countries:
+        if _country_available(country, fmt):
+            available.append(country)
+        else:
+            print(f" Skipping {country}: no cleaned {fmt} data found")
+
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    frames = {}
+    timings = {}
+
+    with executor_cls(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_timed_load, country, columns, years, fmt): country
+            for country in available
+        }
+        for future in as_completed(futures):
+            country = futures[future]
+            frames[country], timings[country] = future.result()
+            print(f"  {country}: {len(frames[country]):,} rows in {timings[country]:.2f}s")
+
+    return [frames[country] for country in available], timings
+
+def _portfolio_stats(df_combined):
+    """Portfolio statistics of a combined frame or a lazy scan"""
+    if isinstance(df_combined, LazyFrame):
+        return df_combined.portfolio_stats()
+    return compute_portfolio_stats(df_combined)
+
+@instrumented
+def process_multi_country_data(workers=None, use_processes=False, fmt='csv', return_stats=False,
+                               backend='pandas', chunksize=DEFAULT_CHUNKSIZE):
+    """Process all registered countries and create unified dataset
+
+    With return_stats the portfolio statistics computed for the console
+    summary are returned too, so later steps can render from them.
+    backend='lazy' returns a LazyFrame over the cleaned files instead of
+    the concatenated rows; every step below accepts either.
+    """
+    
+    print(f"=== PRICEPULSE {len(COUNTRY_REGISTRY)}-COUNTRY EXPANSION ===")
+    
+    start = time.perf_counter()
+    if backend == 'lazy':
+        df_combined = scan_cleaned(fmt=fmt, chunksize=chunksize)
+        print(f"Scanning {len(df_combined.scanned_countries())} country datasets lazily "
+              f"(chunks of {chunksize:,} rows)...")
+        stats = df_combined.portfolio_stats()
+        print(f"Scanned in {time.perf_counter() - start:.2f}s")
+        _print_combined_summary(stats)
+        if return_stats:
+            return df_combined, stats
+        return df_combined
     
-    # Load new countries
-    df_mali = load_mali_data()
-    df_mozambique = load_mozambique_data()
-    df_senegal = load_senegal_data()
-    df_somalia = load_somalia_data()
+    print("Loading all country datasets...")
+    all_countries, timings = load_all_countries(workers=workers, use_processes=use_processes, fmt=fmt)
+    load_time = time.perf_counter() - start
+    print(f"Loaded {len(all_countries)} countries in {load_time:.2f}s "
+          f"(sum of per-country times: {sum(timings.values()):.2f}s)")
     
     # Combine all datasets
-    all_countries = [df_kenya, df_nigeria, df_mali, df_mozambique, df_senegal, df_somalia]
-    df_combined = pd.concat(all_countries, ignore_index=True)
+    with stage('concat', all_countries) as concat:
+        df_combined = pd.concat(all_countries, ignore_index=True)
+        concat.output(df_combined)
     
     # Convert price_date to datetime for analysis
     df_combined['price_date'] = pd.to_datetime(df_combined['price_date'])
     
+    stats = compute_portfolio_stats(df_combined)
+    _print_combined_summary(stats)
+    
+    if return_stats:
+        return df_combined, stats
+    return df_combined
+
+def _print_combined_summary(stats):
+    """Console summary of the combined dataset"""
+    
     print(f"\n COMBINED DATASET SUMMARY:")
-    print(f"Total observations: {len(df_combined):,}")
-    print(f"Countries: {df_combined['country'].nunique()}")
-    print(f"Markets: {df_combined['mkt_name'].nunique()}")
-    print(f"Total population covered: {df_combined['population_millions'].sum():.0f}M people")
-    print(f"Date range: {df_combined['price_date'].min().strftime('%Y-%m-%d')} to {df_combined['price_date'].max().strftime('%Y-%m-%d')}")
+    print(f"Total observations: {stats.observations:,}")
+    print(f"Countries: {len(stats.countries)}")
+    print(f"Markets: {stats.markets}")
+    print(f"Total population covered: {stats.population_millions:.0f}M people")
+    print(f"Date range: {stats.first_date.strftime('%Y-%m-%d')} to {stats.last_date.strftime('%Y-%m-%d')}")
     
     # Country breakdown
     print(f"\n COUNTRY BREAKDOWN:")
-    country_summary = df_combined.groupby('country').agg({
-        'mkt_name': 'nunique',
-        'population_millions': 'first',
-        'region': 'first',
-        'currency': 'first'
-    }).round(0)
-    
-    for country in df_combined['country'].unique():
-        country_data = df_combined[df_combined['country'] == country]
-        print(f"{country}: {len(country_data):,} obs, {country_data['mkt_name'].nunique()} markets, {country_data['region'].iloc[0]}")
-    
-    return df_combined
+    for country in stats.countries.values():
+        print(f"{country.name}: {country.observations:,} obs, {country.markets} markets, {country.region}")
 
+@instrumented
 def analyze_shared_commodities(df_combined):
     """Analyze commodities shared across countries"""
     
     print(f"\n SHARED COMMODITY ANALYSIS:")
     
-    # Define commodity mappings for each country
+    # Commodity mappings for each country come from the registry
     country_commodities = {
-        'Kenya': ['maize', 'potatoes', 'sorghum'],
-        'Nigeria': ['rice', 'sorghum', 'beans', 'millet', 'yam'],
-        'Mali': ['beans', 'groundnuts', 'maize', 'millet', 'rice', 'sorghum'],
-        'Mozambique': ['cowpeas', 'groundnuts', 'maize', 'maize_meal', 'oil', 'rice', 'sugar', 'wheat_flour'],
-        'Senegal': ['maize', 'millet', 'rice', 'sorghum'],
-        'Somalia': ['maize', 'oil', 'rice', 'sorghum']
+        country: info['commodities'] for country, info in COUNTRY_REGISTRY.items()
     }
     
     # Analyze shared commodities
@@ -136,39 +200,33 @@ def analyze_shared_commodities(df_combined):
     for commodities in country_commodities.values():
         all_commodities.update(commodities)
     
-    for commodity in all_commodities:
+    for commodity in sorted(all_commodities):
         countries_with_commodity = [country for country, commodities in country_commodities.items() 
                                   if commodity in commodities]
         if len(countries_with_commodity) > 1:
             shared_analysis[commodity] = countries_with_commodity
     
     print("Multi-country commodities:")
-    for commodity, countries in sorted(shared_analysis.items(), key=lambda x: len(x[1]), reverse=True):
+    for commodity, countries in sorted(shared_analysis.items(), key=lambda x: (-len(x[1]), x[0])):
         print(f"• {commodity.upper()}: {len(countries)} countries - {', '.join(countries)}")
     
     return shared_analysis
 
-def analyze_regional_patterns(df_combined):
+@instrumented
+def analyze_regional_patterns(df_combined, stats=None):
     """Analyze regional price patterns"""
     
-    print(f"\n REGIONAL ANALYSIS:")
+    if stats is None:
+        stats = _portfolio_stats(df_combined)
     
-    regional_summary = df_combined.groupby('region').agg({
-        'country': 'nunique',
-        'mkt_name': 'nunique',
-        'population_millions': 'sum'
-    }).round(0)
+    print(f"\n REGIONAL ANALYSIS:")
     
     print("Regional coverage:")
-    for region in df_combined['region'].unique():
-        region_data = df_combined[df_combined['region'] == region]
-        countries = region_data['country'].unique()
-        print(f"• {region}: {', '.join(countries)} ({region_data['population_millions'].sum():.0f}M people)")
+    for region in stats.regions.values():
+        print(f"• {region.name}: {', '.join(region.countries)} ({region.population_millions:.0f}M people)")
 
-def generate_cross_country_sorghum_analysis(df_combined):
-    """Analyze sorghum prices across all countries that have it"""
-    
-    print(f"\n SORGHUM CROSS-COUNTRY ANALYSIS:")
+def _sorghum_analysis_from_rows(df_combined):
+    """Average sorghum price per country computed from the combined rows"""
     
     # Countries with sorghum data
     sorghum_countries = []
@@ -177,32 +235,81 @@ def generate_cross_country_sorghum_analysis(df_combined):
         if 'sorghum' in country_data.columns and not country_data['sorghum'].isna().all():
             sorghum_countries.append(country)
     
+    # Create sorghum analysis for each country
+    sorghum_analysis = {}
+    for country in sorghum_countries:
+        country_data = df_combined[df_combined['country'] == country]
+        sorghum_data = country_data[country_data['sorghum'].notna()]
+        
+        if len(sorghum_data) > 0:
+            avg_price = sorghum_data['sorghum'].mean()
+            currency = sorghum_data['currency'].iloc[0]
+            observations = len(sorghum_data)
+            sorghum_analysis[country] = {
+                'avg_price': avg_price,
+                'currency': currency,
+                'observations': observations
+            }
+    
+    return sorghum_analysis
+
+def _sorghum_analysis_from_scan(scan):
+    """_sorghum_analysis_from_rows over a lazy scan, in bounded memory"""
+    
+    stats = scan.dropna('sorghum').groupby_agg('country', sort=False, avg_price=('sorghum', 'mean'),
+                                               currency=('currency', 'first'), observations=('sorghum', 'count'))
+    return {
+        country: {
+            'avg_price': row['avg_price'],
+            'currency': row['currency'],
+            'observations': int(row['observations'])
+        }
+        for country, row in stats.iterrows()
+    }
+
+@instrumented
+def generate_cross_country_sorghum_analysis(df_combined, cube=None):
+    """Analyze sorghum prices across all countries that have it"""
+    
+    print(f"\n SORGHUM CROSS-COUNTRY ANALYSIS:")
+    
+    if cube is not None:
+        # Roll the per-country averages up from the aggregate cube
+        stats = country_commodity_stats(cube, 'sorghum')
+        sorghum_analysis = {
+            get_country_name(iso3): {
+                'avg_price': row['mean'],
+                'currency': row['currency'],
+                'observations': int(row['count'])
+            }
+            for iso3, row in stats.iterrows()
+        }
+    elif isinstance(df_combined, LazyFrame):
+        sorghum_analysis = _sorghum_analysis_from_scan(df_combined)
+    else:
+        sorghum_analysis = _sorghum_analysis_from_rows(df_combined)
+    
+    sorghum_countries = list(sorghum_analysis)
     if sorghum_countries:
         print(f"Sorghum available in: {', '.join(sorghum_countries)}")
         
-        # Create sorghum analysis for each country
-        sorghum_analysis = {}
-        for country in sorghum_countries:
-            country_data = df_combined[df_combined['country'] == country]
-            sorghum_data = country_data[country_data['sorghum'].notna()]
-            
-            if len(sorghum_data) > 0:
-                avg_price = sorghum_data['sorghum'].mean()
-                currency = sorghum_data['currency'].iloc[0]
-                observations = len(sorghum_data)
-                sorghum_analysis[country] = {
-                    'avg_price': avg_price,
-                    'currency': currency,
-                    'observations': observations
-                }
-        
         print("Average sorghum prices by country:")
         for country, data in sorghum_analysis.items():
             print(f"• {country}: {data['avg_price']:.0f} {data['currency']} (from {data['observations']} observations)")
 
-def create_visualizations(df_combined):
+@instrumented
+def create_visualizations(df_combined, stats=None):
     """Create visualizations for the 6-country dataset"""
     
+    # Plotting is imported here so the text-only steps start fast
+    import matplotlib
+    matplotlib.use('Agg')  # charts are saved to files, never shown
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
+    if stats is None:
+        stats = _portfolio_stats(df_combined)
+    
     print(f"\n GENERATING VISUALIZATIONS...")
     
     # Set up the plotting style
@@ -211,118 +318,168 @@ def create_visualizations(df_combined):
     
     # Create figure with subplots
     fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-    fig.suptitle('PricePulse: 6-Country African Food Price Intelligence', fontsize=16, fontweight='bold')
+    fig.suptitle(f'PricePulse: {len(stats.countries)}-Country African Food Price Intelligence',
+                 fontsize=16, fontweight='bold')
+    
+    countries = sorted(stats.countries.values(), key=lambda c: c.observations, reverse=True)
+    regions = sorted(stats.regions.values(), key=lambda r: r.observations, reverse=True)
     
     # 1. Country observation counts
-    country_counts = df_combined['country'].value_counts()
-    axes[0, 0].bar(country_counts.index, country_counts.values)
+    axes[0, 0].bar([c.name for c in countries], [c.observations for c in countries])
     axes[0, 0].set_title('Observations by Country')
     axes[0, 0].set_ylabel('Number of Observations')
     axes[0, 0].tick_params(axis='x', rotation=45)
     
     # 2. Regional distribution
-    region_counts = df_combined['region'].value_counts()
-    axes[0, 1].pie(region_counts.values, labels=region_counts.index, autopct='%1.1f%%')
+    axes[0, 1].pie([r.observations for r in regions], labels=[r.name for r in regions], autopct='%1.1f%%')
     axes[0, 1].set_title('Regional Distribution')
     
     # 3. Market count by country
-    market_counts = df_combined.groupby('country')['mkt_name'].nunique()
-    axes[1, 0].bar(market_counts.index, market_counts.values)
+    by_name = sorted(stats.countries.values(), key=lambda c: c.name)
+    axes[1, 0].bar([c.name for c in by_name], [c.markets for c in by_name])
     axes[1, 0].set_title('Markets by Country')
     axes[1, 0].set_ylabel('Number of Markets')
     axes[1, 0].tick_params(axis='x', rotation=45)
     
     # 4. Population coverage
-    pop_by_region = df_combined.groupby('region')['population_millions'].first()
-    axes[1, 1].bar(pop_by_region.index, pop_by_region.values)
+    by_region = sorted(stats.regions.values(), key=lambda r: r.name)
+    axes[1, 1].bar([r.name for r in by_region], [r.population_millions for r in by_region])
     axes[1, 1].set_title('Population Coverage by Region (Millions)')
     axes[1, 1].set_ylabel('Population (Millions)')
     axes[1, 1].tick_params(axis='x', rotation=45)
     
     plt.tight_layout()
-    plt.savefig('../../data_sources/processed/six_country_overview.png', dpi=300, bbox_inches='tight')
+    plt.savefig(OVERVIEW_CHART, dpi=300, bbox_inches='tight')
+    plt.close(fig)
     print(" Visualization saved: six_country_overview.png")
 
-def save_unified_dataset(df_combined):
+@instrumented
+def save_unified_dataset(df_combined, fmt='csv'):
     """Save the unified 6-country dataset"""
     
-    output_file = '../../data_sources/processed/unified_six_country.csv'
-    df_combined.to_csv(output_file, index=False)
-    print(f"\n UNIFIED DATASET SAVED: {output_file}")
+    if isinstance(df_combined, LazyFrame):
+        return _save_unified_scan(df_combined, fmt)
+    
+    if fmt in ('csv', 'both'):
+        output_file = UNIFIED_FILE
+        df_combined.to_csv(output_file, index=False)
+        print(f"\n UNIFIED DATASET SAVED: {output_file}")
+    if fmt in ('parquet', 'both'):
+        output_file = write_partitioned(df_combined, 'unified')
+        print(f"\n UNIFIED PARQUET DATASET SAVED: {output_file} (partitioned by country and year)")
     print(f"Final dataset: {len(df_combined):,} observations across 6 countries")
 
-def generate_summary_report(df_combined, shared_commodities):
+def _save_unified_scan(scan, fmt='csv'):
+    """save_unified_dataset for a lazy scan: chunks are streamed to the outputs"""
+    
+    if fmt in ('csv', 'both'):
+        rows = scan.write_csv(UNIFIED_FILE)
+        print(f"\n UNIFIED DATASET SAVED: {UNIFIED_FILE}")
+    if fmt in ('parquet', 'both'):
+        for country in scan.scanned_countries():
+            clear_country_partition('unified', country)
+        rows = 0
+        for i, chunk in enumerate(scan.iter_chunks()):
+            append_partitioned(chunk, 'unified', part=i)
+            rows += len(chunk)
+        print(f"\n UNIFIED PARQUET DATASET SAVED: {dataset_path('unified')} (partitioned by country and year)")
+    print(f"Final dataset: {rows:,} observations across 6 countries")
+
+@instrumented
+def generate_summary_report(df_combined, shared_commodities, stats=None):
     """Generate comprehensive summary report"""
     
-    report_file = '../../data_sources/processed/six_country_summary.txt'
+    if stats is None:
+        stats = _portfolio_stats(df_combined)
+    
+    report_file = SUMMARY_FILE
     
     with open(report_file, 'w') as f:
-        f.write("PRICEPULSE: 6-COUNTRY AFRICAN FOOD PRICE INTELLIGENCE SUMMARY\n")
+        f.write(f"PRICEPULSE: {len(stats.countries)}-COUNTRY AFRICAN FOOD PRICE INTELLIGENCE SUMMARY\n")
         f.write("=" * 70 + "\n\n")
         
         f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
         
         f.write("PORTFOLIO OVERVIEW:\n")
-        f.write(f"• Total observations: {len(df_combined):,}\n")
-        f.write(f"• Countries covered: {df_combined['country'].nunique()}\n")
-        f.write(f"• Markets monitored: {df_combined['mkt_name'].nunique()}\n")
-        f.write(f"• Population coverage: {df_combined['population_millions'].sum():.0f}M people\n")
-        f.write(f"• Geographic span: 5 African regions\n")
-        f.write(f"• Date coverage: {df_combined['price_date'].min().strftime('%Y-%m-%d')} to {df_combined['price_date'].max().strftime('%Y-%m-%d')}\n\n")
+        f.write(f"• Total observations: {stats.observations:,}\n")
+        f.write(f"• Countries covered: {len(stats.countries)}\n")
+        f.write(f"• Markets monitored: {stats.markets}\n")
+        f.write(f"• Population coverage: {stats.population_millions:.0f}M people\n")
+        f.write(f"• Geographic span: {len(stats.regions)} African regions\n")
+        f.write(f"• Date coverage: {stats.first_date.strftime('%Y-%m-%d')} to {stats.last_date.strftime('%Y-%m-%d')}\n\n")
         
         f.write("COUNTRY BREAKDOWN:\n")
-        for country in sorted(df_combined['country'].unique()):
-            country_data = df_combined[df_combined['country'] == country]
-            f.write(f"• {country}: {len(country_data):,} observations, {country_data['mkt_name'].nunique()} markets, {country_data['region'].iloc[0]}\n")
+        for name in sorted(stats.countries):
+            country = stats.countries[name]
+            f.write(f"• {name}: {country.observations:,} observations, {country.markets} markets, {country.region}\n")
         
         f.write("\nSHARED COMMODITIES (Cross-Country Analysis Potential):\n")
-        for commodity, countries in sorted(shared_commodities.items(), key=lambda x: len(x[1]), reverse=True):
+        for commodity, countries in sorted(shared_commodities.items(), key=lambda x: (-len(x[1]), x[0])):
             f.write(f"• {commodity.upper()}: {len(countries)} countries - {', '.join(countries)}\n")
         
         f.write("\nREGIONAL COVERAGE:\n")
-        for region in sorted(df_combined['region'].unique()):
-            region_data = df_combined[df_combined['region'] == region]
-            countries = region_data['country'].unique()
-            f.write(f"• {region}: {', '.join(sorted(countries))} ({region_data['population_millions'].sum():.0f}M people)\n")
+        for name in sorted(stats.regions):
+            region = stats.regions[name]
+            f.write(f"• {name}: {', '.join(sorted(region.countries))} ({region.population_millions:.0f}M people)\n")
         
         f.write("\nKEY INSIGHTS:\n")
-        f.write("• Mali provides highest data volume (15,143 observations)\n")
-        f.write("• Senegal has perfect commodity overlap with existing portfolio\n")
-        f.write("• Sorghum available in 5/6 countries - ideal for pan-African analysis\n")
-        f.write("• Mali + Senegal share XOF currency - direct price comparisons possible\n")
-        f.write("• Somalia provides critical conflict zone food security intelligence\n")
-        f.write("• Mozambique opens entirely new Southern Africa market\n")
-        f.write("• 827% increase in observations from original 2-country system\n")
+        for insight in stats.insights:
+            f.write(f"• {insight}\n")
     
     print(f" SUMMARY REPORT SAVED: {report_file}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PricePulse multi-country processor")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of parallel country loaders (default: one per core)")
+    parser.add_argument('--processes', action='store_true',
+                        help="Load countries in a process pool instead of threads")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv',
+                        help="Storage format to read cleaned data from and write the unified dataset to")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="pandas holds every row in memory; lazy streams bounded chunks (same outputs)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk with --backend lazy")
+    parser.add_argument('--telemetry', action='store_true',
+                        help="Record time, memory and rows per stage to a JSON-lines run manifest")
+    parser.add_argument('--profile', metavar='STAGE[,STAGE...]', type=lambda text: text.split(','),
+                        help="Also dump a cProfile of these comma-separated stages (implies --telemetry)")
+    args = parser.parse_args()
+    
+    if args.telemetry or args.profile:
+        enable_telemetry(profile=args.profile)
+    
     # Execute the complete 6-country analysis
     print(" Starting PricePulse 6-Country Analysis...")
     
     # Process all data
-    df_combined = process_multi_country_data()
+    read_fmt = 'parquet' if args.format == 'parquet' else 'csv'
+    df_combined, stats = process_multi_country_data(workers=args.workers, use_processes=args.processes,
+                                                    fmt=read_fmt, return_stats=True, backend=args.backend,
+                                                    chunksize=args.chunksize)
     
     # Analyze shared commodities
     shared_commodities = analyze_shared_commodities(df_combined)
     
     # Regional analysis
-    analyze_regional_patterns(df_combined)
+    analyze_regional_patterns(df_combined, stats=stats)
     
-    # Sorghum cross-country analysis
-    generate_cross_country_sorghum_analysis(df_combined)
+    # Sorghum cross-country analysis, from the cube of the current cleaned files (not the last saved one)
+    generate_cross_country_sorghum_analysis(df_combined, cube=cached_cube_from_cleaned(read_fmt))
     
     # Create visualizations
-    create_visualizations(df_combined)
+    create_visualizations(df_combined, stats=stats)
     
     # Save unified dataset
-    save_unified_dataset(df_combined)
+    save_unified_dataset(df_combined, fmt=args.format)
     
     # Generate summary report
-    generate_summary_report(df_combined, shared_commodities)
+    generate_summary_report(df_combined, shared_commodities, stats=stats)
     
-    print(f"\n SUCCESS! PricePulse now covers 6 countries with {len(df_combined):,} observations!")
+    print_cache_stats()
+    print(f"\n SUCCESS! PricePulse now covers 6 countries with {stats.observations:,} observations!")
     print(" Check data_sources/processed/ for all outputs:")
     print("   • unified_six_country.csv (complete dataset)")
     print("   • six_country_overview.png (visualizations)")
-    print("   • six_country_summary.txt (comprehensive report)")
\ No newline at end of file
+    print("   • six_country_summary.txt (comprehensive report)")
+    if args.telemetry or args.profile:
+        print(f"   • telemetry: {manifest_path()}")
\ No newline at end of file
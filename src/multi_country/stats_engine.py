@@ -0,0 +1,217 @@
+import os
+import sys
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY
+
+@dataclass
+class CountryStats:
+    name: str
+    observations: int
+    markets: int
+    region: str
+    currency: str
+    population_millions: float
+    first_date: pd.Timestamp
+    last_date: pd.Timestamp
+    # Non-null price observations per commodity present in the data
+    commodity_observations: dict = field(default_factory=dict)
+
+@dataclass
+class RegionStats:
+    name: str
+    countries: list
+    observations: int
+    markets: int
+    population_millions: float
+
+@dataclass
+class PortfolioStats:
+    observations: int
+    markets: int
+    population_millions: float
+    first_date: pd.Timestamp
+    last_date: pd.Timestamp
+    countries: dict
+    regions: dict
+    # commodity -> countries that actually report prices for it
+    commodity_countries: dict
+    insights: list = field(default_factory=list)
+
+def _earliest(a, b):
+    """min of two timestamps, ignoring NaT"""
+    return b if pd.isna(a) else a if pd.isna(b) else min(a, b)
+
+def _latest(a, b):
+    """max of two timestamps, ignoring NaT"""
+    return b if pd.isna(a) else a if pd.isna(b) else max(a, b)
+
+class PortfolioAccumulator:
+    """Builds PortfolioStats from row chunks, holding only per-country partials
+
+    Memory is bounded by the number of countries and markets, not rows, so
+    the lazy backend can feed it one chunk at a time. compute_portfolio_stats
+    feeds it a whole frame as a single chunk.
+    """
+
+    def __init__(self, commodities=None):
+        if commodities is None:
+            commodities = sorted({c for info in COUNTRY_REGISTRY.values() for c in info['commodities']})
+        self.commodities = list(commodities)
+        self.observations = 0
+        self.first_date = self.last_date = pd.NaT
+        self.markets = set()
+        self.country_markets = {}
+        self.per_country = {}
+        self.commodity_counts = {}
+
+    def add(self, chunk):
+        """Fold one chunk of combined rows into the partials"""
+
+        self.observations += len(chunk)
+        if len(chunk) == 0:
+            return
+        dates = pd.to_datetime(chunk['price_date'])
+        self.first_date = _earliest(self.first_date, dates.min())
+        self.last_date = _latest(self.last_date, dates.max())
+        self.markets.update(chunk['mkt_name'].dropna().unique())
+
+        commodities = [c for c in self.commodities if c in chunk.columns]
+        grouped = chunk.assign(price_date=dates).groupby('country', sort=False, observed=True)
+        per_country = grouped.agg(
+            observations=('mkt_name', 'size'),
+            region=('region', 'first'),
+            currency=('currency', 'first'),
+            population_millions=('population_millions', 'first'),
+            first_date=('price_date', 'min'),
+            last_date=('price_date', 'max'),
+        )
+        commodity_counts = grouped[commodities].count()
+        pairs = chunk[['country', 'mkt_name']].dropna().drop_duplicates()
+        for name, markets in pairs.groupby('country', observed=True)['mkt_name']:
+            self.country_markets.setdefault(name, set()).update(markets)
+
+        for name, row in per_country.iterrows():
+            seen = self.per_country.get(name)
+            if seen is None:
+                self.per_country[name] = row.to_dict()
+                self.commodity_counts[name] = commodity_counts.loc[name].to_dict()
+                continue
+            seen['observations'] += row['observations']
+            for col in ('region', 'currency', 'population_millions'):
+                if pd.isna(seen[col]):
+                    seen[col] = row[col]
+            seen['first_date'] = _earliest(seen['first_date'], row['first_date'])
+            seen['last_date'] = _latest(seen['last_date'], row['last_date'])
+            counts = self.commodity_counts[name]
+            for c, n in commodity_counts.loc[name].items():
+                counts[c] = counts.get(c, 0) + n
+
+    def result(self):
+        """The finished PortfolioStats"""
+
+        countries = {}
+        for name in sorted(self.per_country):
+            row = self.per_country[name]
+            countries[name] = CountryStats(
+                name=name,
+                observations=int(row['observations']),
+                markets=len(self.country_markets.get(name, ())),
+                region=row['region'],
+                currency=row['currency'],
+                population_millions=float(row['population_millions']),
+                first_date=row['first_date'],
+                last_date=row['last_date'],
+                commodity_observations={c: int(n) for c, n in self.commodity_counts[name].items() if n > 0},
+            )
+
+        regions = {}
+        for country in countries.values():
+            region = regions.setdefault(country.region, RegionStats(country.region, [], 0, 0, 0.0))
+            region.countries.append(country.name)
+            region.observations += country.observations
+            region.markets += country.markets
+            region.population_millions += country.population_millions
+
+        commodity_countries = {}
+        for country in countries.values():
+            for commodity in country.commodity_observations:
+                commodity_countries.setdefault(commodity, []).append(country.name)
+
+        stats = PortfolioStats(
+            observations=self.observations,
+            markets=len(self.markets),
+            population_millions=sum(c.population_millions for c in countries.values()),
+            first_date=self.first_date,
+            last_date=self.last_date,
+            countries=countries,
+            regions=regions,
+            commodity_countries=commodity_countries,
+        )
+        stats.insights = generate_insights(stats)
+        return stats
+
+def compute_portfolio_stats(df_combined, commodities=None):
+    """Compute every portfolio, country and region statistic in one grouped pass
+
+    Region figures are rolled up from the country results rather than by
+    rescanning the rows, so cost stays one pass over the data however many
+    countries and regions there are.
+    """
+
+    accumulator = PortfolioAccumulator(commodities)
+    accumulator.add(df_combined)
+    return accumulator.result()
+
+def generate_insights(stats):
+    """Derive the report's key insights from the computed statistics"""
+
+    insights = []
+    countries = stats.countries
+    if not countries:
+        return insights
+
+    # Data volume leader
+    largest = max(countries.values(), key=lambda c: c.observations)
+    share = largest.observations / stats.observations * 100
+    insights.append(f"{largest.name} provides highest data volume "
+                    f"({largest.observations:,} observations, {share:.0f}% of portfolio)")
+
+    # Most widely available commodities
+    if stats.commodity_countries:
+        widest = max(len(names) for names in stats.commodity_countries.values())
+        top = sorted(c for c, names in stats.commodity_countries.items() if len(names) == widest)
+        insights.append(f"{', '.join(top).capitalize()} available in {widest}/{len(countries)} countries "
+                        f"- widest base for cross-country comparison")
+
+    # Countries whose every commodity is also tracked elsewhere
+    for country in countries.values():
+        tracked = set(country.commodity_observations)
+        shared = {c for c in tracked if len(stats.commodity_countries.get(c, [])) > 1}
+        if len(countries) > 1 and tracked and tracked == shared:
+            insights.append(f"{country.name} has full commodity overlap with the rest of the portfolio")
+
+    # Currency zones that allow direct price comparisons
+    by_currency = {}
+    for country in countries.values():
+        by_currency.setdefault(country.currency, []).append(country.name)
+    for currency, names in sorted(by_currency.items()):
+        if len(names) > 1:
+            insights.append(f"{' + '.join(names)} share {currency} currency - direct price comparisons possible")
+
+    # Regions covered by a single country
+    for region in stats.regions.values():
+        if len(region.countries) == 1:
+            insights.append(f"{region.countries[0]} is the only country covering {region.name}")
+
+    # Most recent data
+    latest = max(countries.values(), key=lambda c: c.last_date)
+    stale = [c.name for c in countries.values() if (latest.last_date - c.last_date).days > 365]
+    if stale:
+        insights.append(f"No prices in the last year of coverage for: {', '.join(sorted(stale))}")
+
+    return insights
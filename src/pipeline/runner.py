@@ -0,0 +1,360 @@
+import os
+import sys
+import json
+import time
+import fnmatch
+import hashlib
+import argparse
+import importlib
+import importlib.util
+import contextlib
+from dataclasses import dataclass, field
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, PROCESSED_DIR, get_processed_path, get_raw_path
+from storage.cache import _atomic_write, file_digest, source_digest
+
+PIPELINE_STATE = os.path.join(PROCESSED_DIR, 'pipeline_state.json')
+LOG_DIR = os.path.join(PROCESSED_DIR, 'pipeline_logs')
+
+# Bump to rebuild every node after a change the code digests cannot see
+PIPELINE_VERSION = 1
+
+@dataclass
+class Node:
+    """One pipeline step: func(*args) reads `inputs` and writes `outputs`
+
+    `modules` are the code the step runs; a change to any of their source
+    files or the in-repo modules they import (the registry included), to an
+    input file, or to the arguments makes the node stale.
+    """
+    name: str
+    func: str
+    args: tuple = ()
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    deps: list = field(default_factory=list)
+    modules: list = field(default_factory=list)
+
+# Step functions (run in worker processes; imports stay inside so the planner starts fast)
+
+def clean_country(country):
+    """Raw RTFP file -> cleaned CSV with the country's cleaner"""
+    import pandas as pd
+    from multi_country.country_registry import get_country_info
+    from processing.rtfp_cleaner import save_discovered_countries
+    from pricepulse import CLEANERS, GENERIC_CLEANER
+
+    # Planning registers new raw-file countries in memory only; cleaning one
+    # records them all, so clean nodes running in parallel never drop each other's
+    if 'raw_file' in get_country_info(country):
+        save_discovered_countries([c for c, info in COUNTRY_REGISTRY.items() if 'raw_file' in info])
+
+    module, func = CLEANERS.get(get_country_info(country).get('template', country), GENERIC_CLEANER)
+    df_clean = getattr(importlib.import_module(module), func)(pd.read_csv(get_raw_path(country)))
+    # Star tables are shared by every country, so their own node writes them
+    df_clean.to_csv(get_processed_path(country), index=False)
+
+def build_star_tables():
+    from storage.star_schema import build_star
+    build_star()
+
+def unify():
+    """Unified dataset, text analyses and the summary report"""
+    from multi_country.multi_country_processor import (analyze_regional_patterns, analyze_shared_commodities,
+                                                       generate_summary_report, process_multi_country_data,
+                                                       save_unified_dataset)
+
+    df_combined, stats = process_multi_country_data(return_stats=True)
+    shared_commodities = analyze_shared_commodities(df_combined)
+    analyze_regional_patterns(df_combined, stats=stats)
+    save_unified_dataset(df_combined)
+    generate_summary_report(df_combined, shared_commodities, stats=stats)
+
+def overview_chart():
+    import pandas as pd
+    from multi_country.multi_country_processor import UNIFIED_FILE, create_visualizations
+    create_visualizations(pd.read_csv(UNIFIED_FILE, parse_dates=['price_date']))
+
+def aggregate_cube():
+    from analysis.aggregate_cube import build_cube_from_cleaned, save_cube
+    save_cube(build_cube_from_cleaned())
+
+def seasonal():
+    from analysis.aggregate_cube import load_cube
+    from analysis.seasonality import save_seasonal_profiles, seasonal_profiles
+    save_seasonal_profiles(seasonal_profiles(load_cube()))
+
+def volatility():
+    from analysis.volatility import VOLATILITY_FILE, load_ohlc, volatility_ranking
+    series, _, ohlc = load_ohlc()
+    volatility_ranking(series, ohlc).round(4).to_csv(VOLATILITY_FILE, index=False)
+
+def basket_index():
+    from analysis.basket_index import run_basket_index
+    run_basket_index(rebuild=True)
+
+def warehouse():
+    from storage.warehouse import sync_warehouse
+    sync_warehouse()
+
+def kenya_analysis():
+    from analysis.price_analyzer import run_analysis
+    run_analysis(charts=True)
+
+def charts():
+    from analysis.chart_renderer import render_all
+    render_all()
+
+def build_dag():
+    """Every pipeline node, in an order where dependencies come first
+
+    Output paths are spelled out here rather than imported so planning does
+    not load the plotting modules.
+    """
+
+    from analysis.aggregate_cube import CUBE_FILE
+    from analysis.seasonality import SEASONAL_FILE
+    from analysis.volatility import VOLATILITY_FILE
+    from analysis.basket_index import BASKET_INDEX_FILE, BASKET_STATE_FILE
+    from multi_country.multi_country_processor import OVERVIEW_CHART, SUMMARY_FILE, UNIFIED_FILE
+    from storage.star_schema import STAR_DIR
+    from storage.warehouse import WAREHOUSE_FILE
+    from pricepulse import CLEANERS, GENERIC_CLEANER
+
+    from processing.rtfp_cleaner import register_raw_countries
+
+    # A raw file dropped in for a new country gets its own clean node
+    # (registered in memory; planning writes nothing)
+    register_raw_countries(persist=False)
+    runner = ['pipeline.runner']
+    countries = list(COUNTRY_REGISTRY)
+    cleaned = [get_processed_path(c) for c in countries]
+    clean_nodes = [f"clean:{c}" for c in countries]
+
+    nodes = [
+        Node(f"clean:{c}", 'clean_country', (c,), [get_raw_path(c)], [get_processed_path(c)],
+             modules=runner + ['processing.rtfp_cleaner',
+                               CLEANERS.get(COUNTRY_REGISTRY[c].get('template', c), GENERIC_CLEANER)[0]])
+        for c in countries
+    ]
+    nodes += [
+        Node('star', 'build_star_tables', (), cleaned, [STAR_DIR], clean_nodes,
+             runner + ['storage.star_schema']),
+        Node('unify', 'unify', (), cleaned, [UNIFIED_FILE, SUMMARY_FILE], clean_nodes,
+             runner + ['multi_country.multi_country_processor', 'multi_country.stats_engine',
+                       'storage.columnar_store']),
+        Node('overview', 'overview_chart', (), [UNIFIED_FILE], [OVERVIEW_CHART], ['unify'],
+             runner + ['multi_country.multi_country_processor', 'multi_country.stats_engine']),
+        Node('cube', 'aggregate_cube', (), cleaned, [CUBE_FILE], clean_nodes,
+             runner + ['analysis.aggregate_cube', 'multi_country.long_format']),
+        Node('seasonality', 'seasonal', (), [CUBE_FILE], [SEASONAL_FILE], ['cube'],
+             runner + ['analysis.seasonality']),
+        Node('volatility', 'volatility', (), cleaned, [VOLATILITY_FILE], clean_nodes,
+             runner + ['analysis.volatility', 'storage.columnar_store']),
+        Node('basket_index', 'basket_index', (), cleaned, [BASKET_INDEX_FILE, BASKET_STATE_FILE], clean_nodes,
+             runner + ['analysis.basket_index', 'analysis.aggregate_cube', 'multi_country.long_format']),
+        Node('warehouse', 'warehouse', (), cleaned, [WAREHOUSE_FILE], clean_nodes,
+             runner + ['storage.warehouse']),
+        Node('kenya_analysis', 'kenya_analysis', (),
+             [get_processed_path('Kenya'), CUBE_FILE, SEASONAL_FILE],
+             [os.path.join(PROCESSED_DIR, 'maize_price_trends.png'),
+              os.path.join(PROCESSED_DIR, 'average_prices_by_market.png')],
+             ['clean:Kenya', 'cube', 'seasonality'],
+             runner + ['analysis.price_analyzer', 'analysis.volatility', 'analysis.spatial_index']),
+        Node('charts', 'charts', (), cleaned, [os.path.join(PROCESSED_DIR, 'charts')], clean_nodes,
+             runner + ['analysis.chart_renderer', 'analysis.aggregate_cube']),
+    ]
+    return {node.name: node for node in nodes}
+
+def _digest(path):
+    return file_digest(path) if os.path.exists(path) else 'missing'
+
+def _source_digest(module):
+    """Digest of a module's source and every in-repo module it imports, found without importing it
+
+    The runner itself is the exception: its step functions import every
+    stage, so only its own file counts and each node lists what its step uses.
+    """
+    spec = importlib.util.find_spec(module)
+    if not (spec and spec.origin):
+        return 'missing'
+    return _digest(spec.origin) if module == 'pipeline.runner' else source_digest((spec.origin,))
+
+def node_key(node):
+    """Content hash of everything a node's outputs depend on"""
+    h = hashlib.sha256(f"v{PIPELINE_VERSION}|{node.name}|{node.func}|{node.args!r}".encode())
+    for module in node.modules:
+        h.update(f"|{module}={_source_digest(module)}".encode())
+    for path in node.inputs:
+        h.update(f"|{path}={_digest(path)}".encode())
+    return h.hexdigest()
+
+def load_state(path=PIPELINE_STATE):
+    """Key, time and duration of every node's last successful run"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_state(state, path=PIPELINE_STATE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _atomic_write(path, json.dumps(state, indent=2, sort_keys=True).encode())
+
+def select(dag, only=None, start=None):
+    """Names of the nodes to consider: `only` exactly, or `start` and everything downstream of it
+
+    Patterns match node names, their prefix before ':' ('clean' is every
+    clean:<country>), or shell-style globs.
+    """
+
+    def matches(name, patterns):
+        return any(name == p or name.split(':')[0] == p or fnmatch.fnmatch(name, p) for p in patterns)
+
+    if only:
+        chosen = {name for name in dag if matches(name, only)}
+    elif start:
+        chosen = {name for name in dag if matches(name, start)}
+        for name in dag:  # dependencies come first, so one pass closes the set
+            if any(dep in chosen for dep in dag[name].deps):
+                chosen.add(name)
+    else:
+        chosen = set(dag)
+    unknown = [p for p in (only or start or []) if not any(matches(name, [p]) for name in dag)]
+    if unknown:
+        raise KeyError(f"No pipeline node matches: {', '.join(unknown)}")
+    return [name for name in dag if name in chosen]
+
+def _produced(dag):
+    return {path for node in dag.values() for path in node.outputs}
+
+def node_status(node, state, produced, force=False, upstream_running=False):
+    """(action, reason) for a node whose upstream nodes have settled"""
+
+    missing = [p for p in node.inputs if p not in produced and not os.path.exists(p)]
+    if missing:
+        return 'missing', f"no input {os.path.basename(missing[0])}"
+    if force:
+        return 'run', 'forced'
+    if upstream_running:
+        return 'run', 'upstream will run'
+    if not all(os.path.exists(p) for p in node.outputs):
+        return 'run', 'outputs missing'
+    if state.get(node.name, {}).get('key') != node_key(node):
+        return 'run', 'inputs or code changed'
+    return 'skip', 'up to date'
+
+def plan(dag, names, force=False):
+    """(name, action, reason) for the selected nodes, in run order, without running anything
+
+    A node below one that will run is planned to run too; at run time it is
+    still skipped if its upstream outputs come out unchanged.
+    """
+
+    state, produced = load_state(), _produced(dag)
+    will_run, steps = set(), []
+    for name in names:
+        node = dag[name]
+        action, reason = node_status(node, state, produced, force, any(d in will_run for d in node.deps))
+        if action == 'run':
+            will_run.add(name)
+        steps.append((name, action, reason))
+    return steps
+
+def execute(name):
+    """Run one node in this process with its output going to its log file"""
+
+    node = build_dag()[name]
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, name.replace(':', '_') + '.log')
+    start = time.perf_counter()
+    with open(log_path, 'w') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        getattr(sys.modules[__name__], node.func)(*node.args)
+    return time.perf_counter() - start
+
+def run_pipeline(names=None, force=False, workers=None):
+    """Run the selected nodes, independent ones in parallel, skipping those that are up to date
+
+    A node is submitted once its dependencies have finished, with its key
+    taken from the inputs as they are then, so a node whose upstream
+    rewrote identical outputs is still skipped. Returns {name: (action, detail)}.
+    """
+
+    dag = build_dag()
+    names = list(dag) if names is None else names
+    selected = set(names)
+    state, produced = load_state(), _produced(dag)
+    waiting = {name: {d for d in dag[name].deps if d in selected} for name in names}
+    results, running = {}, {}
+
+    def settle(name, action, detail):
+        results[name] = (action, detail)
+        print(f"• {name}: {action} ({detail})", flush=True)
+        for deps in waiting.values():
+            deps.discard(name)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while len(results) < len(names):
+            ready = [n for n in names if n not in results and n not in running and not waiting[n]]
+            for name in ready:
+                failed = [d for d in dag[name].deps if results.get(d, ('',))[0] in ('failed', 'blocked')]
+                if failed:
+                    settle(name, 'blocked', f"{failed[0]} did not finish")
+                    continue
+                action, reason = node_status(dag[name], state, produced, force)
+                if action != 'run':
+                    settle(name, 'skipped', reason)
+                    continue
+                # Keyed on the inputs as they are now that every dependency has finished
+                running[name] = (pool.submit(execute, name), node_key(dag[name]))
+
+            if not running:
+                continue  # settled nodes may have released others
+
+            done, _ = wait([future for future, _ in running.values()], return_when=FIRST_COMPLETED)
+            for name in [n for n, (future, _) in running.items() if future in done]:
+                future, key = running.pop(name)
+                try:
+                    seconds = future.result()
+                except Exception as exc:
+                    settle(name, 'failed', f"{type(exc).__name__}: {exc}")
+                    continue
+                state[name] = {'key': key, 'seconds': round(seconds, 3),
+                               'finished_at': datetime.now().isoformat(timespec='seconds')}
+                save_state(state)
+                settle(name, 'ran', f"{seconds:.1f}s")
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the PricePulse pipeline, skipping up-to-date steps")
+    parser.add_argument('--only', nargs='+', metavar='NODE', help="Run just these nodes (e.g. clean unify)")
+    parser.add_argument('--from', dest='start', nargs='+', metavar='NODE',
+                        help="Run these nodes and everything downstream of them")
+    parser.add_argument('--dry-run', action='store_true', help="Show what would run and why")
+    parser.add_argument('--force', action='store_true', help="Run selected nodes even if up to date")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel nodes (default: one per core)")
+    args = parser.parse_args()
+
+    dag = build_dag()
+    names = select(dag, args.only, args.start)
+
+    if args.dry_run:
+        print(f"\n PIPELINE PLAN ({len(names)} of {len(dag)} nodes)")
+        print("=" * 40)
+        for name, action, reason in plan(dag, names, args.force):
+            print(f"• {name}: {action} ({reason})")
+        sys.exit(0)
+
+    start = time.perf_counter()
+    print(f"\n PIPELINE RUN ({len(names)} of {len(dag)} nodes, logs in {LOG_DIR})")
+    print("=" * 40)
+    results = run_pipeline(names, args.force, args.workers)
+    counts = {}
+    for action, _ in results.values():
+        counts[action] = counts.get(action, 0) + 1
+    print(f"\n{', '.join(f'{n} {a}' for a, n in sorted(counts.items()))} in {time.perf_counter() - start:.1f}s")
+    sys.exit(1 if counts.get('failed') or counts.get('blocked') else 0)
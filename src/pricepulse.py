@@ -0,0 +1,239 @@
+"""PricePulse command line: python src/pricepulse.py <command> [options]
+
+Only argparse runs before a command is chosen; each command imports what it
+needs when it runs, and only `render` loads the plotting libraries.
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SRC_DIR)
+
+# Cleaner module and function per registry country
+CLEANERS = {
+    'Kenya': ('processing.data_cleaner', 'clean_kenya_data'),
+    'Nigeria': ('processing.clean_nigeria', 'clean_nigeria_data'),
+    'Mali': ('processing.clean_mali', 'clean_mali_data'),
+    'Mozambique': ('processing.clean_mozambique', 'clean_mozambique_data'),
+    'Senegal': ('processing.clean_senegal', 'clean_senegal_data'),
+    'Somalia': ('processing.clean_somalia', 'clean_somalia_data'),
+}
+
+# Countries without their own cleaner (e.g. discovered from a raw file drop)
+GENERIC_CLEANER = ('processing.rtfp_cleaner', 'clean_rtfp_data')
+
+# Modules each command imports; `startup` measures these
+COMMAND_MODULES = {
+    'clean': ['storage.columnar_store', 'storage.cache', 'processing.streaming_cleaner', 'processing.rtfp_cleaner'],
+    'unify': ['multi_country.multi_country_processor'],
+    'summarize': ['analysis.aggregate_cube'],
+    'analyze': ['analysis.price_analyzer'],
+    'render': ['analysis.chart_renderer'],
+    'run': ['pipeline.runner'],
+}
+
+# Commands allowed to load matplotlib
+PLOTTING_COMMANDS = {'render'}
+
+# Seconds from interpreter start to a non-plotting command being ready to run
+# (pandas alone is about half of it; render is about 1.5s with matplotlib)
+STARTUP_BUDGET = 1.0
+
+def load_command(name):
+    """Import the modules a command runs on"""
+    for module in COMMAND_MODULES[name]:
+        importlib.import_module(module)
+
+def cmd_clean(args):
+    from multi_country.country_registry import COUNTRY_REGISTRY, get_country_name, get_raw_path
+    from processing.rtfp_cleaner import clean_all, discover_commodities, register_raw_countries
+    from processing.streaming_cleaner import stream_clean_rtfp
+
+    if not args.stream:
+        # Every country with the generic cleaner, one worker process per country
+        for r in clean_all(args.countries or None, args.workers, args.format):
+            new = ' (newly registered)' if r['new'] else ''
+            print(f"{r['country']}{new}: {r['rows']:,} rows across {r['markets']} markets saved")
+        return
+
+    register_raw_countries()
+    for country in args.countries or list(COUNTRY_REGISTRY):
+        if country not in COUNTRY_REGISTRY:
+            country = get_country_name(country)
+        raw_path = get_raw_path(country)
+        if not os.path.exists(raw_path):
+            print(f" Skipping {country}: no raw file at {raw_path}")
+            continue
+        stream_clean_rtfp(country, discover_commodities(raw_path), chunksize=args.chunksize, fmt=args.format)
+
+def cmd_unify(args):
+    from multi_country.multi_country_processor import (analyze_shared_commodities, generate_summary_report,
+                                                       process_multi_country_data, save_unified_dataset)
+    from storage.cache import print_cache_stats
+
+    read_fmt = 'parquet' if args.format == 'parquet' else 'csv'
+    df_combined, stats = process_multi_country_data(workers=args.workers, fmt=read_fmt, return_stats=True,
+                                                    backend=args.backend, chunksize=args.chunksize)
+    shared_commodities = analyze_shared_commodities(df_combined)
+    save_unified_dataset(df_combined, fmt=args.format)
+    generate_summary_report(df_combined, shared_commodities, stats=stats)
+    print_cache_stats()
+
+def cmd_summarize(args):
+    from analysis.aggregate_cube import cached_cube_from_cleaned, rollup
+    from multi_country.long_format import from_month_ordinal
+
+    cube = cached_cube_from_cleaned(args.format)
+    if args.commodity:
+        cube = cube[cube['commodity'] == args.commodity]
+        if len(cube) == 0:
+            print(f"No prices for {args.commodity}")
+            return
+
+    print(f"\n PRICEPULSE SUMMARY{f' ({args.commodity})' if args.commodity else ''}")
+    print("=" * 40)
+    for iso3, cells in cube.groupby('country_code', sort=True):
+        first, last = from_month_ordinal(cells['month_ordinal'].agg(['min', 'max']))
+        print(f"• {iso3}: {int(cells['count'].sum()):,} prices, {cells['mkt_name'].nunique()} markets, "
+              f"{cells['commodity'].nunique()} commodities, {first:%Y-%m} to {last:%Y-%m}")
+        if args.commodity:
+            latest = cells[cells['month_ordinal'] == cells['month_ordinal'].max()]
+            mean = rollup(latest, ['currency'])['mean']
+            for currency, price in mean.items():
+                print(f"    latest mean {price:,.2f} {currency} across {latest['mkt_name'].nunique()} markets")
+
+def cmd_analyze(args):
+    from analysis.price_analyzer import run_analysis
+    run_analysis(charts=args.charts, fmt=args.format)
+
+def cmd_render(args):
+    from analysis.chart_renderer import CHART_DIR, render_all
+
+    start = time.perf_counter()
+    rendered, skipped = render_all(args.countries, args.commodities, args.format, args.workers,
+                                   args.dpi, force=args.force)
+    print(f"Rendered {len(rendered)} charts, {len(skipped)} unchanged, "
+          f"in {time.perf_counter() - start:.1f}s: {CHART_DIR}")
+
+def cmd_run(args):
+    from pipeline.runner import build_dag, plan, run_pipeline, select
+
+    dag = build_dag()
+    names = select(dag, args.only, args.start)
+    if args.dry_run:
+        for name, action, reason in plan(dag, names, args.force):
+            print(f"• {name}: {action} ({reason})")
+        return
+    results = run_pipeline(names, args.force, args.workers)
+    if any(action in ('failed', 'blocked') for action, _ in results.values()):
+        sys.exit(1)
+
+def measure_startup(command, repeat=3):
+    """Best wall time of a fresh interpreter importing a command, and whether it loaded matplotlib"""
+
+    code = (f"import sys; sys.path.insert(0, {SRC_DIR!r}); import pricepulse; "
+            f"pricepulse.load_command({command!r}); print('matplotlib' in sys.modules)")
+    best, plotting = float('inf'), False
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        best = min(best, time.perf_counter() - start)
+        plotting = result.stdout.strip() == 'True'
+    return best, plotting
+
+def cmd_startup(args):
+    """Check every command against the startup budget; exit status 1 if one is over"""
+
+    print(f"\n STARTUP TIMES (budget {args.budget:.2f}s, plotting commands exempt)")
+    print("=" * 40)
+    failed = []
+    for command in COMMAND_MODULES:
+        seconds, plotting = measure_startup(command, args.repeat)
+        exempt = command in PLOTTING_COMMANDS
+        ok = exempt or (seconds <= args.budget and not plotting)
+        if not ok:
+            failed.append(command)
+        note = ' (loads matplotlib)' if plotting else ''
+        print(f"• {command}: {seconds:.3f}s{note} {'exempt' if exempt else 'ok' if ok else 'OVER BUDGET'}")
+    if failed:
+        sys.exit(1)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='pricepulse', description="PricePulse food price pipeline")
+    parser.add_argument('--data-dir', help="Root holding raw/ and processed/ (default: data_sources/)")
+    parser.add_argument('--raw-dir', help="Raw RTFP files directory")
+    parser.add_argument('--processed-dir', help="Processed outputs directory")
+    parser.add_argument('--telemetry', action='store_true',
+                        help="Record time, memory and rows per stage to a JSON-lines run manifest")
+    parser.add_argument('--profile', metavar='STAGE[,STAGE...]', type=lambda text: text.split(','),
+                        help="Also dump a cProfile of these comma-separated stages (implies --telemetry)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add(name, func, help_text, formats=('csv', 'parquet')):
+        sub = commands.add_parser(name, help=help_text)
+        sub.set_defaults(func=func)
+        if formats:
+            sub.add_argument('--format', choices=list(formats), default='csv')
+        return sub
+
+    sub = add('clean', cmd_clean, "Clean raw RTFP files", formats=('csv', 'parquet', 'both'))
+    sub.add_argument('countries', nargs='*', help="Default: every country in the registry or the raw directory")
+    sub.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    sub.add_argument('--stream', action='store_true', help="Clean in bounded chunks, one country at a time")
+    sub.add_argument('--chunksize', type=int, default=50_000, help="Rows per chunk with --stream")
+
+    sub = add('unify', cmd_unify, "Build the unified multi-country dataset and report",
+              formats=('csv', 'parquet', 'both'))
+    sub.add_argument('--workers', type=int, default=None)
+    sub.add_argument('--backend', choices=['pandas', 'lazy'], default=os.environ.get('PRICEPULSE_BACKEND', 'pandas'),
+                     help="lazy streams bounded chunks instead of holding every row (same outputs)")
+    sub.add_argument('--chunksize', type=int, default=100_000, help="Rows per chunk with --backend lazy")
+
+    sub = add('summarize', cmd_summarize, "Quick text summary per country")
+    sub.add_argument('--commodity', help="Restrict to one commodity and show its latest mean price")
+
+    sub = add('analyze', cmd_analyze, "Kenya maize insights (text; --charts to also save its charts)")
+    sub.add_argument('--charts', action='store_true')
+
+    sub = add('render', cmd_render, "Render the full chart set headlessly", formats=('csv', 'parquet'))
+    sub.add_argument('--countries', nargs='*')
+    sub.add_argument('--commodities', nargs='*')
+    sub.add_argument('--workers', type=int, default=None)
+    sub.add_argument('--dpi', type=int, default=150)
+    sub.add_argument('--force', action='store_true')
+
+    sub = add('run', cmd_run, "Run the whole pipeline, skipping up-to-date steps", formats=None)
+    sub.add_argument('--only', nargs='+', metavar='NODE')
+    sub.add_argument('--from', dest='start', nargs='+', metavar='NODE')
+    sub.add_argument('--dry-run', action='store_true')
+    sub.add_argument('--force', action='store_true')
+    sub.add_argument('--workers', type=int, default=None)
+
+    sub = add('startup', cmd_startup, "Measure command startup times against the budget", formats=None)
+    sub.add_argument('--budget', type=float, default=STARTUP_BUDGET)
+    sub.add_argument('--repeat', type=int, default=3)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Data roots are read when the registry is first imported, which happens
+    # inside the command, so setting them here is enough
+    for option, variable in [('data_dir', 'PRICEPULSE_DATA_DIR'), ('raw_dir', 'PRICEPULSE_RAW_DIR'),
+                             ('processed_dir', 'PRICEPULSE_PROCESSED_DIR')]:
+        if getattr(args, option):
+            os.environ[variable] = os.path.abspath(getattr(args, option))
+
+    if args.telemetry or args.profile:
+        from monitoring.telemetry import enable
+        print(f"Telemetry: {enable(profile=args.profile)}")
+
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,36 @@
-import pandas as pd
-import numpy as np
+import os
+import sys
+import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import get_raw_path
+from storage.columnar_store import save_cleaned_data
+from storage.cache import cached_clean
+from processing.streaming_cleaner import DEFAULT_CHUNKSIZE, stream_clean_rtfp
+from processing.rtfp_cleaner import clean_rtfp_data, discover_commodities
+from monitoring.telemetry import instrumented
+from analysis.aggregate_cube import cached_cube_from_cleaned, market_summary_from_cube
+
+# Mali commodity columns used by the market summaries
+MALI_COMMODITIES = ['beans', 'groundnuts', 'maize', 'millet', 'rice', 'sorghum']
+
+@instrumented
 def clean_mali_data(df):
     """Clean and process Mali food price data"""
     
-    # Convert price_date to datetime
-    df['price_date'] = pd.to_datetime(df['price_date'])
-    
-    # Add derived columns
-    df['year_month'] = df['price_date'].dt.to_period('M')
-    
-    # Mali commodities (from your data structure)
-    commodity_cols = ['beans', 'groundnuts', 'maize', 'millet', 'rice', 'sorghum']
-    
-    # Filter out rows with no price data
-    df_clean = df[df[commodity_cols].notna().any(axis=1)].copy()
-    
-    # Remove test/aggregated markets
-    df_clean = df_clean[df_clean['mkt_name'] != 'Market Average']
-    
-    print(f"Original rows: {len(df)}")
-    print(f"After cleaning: {len(df_clean)}")
-    print(f"Markets after cleaning: {df_clean['mkt_name'].nunique()}")
-    print(f"Commodities available: {[col for col in commodity_cols if not df_clean[col].isna().all()]}")
+    df_clean = clean_rtfp_data(df)
     
     # Display sample of market names
     print(f"Sample markets: {df_clean['mkt_name'].unique()[:5].tolist()}")
     
     return df_clean
 
-def get_mali_market_summary(df):
-    """Get summary statistics by market for Mali"""
+def get_mali_market_summary(df, cube=None):
+    """Get summary statistics by market for Mali (rolled up from the aggregate cube if given)"""
+    
+    if cube is not None:
+        return market_summary_from_cube(cube, 'Mali', MALI_COMMODITIES)
     
     summary = df.groupby('mkt_name').agg({
         'beans': ['count', 'mean', 'std'],
@@ -45,13 +45,30 @@ def get_mali_market_summary(df):
     return summary
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean Mali RTFP data")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv',
+                        help="Write the cleaned data as CSV, partitioned Parquet, or both")
+    parser.add_argument('--stream', action='store_true',
+                        help="Clean the raw file in bounded chunks instead of loading it whole")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows per chunk in --stream mode")
+    args = parser.parse_args()
+    
+    if args.stream:
+        stream_clean_rtfp('Mali', discover_commodities(get_raw_path('Mali')),
+                          chunksize=args.chunksize, fmt=args.format)
+        sys.exit(0)
+    
     # Load and clean data
     print("=== PROCESSING MALI DATA ===")
-    df = pd.read_csv('../../data_sources/raw/MLI_RTFP_mkt_2007_2025-06-30.csv')
-    df_clean = clean_mali_data(df)
+    df_clean = cached_clean(get_raw_path('Mali'), clean_mali_data)
     
-    # Get summary
-    summary = get_mali_market_summary(df_clean)
+    # Save cleaned data
+    save_cleaned_data(df_clean, 'Mali', fmt=args.format)
+    
+    # Get summary, rolled up from the cube of the cleaned files just saved
+    cube = cached_cube_from_cleaned('parquet' if args.format == 'parquet' else 'csv')
+    summary = get_mali_market_summary(df_clean, cube=cube)
     print("\nMarket Summary (first 5 markets):")
     print(summary.head())
     
@@ -66,8 +83,5 @@ if __name__ == "__main__":
         non_null_count = df_clean[commodity].notna().sum()
         percentage = (non_null_count / len(df_clean)) * 100
         print(f"{commodity}: {non_null_count:,} observations ({percentage:.1f}%)")
-    
-    # Save cleaned data
-    df_clean.to_csv('../../data_sources/processed/mali_prices_clean.csv', index=False)
     print("\n Mali data cleaned and saved!")
     print(f"Final dataset: {len(df_clean):,} rows across {df_clean['mkt_name'].nunique()} markets")
\ No newline at end of file
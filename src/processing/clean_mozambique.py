@@ -1,36 +1,36 @@
-import pandas as pd
-import numpy as np
+import os
+import sys
+import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import get_raw_path
+from storage.columnar_store import save_cleaned_data
+from storage.cache import cached_clean
+from processing.streaming_cleaner import DEFAULT_CHUNKSIZE, stream_clean_rtfp
+from processing.rtfp_cleaner import clean_rtfp_data, discover_commodities
+from monitoring.telemetry import instrumented
+from analysis.aggregate_cube import cached_cube_from_cleaned, market_summary_from_cube
+
+# Mozambique commodity columns used by the market summaries
+MOZAMBIQUE_COMMODITIES = ['cowpeas', 'groundnuts', 'maize', 'maize_meal', 'oil', 'rice', 'sugar', 'wheat_flour']
+
+@instrumented
 def clean_mozambique_data(df):
     """Clean and process Mozambique food price data"""
     
-    # Convert price_date to datetime
-    df['price_date'] = pd.to_datetime(df['price_date'])
-    
-    # Add derived columns
-    df['year_month'] = df['price_date'].dt.to_period('M')
-    
-    # Mozambique commodities (from your data structure)
-    commodity_cols = ['cowpeas', 'groundnuts', 'maize', 'maize_meal', 'oil', 'rice', 'sugar', 'wheat_flour']
-    
-    # Filter out rows with no price data
-    df_clean = df[df[commodity_cols].notna().any(axis=1)].copy()
-    
-    # Remove test/aggregated markets
-    df_clean = df_clean[df_clean['mkt_name'] != 'Market Average']
-    
-    print(f"Original rows: {len(df)}")
-    print(f"After cleaning: {len(df_clean)}")
-    print(f"Markets after cleaning: {df_clean['mkt_name'].nunique()}")
-    print(f"Commodities available: {[col for col in commodity_cols if not df_clean[col].isna().all()]}")
+    df_clean = clean_rtfp_data(df)
     
     # Display sample of market names
     print(f"Sample markets: {df_clean['mkt_name'].unique()[:5].tolist()}")
     
     return df_clean
 
-def get_mozambique_market_summary(df):
-    """Get summary statistics by market for Mozambique"""
+def get_mozambique_market_summary(df, cube=None):
+    """Get summary statistics by market for Mozambique (rolled up from the aggregate cube if given)"""
+    
+    if cube is not None:
+        return market_summary_from_cube(cube, 'Mozambique', MOZAMBIQUE_COMMODITIES)
     
     summary = df.groupby('mkt_name').agg({
         'cowpeas': ['count', 'mean', 'std'],
@@ -47,13 +47,30 @@ def get_mozambique_market_summary(df):
     return summary
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean Mozambique RTFP data")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv',
+                        help="Write the cleaned data as CSV, partitioned Parquet, or both")
+    parser.add_argument('--stream', action='store_true',
+                        help="Clean the raw file in bounded chunks instead of loading it whole")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows per chunk in --stream mode")
+    args = parser.parse_args()
+    
+    if args.stream:
+        stream_clean_rtfp('Mozambique', discover_commodities(get_raw_path('Mozambique')),
+                          chunksize=args.chunksize, fmt=args.format)
+        sys.exit(0)
+    
     # Load and clean data
     print("=== PROCESSING MOZAMBIQUE DATA ===")
-    df = pd.read_csv('../../data_sources/raw/MOZ_RTFP_mkt_2007_2025-06-30.csv')
-    df_clean = clean_mozambique_data(df)
+    df_clean = cached_clean(get_raw_path('Mozambique'), clean_mozambique_data)
     
-    # Get summary
-    summary = get_mozambique_market_summary(df_clean)
+    # Save cleaned data
+    save_cleaned_data(df_clean, 'Mozambique', fmt=args.format)
+    
+    # Get summary, rolled up from the cube of the cleaned files just saved
+    cube = cached_cube_from_cleaned('parquet' if args.format == 'parquet' else 'csv')
+    summary = get_mozambique_market_summary(df_clean, cube=cube)
     print("\nMarket Summary (first 5 markets):")
     print(summary.head())
     
@@ -79,8 +96,5 @@ if __name__ == "__main__":
         shared_commodities.append("rice (with Nigeria)")
     
     print(f"Shared commodities: {', '.join(shared_commodities)}")
-    
-    # Save cleaned data
-    df_clean.to_csv('../../data_sources/processed/mozambique_prices_clean.csv', index=False)
     print("\n Mozambique data cleaned and saved!")
     print(f"Final dataset: {len(df_clean):,} rows across {df_clean['mkt_name'].nunique()} markets")
\ No newline at end of file
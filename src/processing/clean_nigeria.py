@@ -1,35 +1,42 @@
-import pandas as pd
-import numpy as np
+import os
+import sys
+import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import get_raw_path
+from storage.columnar_store import save_cleaned_data
+from storage.cache import cached_clean
+from processing.streaming_cleaner import DEFAULT_CHUNKSIZE, stream_clean_rtfp
+from processing.rtfp_cleaner import clean_rtfp_data, discover_commodities
+from monitoring.telemetry import instrumented
+
+@instrumented
 def clean_nigeria_data(df):
     """Clean and process Nigeria food price data"""
     
-    # Convert price_date to datetime
-    df['price_date'] = pd.to_datetime(df['price_date'])
-    
-    # Add derived columns
-    df['year_month'] = df['price_date'].dt.to_period('M')
-    
-    # Nigeria commodities (from your file)
-    commodity_cols = ['rice', 'sorghum', 'beans', 'millet', 'yam']
-    
-    # Filter out rows with no price data
-    df_clean = df[df[commodity_cols].notna().any(axis=1)].copy()
-    
-    # Remove test/aggregated markets
-    df_clean = df_clean[df_clean['mkt_name'] != 'Market Average']
-    
-    print(f"Original rows: {len(df)}")
-    print(f"After cleaning: {len(df_clean)}")
-    print(f"Markets after cleaning: {df_clean['mkt_name'].nunique()}")
+    df_clean = clean_rtfp_data(df)
     
     return df_clean
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean Nigeria RTFP data")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv',
+                        help="Write the cleaned data as CSV, partitioned Parquet, or both")
+    parser.add_argument('--stream', action='store_true',
+                        help="Clean the raw file in bounded chunks instead of loading it whole")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows per chunk in --stream mode")
+    args = parser.parse_args()
+    
+    if args.stream:
+        stream_clean_rtfp('Nigeria', discover_commodities(get_raw_path('Nigeria')),
+                          chunksize=args.chunksize, fmt=args.format)
+        sys.exit(0)
+    
     # Load and clean data
-    df = pd.read_csv('../../data_sources/raw/NGA_RTFP_mkt_2007_2025-06-30.csv')
-    df_clean = clean_nigeria_data(df)
+    df_clean = cached_clean(get_raw_path('Nigeria'), clean_nigeria_data)
     
     # Save cleaned data
-    df_clean.to_csv('../../data_sources/processed/nigeria_prices_clean.csv', index=False)
+    save_cleaned_data(df_clean, 'Nigeria', fmt=args.format)
     print("Nigeria data cleaned and saved!")
\ No newline at end of file
@@ -1,36 +1,36 @@
-import pandas as pd
-import numpy as np
+import os
+import sys
+import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import get_raw_path
+from storage.columnar_store import save_cleaned_data
+from storage.cache import cached_clean
+from processing.streaming_cleaner import DEFAULT_CHUNKSIZE, stream_clean_rtfp
+from processing.rtfp_cleaner import clean_rtfp_data, discover_commodities
+from monitoring.telemetry import instrumented
+from analysis.aggregate_cube import cached_cube_from_cleaned, market_summary_from_cube
+
+# Senegal commodity columns used by the market summaries
+SENEGAL_COMMODITIES = ['maize', 'millet', 'rice', 'sorghum']
+
+@instrumented
 def clean_senegal_data(df):
     """Clean and process Senegal food price data"""
     
-    # Convert price_date to datetime
-    df['price_date'] = pd.to_datetime(df['price_date'])
-    
-    # Add derived columns
-    df['year_month'] = df['price_date'].dt.to_period('M')
-    
-    # Senegal commodities (from your data structure)
-    commodity_cols = ['maize', 'millet', 'rice', 'sorghum']
-    
-    # Filter out rows with no price data
-    df_clean = df[df[commodity_cols].notna().any(axis=1)].copy()
-    
-    # Remove test/aggregated markets
-    df_clean = df_clean[df_clean['mkt_name'] != 'Market Average']
-    
-    print(f"Original rows: {len(df)}")
-    print(f"After cleaning: {len(df_clean)}")
-    print(f"Markets after cleaning: {df_clean['mkt_name'].nunique()}")
-    print(f"Commodities available: {[col for col in commodity_cols if not df_clean[col].isna().all()]}")
+    df_clean = clean_rtfp_data(df)
     
     # Display sample of market names
     print(f"Sample markets: {df_clean['mkt_name'].unique()[:5].tolist()}")
     
     return df_clean
 
-def get_senegal_market_summary(df):
-    """Get summary statistics by market for Senegal"""
+def get_senegal_market_summary(df, cube=None):
+    """Get summary statistics by market for Senegal (rolled up from the aggregate cube if given)"""
+    
+    if cube is not None:
+        return market_summary_from_cube(cube, 'Senegal', SENEGAL_COMMODITIES)
     
     summary = df.groupby('mkt_name').agg({
         'maize': ['count', 'mean', 'std'],
@@ -43,13 +43,30 @@ def get_senegal_market_summary(df):
     return summary
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean Senegal RTFP data")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv',
+                        help="Write the cleaned data as CSV, partitioned Parquet, or both")
+    parser.add_argument('--stream', action='store_true',
+                        help="Clean the raw file in bounded chunks instead of loading it whole")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows per chunk in --stream mode")
+    args = parser.parse_args()
+    
+    if args.stream:
+        stream_clean_rtfp('Senegal', discover_commodities(get_raw_path('Senegal')),
+                          chunksize=args.chunksize, fmt=args.format)
+        sys.exit(0)
+    
     # Load and clean data
     print("=== PROCESSING SENEGAL DATA ===")
-    df = pd.read_csv('../../data_sources/raw/SEN_RTFP_mkt_2007_2025-06-30.csv')
-    df_clean = clean_senegal_data(df)
+    df_clean = cached_clean(get_raw_path('Senegal'), clean_senegal_data)
     
-    # Get summary
-    summary = get_senegal_market_summary(df_clean)
+    # Save cleaned data
+    save_cleaned_data(df_clean, 'Senegal', fmt=args.format)
+    
+    # Get summary, rolled up from the cube of the cleaned files just saved
+    cube = cached_cube_from_cleaned('parquet' if args.format == 'parquet' else 'csv')
+    summary = get_senegal_market_summary(df_clean, cube=cube)
     print("\nMarket Summary (first 5 markets):")
     print(summary.head())
     
@@ -79,8 +96,5 @@ if __name__ == "__main__":
     
     print(f"Shared commodities: {', '.join(shared_commodities)}")
     print(" PERFECT OVERLAP: All 4 Senegal commodities match existing countries!")
-    
-    # Save cleaned data
-    df_clean.to_csv('../../data_sources/processed/senegal_prices_clean.csv', index=False)
     print("\n Senegal data cleaned and saved!")
     print(f"Final dataset: {len(df_clean):,} rows across {df_clean['mkt_name'].nunique()} markets")
\ No newline at end of file
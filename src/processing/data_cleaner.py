@@ -1,30 +1,33 @@
-import pandas as pd
-import numpy as np
+import os
+import sys
+import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import get_raw_path
+from storage.columnar_store import save_cleaned_data
+from storage.cache import cached_clean
+from processing.streaming_cleaner import DEFAULT_CHUNKSIZE, stream_clean_rtfp
+from processing.rtfp_cleaner import clean_rtfp_data, discover_commodities
+from monitoring.telemetry import instrumented
+from analysis.aggregate_cube import cached_cube_from_cleaned, market_summary_from_cube
+
+# Kenya commodity columns used by the market summaries
+KENYA_COMMODITIES = ['maize', 'potatoes', 'sorghum']
+
+@instrumented
 def clean_kenya_data(df):
     """Clean and process Kenya food price data"""
     
-    # Convert price_date to datetime
-    df['price_date'] = pd.to_datetime(df['price_date'])
-    
-    # Add derived columns
-    df['year_month'] = df['price_date'].dt.to_period('M')
-    
-    # Filter out rows with no price data
-    commodity_cols = ['maize', 'potatoes', 'sorghum']
-    df_clean = df[df[commodity_cols].notna().any(axis=1)].copy()
-    
-    # Remove test/aggregated markets
-    df_clean = df_clean[df_clean['mkt_name'] != 'Market Average']
-    
-    print(f"Original rows: {len(df)}")
-    print(f"After cleaning: {len(df_clean)}")
-    print(f"Markets after cleaning: {df_clean['mkt_name'].nunique()}")
+    df_clean = clean_rtfp_data(df)
     
     return df_clean
 
-def get_market_summary(df):
-    """Get summary statistics by market"""
+def get_market_summary(df, cube=None):
+    """Get summary statistics by market (rolled up from the aggregate cube if given)"""
+    
+    if cube is not None:
+        return market_summary_from_cube(cube, 'Kenya', KENYA_COMMODITIES)
     
     summary = df.groupby('mkt_name').agg({
         'maize': ['count', 'mean', 'std'],
@@ -36,14 +39,28 @@ def get_market_summary(df):
     return summary
 
 if __name__ == "__main__":
-    # Load and clean data
-    df = pd.read_csv('../../data_sources/raw/KEN_RTFP_mkt_2007_2025-06-30.csv')
-    df_clean = clean_kenya_data(df)
+    parser = argparse.ArgumentParser(description="Clean Kenya RTFP data")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv',
+                        help="Write the cleaned data as CSV, partitioned Parquet, or both")
+    parser.add_argument('--stream', action='store_true',
+                        help="Clean the raw file in bounded chunks instead of loading it whole")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows per chunk in --stream mode")
+    args = parser.parse_args()
     
-    # Get summary
-    summary = get_market_summary(df_clean)
-    print("\nMarket Summary:")
-    print(summary.head())
+    if args.stream:
+        stream_clean_rtfp('Kenya', discover_commodities(get_raw_path('Kenya')),
+                          chunksize=args.chunksize, fmt=args.format)
+        sys.exit(0)
+    
+    # Load and clean data
+    df_clean = cached_clean(get_raw_path('Kenya'), clean_kenya_data)
     
     # Save cleaned data
-    df_clean.to_csv('../../data_sources/processed/kenya_prices_clean.csv', index=False)
\ No newline at end of file
+    save_cleaned_data(df_clean, 'Kenya', fmt=args.format)
+    
+    # Get summary, rolled up from the cube of the cleaned files just saved
+    cube = cached_cube_from_cleaned('parquet' if args.format == 'parquet' else 'csv')
+    summary = get_market_summary(df_clean, cube=cube)
+    print("\nMarket Summary:")
+    print(summary.head())
\ No newline at end of file
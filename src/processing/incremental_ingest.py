@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import PROCESSED_DIR, add_country_metadata, get_country_info, get_raw_path
+from processing.streaming_cleaner import DEFAULT_CHUNKSIZE, build_rtfp_schema, clean_chunk
+from processing.rtfp_cleaner import discover_commodities
+from storage.columnar_store import dataset_path, upsert_cleaned_csv, upsert_partitioned
+from storage.star_schema import upsert_star
+from analysis.aggregate_cube import refresh_saved_cube
+from analysis.crisis_alerts import update_saved_alerts
+from analysis.basket_index import update_saved_basket_index
+from storage.warehouse import upsert_saved_warehouse
+
+# Per-country / per-market latest ingested price_date
+WATERMARK_FILE = os.path.join(PROCESSED_DIR, 'ingest_watermarks.json')
+
+# Months before the watermark that are re-read to pick up back-filled prices
+DEFAULT_REVISION_MONTHS = 3
+
+def load_watermarks(path=WATERMARK_FILE):
+    """Load watermarks as {ISO3: {mkt_name: 'YYYY-MM-DD'}}"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_watermarks(watermarks, path=WATERMARK_FILE):
+    """Write watermarks atomically so a failed run keeps the previous ones"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _market_cutoffs(market_watermarks, revision_months):
+    """Earliest price_date to re-ingest per market"""
+    return {
+        market: pd.Timestamp(date) - pd.DateOffset(months=revision_months)
+        for market, date in market_watermarks.items()
+    }
+
+def read_new_rows(country, commodity_cols=None, raw_path=None, watermarks=None,
+                  revision_months=DEFAULT_REVISION_MONTHS, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream a raw snapshot and keep only cleaned rows past each market's cutoff
+
+    Markets without a watermark (new markets, or a first ingest) are read in
+    full. commodity_cols defaults to every commodity the snapshot carries.
+    """
+
+    raw_path = raw_path or get_raw_path(country)
+    if commodity_cols is None:
+        commodity_cols = discover_commodities(raw_path)
+    iso3 = get_country_info(country)['iso3']
+    cutoffs = _market_cutoffs((watermarks or {}).get(iso3, {}), revision_months)
+
+    usecols, dtype = build_rtfp_schema(raw_path)
+    new_chunks = []
+    rows_in = 0
+
+    for chunk in pd.read_csv(raw_path, usecols=usecols, dtype=dtype, chunksize=chunksize):
+        rows_in += len(chunk)
+        chunk['price_date'] = pd.to_datetime(chunk['price_date'])
+
+        # Filter on the watermark before the (more expensive) cleaning step
+        cutoff = pd.to_datetime(chunk['mkt_name'].map(cutoffs))
+        chunk = chunk[cutoff.isna() | (chunk['price_date'] > cutoff)]
+        if len(chunk) > 0:
+            new_chunks.append(clean_chunk(chunk, commodity_cols))
+
+    if new_chunks:
+        df_new = pd.concat(new_chunks, ignore_index=True)
+    else:
+        df_new = pd.DataFrame(columns=usecols + ['year_month'])
+
+    return df_new, rows_in
+
+def ingest_snapshot(country, commodity_cols=None, raw_path=None,
+                    revision_months=DEFAULT_REVISION_MONTHS, chunksize=DEFAULT_CHUNKSIZE,
+                    watermark_path=WATERMARK_FILE):
+    """Incrementally ingest a new RTFP snapshot into the cleaned and unified stores
+
+    Only rows newer than each market's watermark (minus the revision window)
+    are cleaned. They are upserted into the country's cleaned CSV and, where
+    they have been built, the Parquet 'cleaned' and 'unified' datasets,
+    rewriting just the country/year partitions they fall in. Returns a
+    summary with the changed months so downstream aggregates can be
+    refreshed for those months only.
+    """
+
+    iso3 = get_country_info(country)['iso3']
+    watermarks = load_watermarks(watermark_path)
+
+    df_new, rows_in = read_new_rows(country, commodity_cols, raw_path=raw_path, watermarks=watermarks,
+                                    revision_months=revision_months, chunksize=chunksize)
+
+    result = {
+        'country': iso3,
+        'rows_scanned': rows_in,
+        'rows_ingested': len(df_new),
+        'cleaned_rows': None,
+        'partitions': [],
+        'changed_months': [],
+        'alerts': 0,
+    }
+
+    if len(df_new) == 0:
+        print(f"{iso3}: no new rows in snapshot ({rows_in:,} rows scanned)")
+        return result
+
+    if 'ISO3' not in df_new.columns:
+        df_new['ISO3'] = iso3
+
+    result['cleaned_rows'] = upsert_cleaned_csv(df_new, country)
+    # A dataset created here would hold only the snapshot, so only existing ones are updated
+    if os.path.isdir(dataset_path('cleaned')):
+        result['partitions'] = upsert_partitioned(df_new, 'cleaned')
+    if os.path.isdir(dataset_path('unified')):
+        upsert_partitioned(add_country_metadata(df_new.copy(), country), 'unified')
+    upsert_star(df_new, country)
+    # Downstream aggregates: only the cube cells for the new rows are recomputed
+    refresh_saved_cube(df_new, country)
+    alerts = update_saved_alerts(df_new, country)
+    result['alerts'] = 0 if alerts is None else len(alerts)
+    update_saved_basket_index(df_new, country)
+    upsert_saved_warehouse(df_new, country)
+    result['changed_months'] = sorted(df_new['price_date'].dt.strftime('%Y-%m').unique().tolist())
+
+    # Advance watermarks; never move them backwards
+    market_watermarks = watermarks.setdefault(iso3, {})
+    latest = df_new.groupby('mkt_name')['price_date'].max()
+    for market, date in latest.items():
+        date = date.strftime('%Y-%m-%d')
+        if market not in market_watermarks or date > market_watermarks[market]:
+            market_watermarks[market] = date
+    save_watermarks(watermarks, watermark_path)
+
+    print(f"{iso3}: ingested {len(df_new):,} of {rows_in:,} rows "
+          f"(cleaned CSV now {result['cleaned_rows']:,} rows, {len(result['partitions'])} Parquet partitions), "
+          f"months {result['changed_months'][0]} to {result['changed_months'][-1]}, "
+          f"{result['alerts']} price alerts")
+
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally ingest a new RTFP snapshot")
+    parser.add_argument('country', help="Registry country name or ISO3 code")
+    parser.add_argument('--commodities', nargs='+',
+                        help="Commodity columns used to drop rows without prices (default: every one in the file)")
+    parser.add_argument('--raw-file', default=None, help="Snapshot to ingest (default: registry raw path)")
+    parser.add_argument('--revision-months', type=int, default=DEFAULT_REVISION_MONTHS)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    ingest_snapshot(args.country, args.commodities, raw_path=args.raw_file,
+                    revision_months=args.revision_months, chunksize=args.chunksize)
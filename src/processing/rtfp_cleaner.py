@@ -0,0 +1,274 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import (COUNTRY_REGISTRY, DISCOVERED_FILE, RAW_DIR, get_country_name,
+                                            get_raw_path, register_country)
+from storage.cache import _atomic_write, cached_clean
+from monitoring.telemetry import instrumented
+
+# Per-item column families of a raw RTFP file; an item is a commodity when
+# its plain price column sits next to them
+ITEM_PREFIXES = ['o', 'h', 'l', 'c', 'inflation', 'trust']
+INDEX_ITEM = 'food_price_index'
+AVERAGE_MARKET = 'Market Average'
+
+RAW_FILE_PATTERN = re.compile(r'^([A-Z]{3})_RTFP_mkt_(.+)\.csv$')
+
+# "maize (1 KG, Index Weight = 1), eggs (30 pcs, Index Weight = 0.33)"
+COMPONENT_PATTERN = re.compile(
+    r'\s*(.+?)\s*\(\s*([\d.]+)?\s*([^(),]*?)\s*,\s*Index Weight\s*=\s*([-\d.eE+]+)\)\s*(?:,|$)')
+
+# Region labels for RTFP countries not yet in the registry; anything else
+# is registered as 'Unassigned' until its entry is filled in by hand
+REGION_HINTS = {
+    'ETH': ('Horn of Africa', 'East Africa'),
+    'SSD': ('East Africa', 'East Africa'),
+    'SDN': ('East Africa', 'East Africa'),
+    'UGA': ('East Africa', 'East Africa'),
+    'TZA': ('East Africa', 'East Africa'),
+    'BDI': ('East Africa', 'East Africa'),
+    'RWA': ('East Africa', 'East Africa'),
+    'COD': ('Central Africa', 'Central Africa'),
+    'CAF': ('Central Africa', 'Central Africa'),
+    'CMR': ('Central Africa', 'Central Africa'),
+    'TCD': ('Sahel', 'Central Africa'),
+    'NER': ('Sahel', 'West Africa'),
+    'BFA': ('Sahel', 'West Africa'),
+    'GHA': ('West Africa', 'Coastal West Africa'),
+    'LBR': ('West Africa', 'Coastal West Africa'),
+    'SLE': ('West Africa', 'Coastal West Africa'),
+    'GIN': ('West Africa', 'Coastal West Africa'),
+    'MWI': ('Southern Africa', 'SADC'),
+    'ZMB': ('Southern Africa', 'SADC'),
+    'ZWE': ('Southern Africa', 'SADC'),
+    'MDG': ('Southern Africa', 'SADC'),
+}
+
+def parse_components(text):
+    """Parse one RTFP `components` string into (item, quantity, unit, index_weight) rows
+
+    Item names are lower-cased with non-word runs turned into underscores,
+    matching the price columns; a missing pack quantity is NaN.
+    """
+
+    rows = []
+    if isinstance(text, str):
+        for name, qty, unit, weight in COMPONENT_PATTERN.findall(text):
+            item = re.sub(r'\W+', '_', name.lower()).strip('_')
+            rows.append((item, float(qty) if qty else float('nan'), unit.strip(), float(weight)))
+    return pd.DataFrame(rows, columns=['item', 'quantity', 'unit', 'index_weight'])
+
+def commodity_columns(columns, components=None):
+    """The commodity price columns of an RTFP frame, in file order
+
+    A column is a commodity when the file also carries its c_<item> close
+    column, or when the components string names it. The food price index
+    is not a commodity.
+    """
+
+    columns = list(columns)
+    present = set(columns)
+    named = set(parse_components(components)['item']) if components else set()
+    return [col for col in columns
+            if col != INDEX_ITEM and (f"c_{col}" in present or col in named)]
+
+def discover_commodities(raw_path):
+    """Commodity columns of a raw RTFP file, from its header and first components string"""
+
+    header = pd.read_csv(raw_path, nrows=0).columns
+    components = None
+    if 'components' in header:
+        first = pd.read_csv(raw_path, usecols=['components'], nrows=1)
+        components = first['components'].iloc[0] if len(first) else None
+    return commodity_columns(header, components)
+
+@instrumented
+def clean_rtfp_data(df, commodity_cols=None):
+    """Clean any RTFP market frame: keep rows with a price, drop the aggregate market
+
+    commodity_cols defaults to every commodity the frame carries, not only the
+    ones a country's market summary reports.
+    """
+
+    if commodity_cols is None:
+        components = df['components'].dropna().iloc[0] if 'components' in df and df['components'].notna().any() \
+            else None
+        commodity_cols = commodity_columns(df.columns, components)
+
+    # Convert price_date to datetime
+    df['price_date'] = pd.to_datetime(df['price_date'])
+
+    # Add derived columns
+    df['year_month'] = df['price_date'].dt.to_period('M')
+
+    # Filter out rows with no price data
+    df_clean = df[df[commodity_cols].notna().any(axis=1)].copy()
+
+    # Remove test/aggregated markets
+    df_clean = df_clean[df_clean['mkt_name'] != AVERAGE_MARKET]
+
+    print(f"Original rows: {len(df)}")
+    print(f"After cleaning: {len(df_clean)}")
+    print(f"Markets after cleaning: {df_clean['mkt_name'].nunique()}")
+    print(f"Commodities available: {[col for col in commodity_cols if not df_clean[col].isna().all()]}")
+
+    return df_clean
+
+def find_raw_files(raw_dir=RAW_DIR):
+    """{ISO3: path} of the RTFP market files in raw_dir, the latest release per country"""
+
+    files = {}
+    for path in sorted(glob.glob(os.path.join(raw_dir, '*_RTFP_mkt_*.csv'))):
+        match = RAW_FILE_PATTERN.match(os.path.basename(path))
+        if match:
+            files[match.group(1)] = path
+    return files
+
+def describe_raw_file(raw_path):
+    """(name, registry entry) for a country known only from its raw file
+
+    The busiest market stands in for the capital as the distance hub;
+    population is unknown (0) until the entry is filled in.
+    """
+
+    wanted = {'ISO3', 'country', 'mkt_name', 'lat', 'lon', 'components'}
+    df = pd.read_csv(raw_path, usecols=lambda c: c in wanted)
+    df = df[df['mkt_name'] != AVERAGE_MARKET]
+
+    iso3 = df['ISO3'].dropna().iloc[0]
+    name = df['country'].dropna().iloc[0]
+    hub = df['mkt_name'].value_counts().index[0]
+    hub_row = df[df['mkt_name'] == hub].iloc[0]
+    region, sub_region = REGION_HINTS.get(iso3, ('Unassigned', 'Unassigned'))
+    header = pd.read_csv(raw_path, nrows=0).columns
+    components = df['components'].dropna().iloc[0] if 'components' in df and df['components'].notna().any() else None
+    slug = re.sub(r'\W+', '_', name.lower()).strip('_')
+
+    return name, {
+        'iso3': iso3,
+        'region': region,
+        'sub_region': sub_region,
+        'population_millions': 0.0,
+        'processed_file': f"{slug}_prices_clean.csv",
+        'capital': (hub, round(float(hub_row['lat']), 2), round(float(hub_row['lon']), 2)),
+        'commodities': commodity_columns(header, components),
+        'raw_file': os.path.basename(raw_path),
+    }
+
+def save_discovered_countries(names, path=DISCOVERED_FILE):
+    """Add these registered countries to the discovered-countries file; returns the ones added"""
+
+    discovered = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            discovered = json.load(f)
+    new = {name: COUNTRY_REGISTRY[name] for name in names if name not in discovered}
+    if new:
+        discovered.update(new)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _atomic_write(path, json.dumps(discovered, indent=2).encode())
+    return list(new)
+
+def register_raw_countries(raw_dir=RAW_DIR, path=DISCOVERED_FILE, persist=True):
+    """Register every raw file whose country is not in the registry yet; returns the new names
+
+    New entries are appended to the discovered-countries file, which the
+    registry loads on import, so later runs (and the unify step) see them.
+    With persist=False they are registered for this process only.
+    """
+
+    known = {info['iso3'] for info in COUNTRY_REGISTRY.values()}
+    new = {}
+    for iso3, raw_path in find_raw_files(raw_dir).items():
+        if iso3 in known:
+            continue
+        name, info = describe_raw_file(raw_path)
+        register_country(name, info)
+        new[name] = info
+
+    if new and persist:
+        save_discovered_countries(new, path)
+    return list(new)
+
+def clean_country(country, fmt='csv'):
+    """Clean one country's raw file with the generic cleaner and save it (no star tables)"""
+    from contextlib import redirect_stdout
+    from io import StringIO
+    from storage.columnar_store import save_cleaned_data
+
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        df_clean = cached_clean(get_raw_path(country), clean_rtfp_data)
+        save_cleaned_data(df_clean, country, fmt=fmt, star=False)
+    commodities = commodity_columns(df_clean.columns)
+    return {
+        'country': country,
+        'rows': len(df_clean),
+        'markets': df_clean['mkt_name'].nunique(),
+        'commodities': len(commodities),
+        # Unify, the cube, alerts and volatility only see the registry's list
+        'unlisted': [c for c in commodities if c not in COUNTRY_REGISTRY[country]['commodities']],
+        'seconds': time.perf_counter() - start,
+    }
+
+def clean_all(countries=None, workers=None, fmt='csv'):
+    """Clean every raw RTFP file in RAW_DIR, one country per worker process
+
+    Unknown countries are registered first. Star tables share dimension
+    files, so they are built once after all countries are cleaned.
+    """
+    from storage.star_schema import build_star
+
+    new = set(register_raw_countries())
+    if countries is None:
+        countries = list(COUNTRY_REGISTRY)
+    countries = [c if c in COUNTRY_REGISTRY else get_country_name(c) for c in countries]
+
+    todo = [c for c in countries if os.path.exists(get_raw_path(c))]
+    for country in countries:
+        if country not in todo:
+            print(f" Skipping {country}: no raw file at {get_raw_path(country)}")
+
+    workers = min(workers or os.cpu_count() or 1, max(len(todo), 1))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(clean_country, todo, [fmt] * len(todo)))
+    else:
+        results = [clean_country(c, fmt) for c in todo]
+
+    if fmt in ('csv', 'both') and todo:
+        build_star(todo)
+    for result in results:
+        result['new'] = result['country'] in new
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean every raw RTFP market file with one schema-driven cleaner")
+    parser.add_argument('countries', nargs='*', help="Country names or ISO3 codes (default: every raw file)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per core)")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv',
+                        help="Write the cleaned data as CSV, partitioned Parquet, or both")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = clean_all(args.countries or None, args.workers, args.format)
+
+    print(f"\n RTFP BATCH CLEAN")
+    print("=" * 40)
+    for r in results:
+        new = ' (newly registered)' if r['new'] else ''
+        print(f"• {r['country']}{new}: {r['rows']:,} rows, {r['markets']} markets, "
+              f"{r['commodities']} commodities ({r['seconds']:.1f}s)")
+        if r['unlisted']:
+            print(f"    not in the registry's commodities yet: {', '.join(r['unlisted'])}")
+    print(f"Cleaned {len(results)} countries in {time.perf_counter() - start:.1f}s")
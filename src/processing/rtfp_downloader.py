@@ -0,0 +1,364 @@
+import os
+import sys
+import ssl
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import tempfile
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, RAW_DIR, RTFP_RELEASE
+
+# Base URL the RTFP files are published under; pass --base-url or set this
+RTFP_BASE_URL = os.environ.get('PRICEPULSE_RTFP_URL')
+
+# Download state per file (ETag, Last-Modified, checksum) for conditional refreshes
+MANIFEST_FILE = os.path.join(RAW_DIR, 'download_manifest.json')
+
+DEFAULT_CONCURRENCY = 8
+BLOCK_SIZE = 1 << 16
+MAX_REDIRECTS = 5
+MAX_RETRIES = 3
+# Seconds any single connect, header or body read may wait before the
+# attempt is dropped and retried (resuming from the .part file)
+DEFAULT_TIMEOUT = 30.0
+
+class DownloadError(Exception):
+    """A file could not be fetched"""
+
+class ChecksumError(DownloadError):
+    """Downloaded bytes do not match the expected SHA-256"""
+
+class ResponseError(DownloadError):
+    """The server sent something that is not a valid HTTP response"""
+
+def rtfp_filenames(iso3, release=RTFP_RELEASE):
+    """Market price and market details file names for one country"""
+    return [f"{iso3}_RTFP_mkt_{release}.csv", f"{iso3}_RTP_details_{release}.csv"]
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    """Write the manifest atomically"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections per (scheme, host, port), at most `size` each
+
+    timeout bounds every network wait on the pool's connections (None: no limit).
+    """
+
+    def __init__(self, size=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.idle = {}
+        self.slots = {}
+        self.opened = 0
+
+    def _slot(self, origin):
+        if origin not in self.slots:
+            self.slots[origin] = asyncio.Semaphore(self.size)
+            self.idle[origin] = []
+        return self.slots[origin]
+
+    async def acquire(self, origin):
+        await self._slot(origin).acquire()
+        idle = self.idle[origin]
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        scheme, host, port = origin
+        try:
+            conn = await _timed(asyncio.open_connection(
+                host, port, ssl=ssl.create_default_context() if scheme == 'https' else None,
+            ), self.timeout, f"connecting to {host}:{port}")
+        except BaseException:
+            self.slots[origin].release()
+            raise
+        self.opened += 1
+        return conn
+
+    def release(self, origin, conn, reusable):
+        if reusable:
+            self.idle[origin].append(conn)
+        else:
+            conn[1].close()
+        self.slots[origin].release()
+
+    def close(self):
+        for conns in self.idle.values():
+            for _, writer in conns:
+                writer.close()
+        self.idle = {origin: [] for origin in self.idle}
+
+def _origin(url):
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    return parts.scheme, parts.hostname, port
+
+async def _timed(awaitable, timeout, what):
+    """Await with a timeout; a timeout is an OSError, so it is retried like a dropped connection"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"no response for {timeout:g}s while {what}") from None
+
+async def _readline(reader, timeout):
+    try:
+        return await _timed(reader.readline(), timeout, "reading the response")
+    except ValueError as exc:
+        # readline raises ValueError for a line longer than the stream limit
+        raise ResponseError(f"malformed response: {exc}") from None
+
+async def _read_head(reader, timeout=None):
+    """Read a status line and headers; header names are lower-cased"""
+    status_line = await _readline(reader, timeout)
+    if not status_line:
+        raise ConnectionResetError("connection closed before response")
+    fields = status_line.split()
+    if len(fields) < 2 or not fields[0].startswith(b'HTTP/') or not fields[1].isdigit():
+        raise ResponseError(f"malformed status line {status_line[:80]!r}")
+    status = int(fields[1])
+    headers = {}
+    while True:
+        line = await _readline(reader, timeout)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+def _parse_size(text, base, what):
+    """A non-negative chunk size or Content-Length, or ResponseError"""
+    try:
+        size = int(text, base)
+    except ValueError:
+        size = -1
+    if size < 0:
+        raise ResponseError(f"malformed {what} {text[:80]!r}")
+    return size
+
+async def _iter_body(reader, headers, timeout=None):
+    """Yield the response body in blocks (Content-Length, chunked or until close)"""
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            line = await _readline(reader, timeout)
+            if not line:
+                raise asyncio.IncompleteReadError(b'', None)
+            size = _parse_size(line.split(b';')[0].strip(), 16, "chunk size")
+            if size == 0:
+                await _readline(reader, timeout)
+                return
+            yield await _timed(reader.readexactly(size), timeout, "reading the body")
+            await _readline(reader, timeout)
+    elif 'content-length' in headers:
+        remaining = _parse_size(headers['content-length'], 10, "Content-Length")
+        while remaining:
+            block = await _timed(reader.read(min(BLOCK_SIZE, remaining)), timeout, "reading the body")
+            if not block:
+                raise asyncio.IncompleteReadError(b'', remaining)
+            remaining -= len(block)
+            yield block
+    else:
+        while block := await _timed(reader.read(BLOCK_SIZE), timeout, "reading the body"):
+            yield block
+
+def _hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h
+
+async def fetch_file(pool, url, dest, state=None, expected_sha256=None):
+    """Download url to dest, skipping it when unchanged and resuming partial files
+
+    state is the file's manifest entry; the validator of an in-progress
+    transfer is recorded in it so a later call can resume. Returns the new
+    entry with an added 'result' of 'downloaded', 'resumed' or 'unchanged'.
+    """
+
+    state = {} if state is None else state
+    part_path = dest + '.part'
+
+    for _ in range(MAX_REDIRECTS + 1):
+        origin = _origin(url)
+        parts = urlsplit(url)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+        headers = {'Host': parts.netloc, 'User-Agent': 'PricePulse-RTFP-fetcher', 'Accept-Encoding': 'identity'}
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        partial_etag = state.get('partial', {}).get('etag')
+        if offset and partial_etag:
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = partial_etag
+        elif os.path.exists(dest):
+            if state.get('etag'):
+                headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'):
+                headers['If-Modified-Since'] = state['last_modified']
+
+        reader, writer = await pool.acquire(origin)
+        reusable = False
+        try:
+            request = f"GET {target} HTTP/1.1\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+            writer.write(request.encode('latin-1'))
+            await _timed(writer.drain(), pool.timeout, "sending the request")
+            status, resp = await _read_head(reader, pool.timeout)
+
+            if status in (301, 302, 303, 307, 308) and 'location' in resp:
+                async for _ in _iter_body(reader, resp, pool.timeout):
+                    pass
+                reusable = resp.get('connection', '').lower() != 'close'
+                url = resp['location'] if '://' in resp['location'] else f"{parts.scheme}://{parts.netloc}{resp['location']}"
+                continue
+
+            if status == 304:
+                reusable = resp.get('connection', '').lower() != 'close'
+                return {**state, 'result': 'unchanged'}
+
+            if status not in (200, 206):
+                raise DownloadError(f"{url}: HTTP {status}")
+
+            etag = resp.get('etag')
+            resumed = status == 206
+            if resumed:
+                h = _hash_file(part_path)
+                mode = 'ab'
+            else:
+                h = hashlib.sha256()
+                mode = 'wb'
+
+            # Remember the validator first so an interrupted transfer can resume
+            state['partial'] = {'etag': etag}
+            with open(part_path, mode) as f:
+                async for block in _iter_body(reader, resp, pool.timeout):
+                    f.write(block)
+                    h.update(block)
+            reusable = resp.get('connection', '').lower() != 'close'
+        except BaseException:
+            writer.close()
+            raise
+        finally:
+            pool.release(origin, (reader, writer), reusable)
+
+        digest = h.hexdigest()
+        expected = expected_sha256 or resp.get('x-checksum-sha256')
+        if expected and digest != expected.lower():
+            os.remove(part_path)
+            state.pop('partial', None)
+            raise ChecksumError(f"{url}: sha256 {digest} != expected {expected}")
+
+        os.replace(part_path, dest)
+        return {
+            'url': url,
+            'etag': etag,
+            'last_modified': resp.get('last-modified'),
+            'sha256': digest,
+            'size': os.path.getsize(dest),
+            'fetched_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'result': 'resumed' if resumed else 'downloaded',
+        }
+
+    raise DownloadError(f"{url}: too many redirects")
+
+async def _fetch_with_retries(pool, url, dest, manifest, name, checksums):
+    """Fetch one file, retrying dropped or stalled connections (resuming where they stopped)"""
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            entry = await fetch_file(pool, url, dest, manifest.setdefault(name, {}), checksums.get(name))
+            break
+        except ResponseError as exc:
+            raise ResponseError(f"{url}: {exc}") from exc
+        except (OSError, asyncio.IncompleteReadError) as exc:
+            if attempt == MAX_RETRIES:
+                raise DownloadError(f"{url}: {exc}") from exc
+            await asyncio.sleep(0.5 * attempt)
+    entry.pop('partial', None)
+    result = entry.pop('result')
+    manifest[name] = entry
+    return name, result
+
+async def download_all(names, base_url, raw_dir=RAW_DIR, concurrency=DEFAULT_CONCURRENCY,
+                       manifest_path=MANIFEST_FILE, checksums=None, timeout=DEFAULT_TIMEOUT):
+    """Fetch many files concurrently; returns {file name: result or error message}"""
+
+    manifest = load_manifest(manifest_path)
+    checksums = checksums or {}
+    pool = ConnectionPool(concurrency, timeout)
+    base_url = base_url.rstrip('/')
+
+    async def one(name):
+        try:
+            return await _fetch_with_retries(pool, f"{base_url}/{name}", os.path.join(raw_dir, name),
+                                             manifest, name, checksums)
+        except DownloadError as exc:
+            return name, f"failed: {exc}"
+
+    try:
+        results = dict(await asyncio.gather(*(one(n) for n in names)))
+    finally:
+        pool.close()
+        save_manifest(manifest, manifest_path)
+    results['_connections'] = pool.opened
+    return results
+
+def download_countries(iso3_codes, base_url, raw_dir=RAW_DIR, concurrency=DEFAULT_CONCURRENCY,
+                       release=RTFP_RELEASE, manifest_path=MANIFEST_FILE, timeout=DEFAULT_TIMEOUT):
+    """Fetch the market price and details files for each country and print a summary"""
+
+    names = [n for iso3 in iso3_codes for n in rtfp_filenames(iso3, release)]
+    os.makedirs(raw_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    results = asyncio.run(download_all(names, base_url, raw_dir, concurrency, manifest_path, timeout=timeout))
+    elapsed = time.perf_counter() - start
+    connections = results.pop('_connections')
+
+    print(f"\n DOWNLOAD SUMMARY ({len(iso3_codes)} countries, {len(names)} files)")
+    print("=" * 40)
+    for name, result in sorted(results.items()):
+        print(f"{name}: {result}")
+
+    fetched = [n for n, r in results.items() if r in ('downloaded', 'resumed')]
+    size_mb = sum(os.path.getsize(os.path.join(raw_dir, n)) for n in fetched) / (1024 * 1024)
+    print(f"\n {len(fetched)} fetched ({size_mb:.1f} MB), "
+          f"{sum(r == 'unchanged' for r in results.values())} unchanged, "
+          f"{sum(r.startswith('failed') for r in results.values())} failed "
+          f"in {elapsed:.2f}s over {connections} connections")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download or refresh RTFP raw files")
+    parser.add_argument('countries', nargs='*',
+                        help="ISO3 codes (default: every country in the registry)")
+    parser.add_argument('--base-url', default=RTFP_BASE_URL,
+                        help="URL the RTFP files are served under (or set PRICEPULSE_RTFP_URL)")
+    parser.add_argument('--raw-dir', default=RAW_DIR)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--release', default=RTFP_RELEASE)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help="Seconds a connect or read may stall before the file is retried")
+    args = parser.parse_args()
+
+    if not args.base_url:
+        parser.error("--base-url is required (or set PRICEPULSE_RTFP_URL)")
+
+    codes = [c.upper() for c in args.countries] or [info['iso3'] for info in COUNTRY_REGISTRY.values()]
+    results = download_countries(codes, args.base_url, args.raw_dir, args.concurrency,
+                                 args.release, os.path.join(args.raw_dir, 'download_manifest.json'),
+                                 args.timeout)
+    sys.exit(1 if any(r.startswith('failed') for r in results.values()) else 0)
@@ -0,0 +1,122 @@
+import os
+import sys
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import get_country_info, get_processed_path, get_raw_path
+from storage.columnar_store import append_partitioned, clear_country_partition
+from storage.star_schema import build_star
+
+# Rows read per chunk. Peak memory scales with this, not with the file size.
+DEFAULT_CHUNKSIZE = 50_000
+
+# Descriptive RTFP columns and their types; every other column is numeric
+RTFP_STRING_COLUMNS = [
+    'ISO3', 'country', 'adm1_name', 'adm2_name', 'mkt_name', 'geo_id',
+    'currency', 'components', 'start_dense_data', 'last_survey_point',
+]
+RTFP_INT_COLUMNS = ['year', 'month']
+RTFP_DATE_COLUMN = 'price_date'
+
+def build_rtfp_schema(raw_path, keep_columns=None):
+    """Read only the header and return (usecols, dtype) for a raw RTFP file
+
+    keep_columns optionally limits the columns that are read; the date and
+    market name are always kept because the filters need them.
+    """
+
+    header = pd.read_csv(raw_path, nrows=0).columns.tolist()
+
+    usecols = header
+    if keep_columns is not None:
+        required = set(keep_columns) | {RTFP_DATE_COLUMN, 'mkt_name'}
+        usecols = [col for col in header if col in required]
+
+    dtype = {}
+    for col in usecols:
+        if col == RTFP_DATE_COLUMN:
+            continue
+        if col in RTFP_STRING_COLUMNS:
+            dtype[col] = 'string'
+        elif col in RTFP_INT_COLUMNS:
+            dtype[col] = 'Int64'
+        else:
+            dtype[col] = 'float64'
+
+    return usecols, dtype
+
+def clean_chunk(chunk, commodity_cols):
+    """Apply the cleaners' filters to one chunk"""
+
+    chunk['price_date'] = pd.to_datetime(chunk['price_date'])
+    chunk['year_month'] = chunk['price_date'].dt.to_period('M')
+
+    has_price = chunk[commodity_cols].notna().any(axis=1)
+    not_average = chunk['mkt_name'] != 'Market Average'
+    return chunk[has_price & not_average]
+
+def stream_clean_rtfp(country, commodity_cols, raw_path=None, output_path=None,
+                      chunksize=DEFAULT_CHUNKSIZE, keep_columns=None, fmt='csv', star=True):
+    """Clean a raw RTFP file chunk by chunk and append each chunk to the output
+
+    Produces the same rows as the in-memory clean_<country>_data functions
+    while holding at most one chunk in memory. When the country's cleaned CSV
+    is rewritten its star tables are rebuilt from it afterwards, as
+    save_cleaned_data does (that step reads the whole CSV; star=False skips
+    it). Returns cleaning statistics.
+    """
+
+    raw_path = raw_path or get_raw_path(country)
+    output_path = output_path or get_processed_path(country)
+    iso3 = get_country_info(country)['iso3']
+
+    if keep_columns is not None:
+        keep_columns = list(keep_columns) + list(commodity_cols)
+    usecols, dtype = build_rtfp_schema(raw_path, keep_columns)
+
+    if fmt in ('parquet', 'both'):
+        clear_country_partition('cleaned', iso3)
+
+    stats = {'rows_in': 0, 'rows_out': 0, 'chunks': 0}
+    markets = set()
+
+    reader = pd.read_csv(raw_path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+    for i, chunk in enumerate(reader):
+        stats['rows_in'] += len(chunk)
+        chunk_clean = clean_chunk(chunk, commodity_cols)
+        stats['rows_out'] += len(chunk_clean)
+        stats['chunks'] += 1
+        markets.update(chunk_clean['mkt_name'].dropna().unique())
+
+        if fmt in ('csv', 'both'):
+            chunk_clean.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        if fmt in ('parquet', 'both') and len(chunk_clean) > 0:
+            if 'ISO3' not in chunk_clean.columns:
+                chunk_clean = chunk_clean.assign(ISO3=iso3)
+            append_partitioned(chunk_clean, 'cleaned', part=i)
+
+    stats['markets'] = len(markets)
+
+    if star and fmt in ('csv', 'both') and output_path == get_processed_path(country):
+        build_star([country])
+
+    print(f"Original rows: {stats['rows_in']}")
+    print(f"After cleaning: {stats['rows_out']}")
+    print(f"Markets after cleaning: {stats['markets']}")
+    print(f"Chunks processed: {stats['chunks']} (chunksize {chunksize:,})")
+
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream-clean a raw RTFP country file")
+    parser.add_argument('country', help="Registry country name or ISO3 code")
+    parser.add_argument('--commodities', nargs='+', required=True,
+                        help="Commodity columns used to drop rows without prices")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv')
+    args = parser.parse_args()
+
+    stream_clean_rtfp(args.country, args.commodities, chunksize=args.chunksize, fmt=args.format)
@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import argparse
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlsplit, unquote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import RAW_DIR
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8766
+BLOCK_SIZE = 1 << 16
+
+class FixtureStore:
+    """Files served by the stand-in, with ETags and checksums computed once"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.meta = {}
+
+    def lookup(self, name):
+        """(path, size, etag, last_modified, sha256) for a file name, or None"""
+        path = os.path.join(self.root, os.path.basename(unquote(name)))
+        if not os.path.isfile(path):
+            return None
+        st = os.stat(path)
+        cached = self.meta.get(path)
+        if cached is None or cached[0] != (st.st_size, st.st_mtime_ns):
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+            digest = h.hexdigest()
+            cached = ((st.st_size, st.st_mtime_ns), f'"{digest[:32]}"', formatdate(st.st_mtime, usegmt=True), digest)
+            self.meta[path] = cached
+        _, etag, last_modified, digest = cached
+        return path, st.st_size, etag, last_modified, digest
+
+class FixtureServer:
+    """HTTP/1.1 stand-in for the RTFP file host
+
+    Supports keep-alive, conditional GETs (If-None-Match/If-Modified-Since),
+    byte ranges with If-Range, and can add latency, cut transfers short or
+    stall them to exercise the downloader's retry, timeout and resume paths.
+    """
+
+    def __init__(self, root, latency=0.0, drop_after=None, stall_after=None):
+        self.store = FixtureStore(root)
+        self.latency = latency
+        # Close the connection after this many body bytes of a full response
+        self.drop_after = drop_after
+        # Go silent, connection open, after this many body bytes of a full response
+        self.stall_after = stall_after
+        self.requests = 0
+        self.bytes_sent = 0
+        self.status_counts = {}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                parts = request_line.decode('latin-1').split()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                if not await self.respond(parts, headers, writer, keep_alive) or not keep_alive:
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, parts, headers, writer, keep_alive):
+        """Write one response; returns False if the connection was cut on purpose"""
+
+        if len(parts) < 2 or parts[0] not in ('GET', 'HEAD'):
+            return await self._send(writer, 405, {}, b'', keep_alive)
+
+        found = self.store.lookup(urlsplit(parts[1]).path)
+        if found is None:
+            return await self._send(writer, 404, {}, b'', keep_alive)
+        path, size, etag, last_modified, digest = found
+
+        validators = {'ETag': etag, 'Last-Modified': last_modified, 'X-Checksum-Sha256': digest,
+                      'Accept-Ranges': 'bytes'}
+        if self._not_modified(headers, etag, last_modified):
+            return await self._send(writer, 304, validators, b'', keep_alive)
+
+        start, status = 0, 200
+        range_header = headers.get('range', '')
+        if range_header.startswith('bytes=') and headers.get('if-range', etag) == etag:
+            start = int(range_header[6:].split('-')[0] or 0)
+            if start >= size:
+                return await self._send(writer, 416, {'Content-Range': f"bytes */{size}"}, b'', keep_alive)
+            status = 206
+            validators['Content-Range'] = f"bytes {start}-{size - 1}/{size}"
+
+        length = size - start
+        writer.write(self._head(status, {**validators, 'Content-Length': length}, keep_alive))
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if parts[0] == 'HEAD':
+            await writer.drain()
+            return True
+
+        cut = self.drop_after if self.drop_after is not None else self.stall_after
+        limit = cut if status == 200 else None
+        sent = 0
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while block := f.read(BLOCK_SIZE):
+                if limit is not None and sent + len(block) > limit:
+                    writer.write(block[:limit - sent])
+                    await writer.drain()
+                    self.bytes_sent += limit - sent
+                    if self.drop_after is None:
+                        # Hold the connection open without sending; the client has to time out
+                        await writer.wait_closed()
+                    return False
+                writer.write(block)
+                await writer.drain()
+                sent += len(block)
+        self.bytes_sent += sent
+        return True
+
+    @staticmethod
+    def _not_modified(headers, etag, last_modified):
+        if 'if-none-match' in headers:
+            return etag in [t.strip() for t in headers['if-none-match'].split(',')]
+        if 'if-modified-since' in headers:
+            try:
+                return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(headers['if-modified-since'])
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _head(status, headers, keep_alive):
+        reasons = {200: 'OK', 206: 'Partial Content', 304: 'Not Modified', 404: 'Not Found',
+                   405: 'Method Not Allowed', 416: 'Range Not Satisfiable'}
+        lines = [f"HTTP/1.1 {status} {reasons[status]}", f"Date: {formatdate(usegmt=True)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def _send(self, writer, status, headers, body, keep_alive):
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        writer.write(self._head(status, {**headers, 'Content-Length': len(body)}, keep_alive) + body)
+        await writer.drain()
+        return True
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start listening; returns the asyncio server (port 0 picks a free port)"""
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+async def serve(server, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run the stand-in until cancelled"""
+    listener = await server.start(host, port)
+    bound_port = listener.sockets[0].getsockname()[1]
+    print(f" Serving {server.store.root} on http://{host}:{bound_port}")
+    print(f"   python src/processing/rtfp_downloader.py --base-url http://{host}:{bound_port}")
+    async with listener:
+        await listener.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in HTTP server for RTFP fixture files")
+    parser.add_argument('--root', default=RAW_DIR, help="Directory of files to serve")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Seconds of simulated network latency per request")
+    parser.add_argument('--drop-after', type=int,
+                        help="Cut full responses after this many bytes (to test resume)")
+    parser.add_argument('--stall-after', type=int,
+                        help="Stop sending full responses after this many bytes (to test --timeout)")
+    args = parser.parse_args()
+
+    fixture_server = FixtureServer(args.root, args.latency, args.drop_after, args.stall_after)
+    start = time.perf_counter()
+    try:
+        asyncio.run(serve(fixture_server, args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\n {fixture_server.requests} requests, {fixture_server.bytes_sent / 1e6:.1f} MB sent "
+              f"in {time.perf_counter() - start:.0f}s, statuses {fixture_server.status_counts}")
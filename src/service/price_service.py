@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY
+from multi_country.long_format import ORDINAL_EPOCH_YEAR, build_long_table
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Number of distinct query responses kept in memory
+RESPONSE_CACHE_SIZE = 10_000
+
+# Upper edges (milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000]
+
+class QueryError(Exception):
+    """Bad request parameters; reported to the client as HTTP 400"""
+
+class PriceIndex:
+    """In-memory indexes over the long-format price table
+
+    Series are keyed by (country, commodity, market) and hold month ordinals
+    sorted ascending with their prices, so point lookups are a dict hit plus a
+    binary search and range slices are two binary searches.
+    """
+
+    def __init__(self, long_df):
+        self.series = {}
+        self.market_names = {}
+        self.currencies = {}
+
+        long_df = long_df.sort_values(['country_code', 'commodity', 'mkt_name', 'month_ordinal'])
+        grouped = long_df.groupby(['country_code', 'commodity', 'mkt_name'], observed=True, sort=False)
+        for (iso3, commodity, market), rows in grouped:
+            key = (iso3, commodity, market.lower())
+            self.series[key] = (
+                rows['month_ordinal'].to_numpy().tolist(),
+                rows['price_local'].to_numpy(dtype='float64').tolist(),
+            )
+            self.market_names[(iso3, market.lower())] = market
+            self.currencies[iso3] = str(rows['currency'].iloc[0])
+
+        # commodity -> month -> country -> (sum, count) for cross-country comparisons
+        self.by_commodity_month = {}
+        sums = long_df.groupby(['commodity', 'month_ordinal', 'country_code'], observed=True)['price_local']
+        for (commodity, month, iso3), (total, count) in sums.agg(['sum', 'count']).iterrows():
+            months = self.by_commodity_month.setdefault(commodity, {})
+            months.setdefault(int(month), {})[iso3] = (float(total), int(count))
+
+        self.observations = len(long_df)
+
+    def _series(self, country, commodity, market):
+        iso3 = _iso3(country)
+        key = (iso3, commodity.lower(), market.lower())
+        if key not in self.series:
+            raise QueryError(f"No {commodity} series for market '{market}' in {iso3}")
+        return iso3, self.market_names[(iso3, market.lower())], self.series[key]
+
+    def point(self, country, commodity, market, month):
+        """Price of one series in one month"""
+        iso3, market_name, (months, prices) = self._series(country, commodity, market)
+        ordinal = _month_ordinal(month)
+        i = bisect_left(months, ordinal)
+        found = i < len(months) and months[i] == ordinal
+        return {
+            'country_code': iso3,
+            'market': market_name,
+            'commodity': commodity.lower(),
+            'month': _month_label(ordinal),
+            'price': prices[i] if found else None,
+            'currency': self.currencies[iso3],
+        }
+
+    def range(self, country, commodity, market, start=None, end=None):
+        """Monthly prices of one series between two months (inclusive)"""
+        iso3, market_name, (months, prices) = self._series(country, commodity, market)
+        lo = bisect_left(months, _month_ordinal(start)) if start else 0
+        hi = bisect_right(months, _month_ordinal(end)) if end else len(months)
+        return {
+            'country_code': iso3,
+            'market': market_name,
+            'commodity': commodity.lower(),
+            'currency': self.currencies[iso3],
+            'prices': [{'month': _month_label(m), 'price': p} for m, p in zip(months[lo:hi], prices[lo:hi])],
+        }
+
+    def compare(self, commodity, month):
+        """Average price of a commodity in every country for one month"""
+        ordinal = _month_ordinal(month)
+        per_country = self.by_commodity_month.get(commodity.lower(), {}).get(ordinal, {})
+        return {
+            'commodity': commodity.lower(),
+            'month': _month_label(ordinal),
+            'countries': {
+                iso3: {'avg_price': total / count, 'markets': count, 'currency': self.currencies[iso3]}
+                for iso3, (total, count) in sorted(per_country.items())
+            },
+        }
+
+    def markets(self, country, commodity=None):
+        """Markets (and their commodities) available for a country"""
+        iso3 = _iso3(country)
+        found = {}
+        for (key_iso3, key_commodity, market), _ in self.series.items():
+            if key_iso3 == iso3 and (commodity is None or key_commodity == commodity.lower()):
+                found.setdefault(self.market_names[(iso3, market)], []).append(key_commodity)
+        return {'country_code': iso3, 'markets': dict(sorted(found.items()))}
+
+def _iso3(country):
+    """ISO3 code for a country name or code, in any letter case"""
+    wanted = country.strip().lower()
+    for name, info in COUNTRY_REGISTRY.items():
+        if wanted in (name.lower(), info['iso3'].lower()):
+            return info['iso3']
+    raise QueryError(f"Unknown country: {country}")
+
+def _month_ordinal(month):
+    """Parse 'YYYY-MM' (or 'YYYY-MM-DD') into a month ordinal"""
+    try:
+        year, mon = int(month[:4]), int(month[5:7])
+    except (TypeError, ValueError):
+        raise QueryError(f"Bad month '{month}', expected YYYY-MM")
+    if month[4:5] != '-' or not 1 <= mon <= 12:
+        raise QueryError(f"Bad month '{month}', expected YYYY-MM")
+    return (year - ORDINAL_EPOCH_YEAR) * 12 + mon - 1
+
+def _month_label(ordinal):
+    return f"{ordinal // 12 + ORDINAL_EPOCH_YEAR:04d}-{ordinal % 12 + 1:02d}"
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram plus a window of recent samples for percentiles"""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS, window=50_000):
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect_left(self.buckets_ms, ms)] += 1
+        self.recent.append(ms)
+
+    def snapshot(self):
+        labels = [f"<={b}ms" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        result = {'requests': sum(self.counts), 'histogram': dict(zip(labels, self.counts))}
+        if self.recent:
+            samples = np.fromiter(self.recent, dtype='float64')
+            for p in (50, 90, 99, 99.9):
+                result[f"p{p}_ms"] = round(float(np.percentile(samples, p)), 4)
+        return result
+
+class PriceService:
+    """Routes queries to the index, with an LRU response cache and latency stats"""
+
+    def __init__(self, index, cache_size=RESPONSE_CACHE_SIZE):
+        self.index = index
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.latency = LatencyHistogram()
+
+    def handle(self, target):
+        """Return (status, body bytes) for a request target like '/price?...'"""
+
+        start = time.perf_counter()
+        cached = self.cache.get(target)
+        if cached is not None:
+            self.cache.move_to_end(target)
+            self.cache_hits += 1
+            self.latency.record(time.perf_counter() - start)
+            return cached
+
+        status, body = self._route(target)
+        response = (status, json.dumps(body).encode())
+        if status == 200 and not target.startswith('/stats'):
+            self.cache[target] = response
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        self.latency.record(time.perf_counter() - start)
+        return response
+
+    def _route(self, target):
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == '/price':
+                return 200, self.index.point(params['country'], params['commodity'], params['market'], params['month'])
+            if url.path == '/series':
+                return 200, self.index.range(params['country'], params['commodity'], params['market'],
+                                             params.get('start'), params.get('end'))
+            if url.path == '/compare':
+                return 200, self.index.compare(params['commodity'], params['month'])
+            if url.path == '/markets':
+                return 200, self.index.markets(params['country'], params.get('commodity'))
+            if url.path == '/stats':
+                return 200, {
+                    'observations': self.index.observations,
+                    'series': len(self.index.series),
+                    'response_cache': {'entries': len(self.cache), 'hits': self.cache_hits},
+                    'latency': self.latency.snapshot(),
+                }
+            if url.path == '/health':
+                return 200, {'status': 'ok'}
+            return 404, {'error': f"Unknown endpoint {url.path}"}
+        except KeyError as exc:
+            return 400, {'error': f"Missing parameter {exc.args[0]}"}
+        except QueryError as exc:
+            return 400, {'error': str(exc)}
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+async def _handle_connection(service, reader, writer):
+    """Serve HTTP/1.1 requests on one connection (keep-alive until the client closes)"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            keep_alive = True
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b'\n', b''):
+                    break
+                if header.lower().startswith(b'connection:') and b'close' in header.lower():
+                    keep_alive = False
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] != 'GET':
+                status, body = 405, b'{"error": "Only GET is supported"}'
+            else:
+                status, body = service.handle(parts[1])
+
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionResetError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run the HTTP server until cancelled"""
+    server = await asyncio.start_server(
+        lambda r, w: _handle_connection(service, r, w), host, port, backlog=1024,
+    )
+    print(f" PricePulse price service listening on http://{host}:{port}")
+    print("   /price?country=MLI&commodity=sorghum&market=Mopti&month=2024-03")
+    print("   /series?country=KEN&commodity=maize&market=Kitui&start=2015-01&end=2016-12")
+    print("   /compare?commodity=sorghum&month=2020-06   /markets?country=SEN   /stats")
+    async with server:
+        await server.serve_forever()
+
+def build_service(fmt='csv'):
+    """Load the unified data once and index it"""
+    start = time.perf_counter()
+    # float64 so prices come back exactly as stored (float32 turns 39.17 into 39.16999816894531)
+    index = PriceIndex(build_long_table(fmt=fmt, report=False, price_dtype='float64'))
+    print(f" Indexed {index.observations:,} prices in {len(index.series):,} series "
+          f"({time.perf_counter() - start:.2f}s)")
+    return PriceService(index)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local PricePulse price query service")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Storage format to read cleaned data from")
+    args = parser.parse_args()
+
+    service = build_service(args.format)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,263 @@
+import os
+import ast
+import sys
+import json
+import pickle
+import shutil
+import hashlib
+import inspect
+import functools
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import PROCESSED_DIR
+
+# Root of the in-repo modules; code versions cover every one a function's module imports
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CACHE_DIR = os.environ.get('PRICEPULSE_CACHE_DIR', os.path.join(PROCESSED_DIR, '.cache'))
+
+# Size cap for the whole cache; least recently used entries are evicted past it
+CACHE_MAX_MB = float(os.environ.get('PRICEPULSE_CACHE_MB', 512))
+
+# Set PRICEPULSE_CACHE=0 to always recompute
+CACHE_ENABLED = os.environ.get('PRICEPULSE_CACHE', '1') != '0'
+
+# Bump to invalidate every entry after a change the source hash cannot see
+CACHE_VERSION = 1
+
+# Remembered file digests, keyed by path and validated by size + mtime
+DIGEST_INDEX = 'file_digests.json'
+
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+def file_digest(path):
+    """SHA-256 of a file (or of every file under a directory)
+
+    Digests are remembered per (size, mtime) so unchanged inputs are not
+    re-read on every run.
+    """
+
+    if os.path.isdir(path):
+        h = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                h.update(os.path.relpath(file_path, path).encode())
+                h.update(file_digest(file_path).encode())
+        return h.hexdigest()
+
+    index = _load_digest_index()
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    entry = index.get(key)
+    if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+        return entry['sha256']
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+
+    index[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': h.hexdigest()}
+    _save_digest_index(index)
+    return h.hexdigest()
+
+def _load_digest_index():
+    path = os.path.join(CACHE_DIR, DIGEST_INDEX)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+def _save_digest_index(index):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _atomic_write(os.path.join(CACHE_DIR, DIGEST_INDEX), json.dumps(index).encode())
+
+def _atomic_write(path, data):
+    """Write bytes so readers never see a half-written file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _fingerprint(obj):
+    """Stable description of an argument for the cache key"""
+
+    if isinstance(obj, pd.DataFrame):
+        content = pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes()
+        return 'df:' + hashlib.sha256(content + repr(list(obj.columns)).encode()).hexdigest()
+    if callable(obj):
+        return 'fn:' + _code_version(obj)
+    if isinstance(obj, (list, tuple)):
+        return '[' + ','.join(_fingerprint(o) for o in obj) + ']'
+    if isinstance(obj, dict):
+        return '{' + ','.join(f"{k}={_fingerprint(v)}" for k, v in sorted(obj.items())) + '}'
+    return repr(obj)
+
+def _module_file(name):
+    """Path of an in-repo module ('storage.cache' -> src/storage/cache.py), or None"""
+    path = os.path.join(SRC_DIR, *name.split('.')) + '.py'
+    return path if os.path.isfile(path) else None
+
+@functools.lru_cache(maxsize=None)
+def _imported_files(path):
+    """Source files of the in-repo modules a file imports, at module level or inside functions"""
+
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return tuple(sorted(filter(None, map(_module_file, names))))
+
+@functools.lru_cache(maxsize=None)
+def source_digest(paths):
+    """SHA-256 of source files plus every in-repo module they import, transitively
+
+    A function's result can change when anything it calls changes, or when
+    the registry entries it reads do, so code versions cover the whole
+    in-repo import closure rather than one function's source. Remembered
+    per process.
+    """
+
+    seen = set()
+    stack = list(paths)
+    while stack:
+        path = os.path.abspath(stack.pop())
+        if path not in seen:
+            seen.add(path)
+            stack.extend(_imported_files(path))
+
+    h = hashlib.sha256()
+    for path in sorted(seen):
+        h.update(os.path.relpath(path, SRC_DIR).encode())
+        h.update(file_digest(path).encode())
+    return h.hexdigest()
+
+def _code_version(func):
+    """Qualified name plus a hash of the function's module and the in-repo modules it imports"""
+    func = inspect.unwrap(func)
+    name = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+    try:
+        path = os.path.abspath(inspect.getsourcefile(func) or '')
+    except TypeError:
+        path = ''
+    if path.startswith(SRC_DIR + os.sep):
+        return name + ':' + source_digest((path,))[:16]
+
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = ''
+    return name + ':' + hashlib.sha256(source.encode()).hexdigest()[:16]
+
+def cache_key(func, args=(), kwargs=None, input_files=()):
+    """Content-addressed key: input file contents + code version + parameters"""
+
+    parts = [
+        f"v{CACHE_VERSION}",
+        _code_version(func),
+        _fingerprint(list(args)),
+        _fingerprint(kwargs or {}),
+    ]
+    parts += [f"{os.path.basename(p)}={file_digest(p)}" for p in input_files]
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+def cached_call(func, *args, input_files=(), **kwargs):
+    """Call func(*args, **kwargs), reusing a stored result when nothing changed
+
+    input_files lists the files (or directories) the result depends on; their
+    contents are part of the key, along with the function source and arguments.
+    """
+
+    if not CACHE_ENABLED:
+        return func(*args, **kwargs)
+
+    key = cache_key(func, args, kwargs, input_files)
+    path = os.path.join(CACHE_DIR, key[:2], key + '.pkl')
+
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(path)  # mark as recently used for LRU eviction
+            _stats['hits'] += 1
+            return result
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass  # corrupt entry, recompute below
+
+    _stats['misses'] += 1
+    result = func(*args, **kwargs)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _atomic_write(path, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+    evict_lru()
+    return result
+
+def _cache_entries():
+    """(path, size, last_used) for every stored result"""
+    entries = []
+    if not os.path.isdir(CACHE_DIR):
+        return entries
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if name.endswith('.pkl'):
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                entries.append((path, st.st_size, st.st_mtime))
+    return entries
+
+def evict_lru(max_mb=None):
+    """Delete least recently used entries until the cache fits its size cap"""
+
+    max_bytes = (CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    entries = sorted(_cache_entries(), key=lambda e: e[2])
+    total = sum(size for _, size, _ in entries)
+
+    for path, size, _ in entries:
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        _stats['evictions'] += 1
+
+def cache_stats():
+    """Hit/miss counters for this process plus the cache's current size"""
+    entries = _cache_entries()
+    lookups = _stats['hits'] + _stats['misses']
+    return {
+        **_stats,
+        'hit_rate': _stats['hits'] / lookups if lookups else 0.0,
+        'entries': len(entries),
+        'size_mb': sum(size for _, size, _ in entries) / (1024 * 1024),
+    }
+
+def print_cache_stats():
+    """Print a one-line cache summary"""
+    s = cache_stats()
+    print(f" Cache: {s['hits']} hits, {s['misses']} misses ({s['hit_rate']:.0%} hit rate), "
+          f"{s['entries']} entries, {s['size_mb']:.1f} MB, {s['evictions']} evicted")
+
+def clear_cache():
+    """Remove every cached result and remembered digest"""
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+def _read_and_clean(raw_path, clean_func):
+    """Read a raw RTFP file and run a country cleaner on it"""
+    return clean_func(pd.read_csv(raw_path))
+
+def cached_clean(raw_path, clean_func):
+    """Run a clean_<country>_data function, skipping it when the raw file and cleaner code are unchanged"""
+    return cached_call(_read_and_clean, raw_path, clean_func, input_files=[raw_path])
@@ -0,0 +1,269 @@
+import os
+import sys
+import shutil
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import PROCESSED_DIR, get_country_info, get_processed_path
+from storage.star_schema import load_wide, save_star
+
+# Partitioned Parquet datasets live next to the processed CSVs
+PARQUET_DIR = os.path.join(PROCESSED_DIR, 'parquet')
+
+# Partition layout of each dataset: country first, then year
+DATASET_PARTITIONS = {
+    'cleaned': ('ISO3', 'year'),
+    'unified': ('country_code', 'year'),
+}
+
+# String columns with few distinct values are stored dictionary-encoded
+CATEGORY_MAX_RATIO = 0.5
+
+def _require_pyarrow():
+    """Import pyarrow or explain how to get it"""
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from exc
+    return pq
+
+def dataset_path(name):
+    """Directory of a partitioned dataset"""
+    return os.path.join(PARQUET_DIR, name)
+
+def prepare_for_parquet(df, categorize=True):
+    """Give a frame typed dates, a year column and categorical strings"""
+
+    df = df.copy()
+    df['price_date'] = pd.to_datetime(df['price_date'])
+
+    if 'year' not in df.columns:
+        df['year'] = df['price_date'].dt.year
+    df['year'] = df['year'].astype('int32')
+
+    # Periods are stored as 'YYYY-MM' strings, the same as the CSVs
+    if 'year_month' in df.columns:
+        df['year_month'] = df['year_month'].astype(str)
+
+    # Prices are floats everywhere so country partitions share one schema
+    for col in df.select_dtypes('number').columns:
+        if col not in ('year', 'month'):
+            df[col] = df[col].astype('float64')
+
+    for col in df.columns if categorize else []:
+        if df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+            if df[col].nunique() <= max(1, len(df) * CATEGORY_MAX_RATIO):
+                df[col] = df[col].astype('category')
+
+    return df
+
+def write_partitioned(df, name):
+    """Write a frame into a dataset, replacing the partitions it covers"""
+
+    pq = _require_pyarrow()
+    import pyarrow as pa
+
+    partition_cols = list(DATASET_PARTITIONS[name])
+    df = prepare_for_parquet(df)
+    for col in partition_cols:
+        df[col] = df[col].astype(str)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=dataset_path(name),
+        partition_cols=partition_cols,
+        existing_data_behavior='delete_matching',
+    )
+    return dataset_path(name)
+
+def append_partitioned(df, name, part):
+    """Add a frame to a dataset without touching files already written
+
+    Used by the streaming cleaners, where several chunks land in the same
+    country/year partition. part must be unique per call within a run.
+    """
+
+    pq = _require_pyarrow()
+    import pyarrow as pa
+
+    # Chunks are too small to judge cardinality, so strings stay plain
+    # (Parquet still dictionary-encodes them on disk)
+    partition_cols = list(DATASET_PARTITIONS[name])
+    df = prepare_for_parquet(df, categorize=False)
+    for col in partition_cols:
+        df[col] = df[col].astype(str)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=dataset_path(name),
+        partition_cols=partition_cols,
+        basename_template=f"part-{part:05d}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+def clear_country_partition(name, country):
+    """Remove everything stored for one country in a dataset"""
+
+    country_col = DATASET_PARTITIONS[name][0]
+    iso3 = get_country_info(country)['iso3']
+    shutil.rmtree(os.path.join(dataset_path(name), f"{country_col}={iso3}"), ignore_errors=True)
+
+def _country_partitions(name, countries=None):
+    """Country partition directories of a dataset, optionally restricted"""
+
+    country_col = DATASET_PARTITIONS[name][0]
+    root = dataset_path(name)
+    if not os.path.isdir(root):
+        return []
+
+    found = sorted(d.split('=', 1)[1] for d in os.listdir(root) if d.startswith(f"{country_col}="))
+    if countries is not None:
+        wanted = {get_country_info(c)['iso3'] for c in countries}
+        found = [iso3 for iso3 in found if iso3 in wanted]
+
+    return [(iso3, os.path.join(root, f"{country_col}={iso3}")) for iso3 in found]
+
+def read_partitioned(name, columns=None, countries=None, years=None, filters=None):
+    """Read a dataset, loading only the requested columns and partitions
+
+    countries are names or ISO3 codes, years are ints. Extra filters can be
+    passed as a list of (column, op, value) tuples. Each country partition is
+    read with its own schema, so a requested column a country does not carry
+    comes back as NaN instead of failing.
+    """
+
+    pq = _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    country_col, year_col = DATASET_PARTITIONS[name]
+    predicates = list(filters or [])
+    if years is not None:
+        predicates.append((year_col, 'in', [int(y) for y in years]))
+    expression = pq.filters_to_expression(predicates) if predicates else None
+
+    frames = []
+    for iso3, path in _country_partitions(name, countries):
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+        present = None
+        if columns is not None:
+            present = [c for c in columns if c in dataset.schema.names]
+
+        df = dataset.to_table(columns=present, filter=expression).to_pandas()
+        if columns is None or country_col in columns:
+            df[country_col] = iso3
+        if columns is not None:
+            df = df.reindex(columns=list(columns))
+        frames.append(df)
+
+    if not frames:
+        raise FileNotFoundError(f"No {name} Parquet data for {countries or 'any country'}")
+
+    df = pd.concat(frames, ignore_index=True)
+
+    # Partition keys are restored with compact types
+    if year_col in df.columns:
+        df[year_col] = df[year_col].astype('int32')
+    if country_col in df.columns:
+        df[country_col] = df[country_col].astype('category')
+
+    return df
+
+def upsert_partitioned(df_new, name, key_cols=('mkt_name', 'price_date')):
+    """Merge new rows into a dataset, rewriting only the partitions they touch
+
+    Existing rows with the same key are replaced by the new ones. Returns the
+    list of (country, year) partitions that were rewritten.
+    """
+
+    country_col, year_col = DATASET_PARTITIONS[name]
+    df_new = prepare_for_parquet(df_new, categorize=False)
+    key_cols = list(key_cols)
+
+    touched = []
+    for (iso3, year), new_rows in df_new.groupby([country_col, year_col], observed=True):
+        try:
+            existing = read_partitioned(name, countries=[iso3], years=[year])
+        except FileNotFoundError:
+            existing = new_rows.iloc[0:0]
+
+        if len(existing) > 0:
+            existing_keys = pd.MultiIndex.from_frame(existing[key_cols])
+            new_keys = pd.MultiIndex.from_frame(new_rows[key_cols])
+            existing = existing[~existing_keys.isin(new_keys)]
+
+        merged = pd.concat([existing, new_rows], ignore_index=True)
+        merged = merged.sort_values(key_cols).reset_index(drop=True)
+        write_partitioned(merged, name)
+        touched.append((iso3, int(year)))
+
+    return touched
+
+def save_cleaned_data(df_clean, country, fmt='csv', star=True):
+    """Save a cleaned country frame as CSV (plus star tables) and/or the Parquet dataset
+
+    Pass star=False when several countries are saved in parallel; the star
+    tables share dimension files, so build them afterwards with build_star().
+    """
+
+    if fmt in ('csv', 'both'):
+        df_clean.to_csv(get_processed_path(country), index=False)
+        if star:
+            save_star(df_clean, country)
+    if fmt in ('parquet', 'both'):
+        if 'ISO3' not in df_clean.columns:
+            df_clean = df_clean.assign(ISO3=get_country_info(country)['iso3'])
+        write_partitioned(df_clean, 'cleaned')
+
+def upsert_cleaned_csv(df_new, country, key_cols=('mkt_name', 'price_date')):
+    """Merge new cleaned rows into a country's cleaned CSV; returns the rows it now holds
+
+    Existing rows with the same key are replaced. The file is rewritten
+    atomically, so readers see either the old or the new version.
+    """
+
+    path = get_processed_path(country)
+    key_cols = list(key_cols)
+    df_new = df_new.assign(price_date=pd.to_datetime(df_new['price_date']))
+    if os.path.exists(path):
+        existing = pd.read_csv(path, parse_dates=['price_date'])
+        existing_keys = pd.MultiIndex.from_frame(existing[key_cols])
+        existing = existing[~existing_keys.isin(pd.MultiIndex.from_frame(df_new[key_cols]))]
+        merged = pd.concat([existing, df_new], ignore_index=True)
+        # The streaming schema reads some integer columns as floats; keep the file's types
+        for col in existing.columns:
+            if pd.api.types.is_integer_dtype(existing[col]) and merged[col].notna().all():
+                merged[col] = merged[col].astype(existing[col].dtype)
+    else:
+        merged = df_new
+
+    tmp_path = path + '.tmp'
+    merged.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return len(merged)
+
+def load_cleaned_data(country, columns=None, years=None, fmt='csv'):
+    """Load one cleaned country, optionally only some columns and years"""
+
+    if fmt == 'parquet':
+        return read_partitioned('cleaned', columns=columns, countries=[country], years=years)
+    if fmt == 'star':
+        return load_wide(country, columns=columns, years=years)
+
+    if columns is None:
+        df = pd.read_csv(get_processed_path(country), parse_dates=['price_date'])
+    else:
+        wanted = set(columns) | ({'year'} if years is not None else set())
+        df = pd.read_csv(get_processed_path(country), usecols=lambda c: c in wanted)
+        if 'price_date' in df.columns:
+            df['price_date'] = pd.to_datetime(df['price_date'])
+
+    if years is not None:
+        df = df[df['year'].isin(years)]
+    if columns is not None:
+        df = df.reindex(columns=list(columns))
+    return df
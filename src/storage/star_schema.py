@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import COUNTRY_REGISTRY, PROCESSED_DIR, get_country_info, get_processed_path
+
+# Dimension and fact tables live next to the processed CSVs
+STAR_DIR = os.path.join(PROCESSED_DIR, 'star')
+SERIES_DIM_FILE = os.path.join(STAR_DIR, 'dim_series.csv')
+MARKET_DIM_FILE = os.path.join(STAR_DIR, 'dim_market.csv')
+
+# Descriptors that only vary per country/release (one series row per distinct combination)
+SERIES_COLUMNS = ['ISO3', 'country', 'currency', 'components', 'start_dense_data', 'last_survey_point',
+                  'data_coverage', 'data_coverage_recent', 'index_confidence_score']
+
+# Descriptors that only vary per market
+MARKET_COLUMNS = ['adm1_name', 'adm2_name', 'mkt_name', 'lat', 'lon', 'geo_id']
+MARKET_NATURAL_KEY = ['ISO3', 'mkt_name', 'geo_id']
+
+# Descriptors read back as strings whatever they look like
+TEXT_COLUMNS = ['ISO3', 'country', 'currency', 'components', 'start_dense_data', 'last_survey_point',
+                'adm1_name', 'adm2_name', 'mkt_name', 'geo_id']
+
+# Derived from price_date, so rebuilt on join instead of stored
+DATE_COLUMNS = ['year', 'month', 'year_month']
+
+# Column order of the cleaned (wide) files; measures go between these
+WIDE_PREFIX = ['ISO3', 'country', 'adm1_name', 'adm2_name', 'mkt_name', 'lat', 'lon', 'geo_id', 'price_date',
+               'year', 'month', 'currency', 'components', 'start_dense_data', 'last_survey_point',
+               'data_coverage', 'data_coverage_recent', 'index_confidence_score']
+
+def fact_path(country):
+    """Fact table of one country"""
+    return os.path.join(STAR_DIR, f"fact_{get_country_info(country)['iso3'].lower()}.csv")
+
+def _as_text(frame):
+    """Natural-key columns as text, numbers as floats first so 0 and 0.0 compare equal"""
+    return pd.DataFrame({c: (frame[c].astype('float64') if pd.api.types.is_numeric_dtype(frame[c])
+                             else frame[c]).astype(str) for c in frame.columns})
+
+def _assign_keys(rows, existing, natural_key, key_col):
+    """Surrogate keys for rows, reusing those of matching existing rows and numbering new ones after them"""
+
+    if existing is None or len(existing) == 0:
+        return np.arange(len(rows), dtype='int64')
+
+    left = _as_text(rows[natural_key])
+    right = _as_text(existing[natural_key]).assign(**{key_col: existing[key_col].to_numpy()})
+    found = left.merge(right, on=natural_key, how='left')[key_col]
+    missing = found.isna().to_numpy()
+    keys = found.to_numpy(dtype='float64', copy=True)
+    keys[missing] = existing[key_col].max() + 1 + np.arange(missing.sum())
+    return keys.astype('int64')
+
+def split_star(df_clean, country, series_dim=None, market_dim=None):
+    """Split one cleaned (wide) frame into series and market dimensions plus a slim fact table
+
+    Keys already in the given dimensions are reused so they stay stable
+    across runs and countries. Returns (series_dim, market_dim, fact) with
+    the dimensions covering every country seen so far.
+    """
+
+    df = df_clean
+    if 'ISO3' not in df.columns:
+        df = df.assign(ISO3=get_country_info(country)['iso3'])
+    series_cols = [c for c in SERIES_COLUMNS if c in df.columns]
+    market_cols = [c for c in MARKET_COLUMNS if c in df.columns]
+
+    # Series dimension: one row per distinct descriptor combination
+    series_codes, series_rows = pd.factorize(pd.MultiIndex.from_frame(df[series_cols]))
+    new_series = series_rows.to_frame(index=False, name=series_cols)
+    new_series.insert(0, 'series_key', _assign_keys(new_series, series_dim, series_cols, 'series_key'))
+
+    # Market dimension: one row per market, pointing at its series row
+    markets = df[market_cols].assign(ISO3=df['ISO3'].to_numpy(),
+                                     series_key=new_series['series_key'].to_numpy()[series_codes])
+    markets = markets.drop_duplicates(MARKET_NATURAL_KEY, keep='last').reset_index(drop=True)
+    markets.insert(0, 'market_key', _assign_keys(markets, market_dim, MARKET_NATURAL_KEY, 'market_key'))
+
+    row_market = markets.set_index(MARKET_NATURAL_KEY)['market_key'].reindex(
+        pd.MultiIndex.from_frame(df[MARKET_NATURAL_KEY])).to_numpy()
+
+    dimension_cols = set(SERIES_COLUMNS) | set(MARKET_COLUMNS) | set(DATE_COLUMNS)
+    measures = [c for c in df.columns if c not in dimension_cols and c != 'price_date']
+    fact = pd.DataFrame({'market_key': row_market, 'price_date': pd.to_datetime(df['price_date']).to_numpy()})
+    fact = pd.concat([fact, df[measures].reset_index(drop=True)], axis=1)
+
+    # Newer descriptors replace older ones; other countries' rows are kept
+    def merged(existing, new, key_col):
+        if existing is None or len(existing) == 0:
+            return new.sort_values(key_col, ignore_index=True)
+        kept = existing[~existing[key_col].isin(new[key_col])]
+        return pd.concat([kept, new], ignore_index=True).sort_values(key_col, ignore_index=True)
+
+    return (merged(series_dim, new_series, 'series_key'),
+            merged(market_dim, markets[['market_key', 'series_key', 'ISO3'] + market_cols], 'market_key'),
+            fact.sort_values(['market_key', 'price_date'], ignore_index=True))
+
+def load_dimensions():
+    """Load (series_dim, market_dim), or (None, None) if no star tables exist yet"""
+    if not os.path.exists(MARKET_DIM_FILE):
+        return None, None
+    text_cols = {c: str for c in TEXT_COLUMNS}
+    return pd.read_csv(SERIES_DIM_FILE, dtype=text_cols), pd.read_csv(MARKET_DIM_FILE, dtype=text_cols)
+
+def save_star(df_clean, country, replace=True):
+    """Write a cleaned country frame as star tables
+
+    With replace=False the fact rows are merged into the country's existing
+    fact table (rows with the same market and date are replaced), as for
+    incremental snapshots.
+    """
+
+    os.makedirs(STAR_DIR, exist_ok=True)
+    series_dim, market_dim, fact = split_star(df_clean, country, *load_dimensions())
+
+    path = fact_path(country)
+    if not replace and os.path.exists(path):
+        existing = load_fact(country)
+        stale = pd.MultiIndex.from_frame(existing[['market_key', 'price_date']]).isin(
+            pd.MultiIndex.from_frame(fact[['market_key', 'price_date']]))
+        fact = pd.concat([existing[~stale], fact], ignore_index=True).sort_values(
+            ['market_key', 'price_date'], ignore_index=True)
+
+    series_dim.to_csv(SERIES_DIM_FILE, index=False)
+    market_dim.to_csv(MARKET_DIM_FILE, index=False)
+    fact.to_csv(path, index=False)
+    return path
+
+def upsert_star(df_clean_new, country):
+    """Merge newly ingested cleaned rows into the country's star tables, if it has them"""
+    if not os.path.exists(fact_path(country)):
+        return None
+    return save_star(df_clean_new, country, replace=False)
+
+def load_fact(country, columns=None, years=None):
+    """Load one country's fact table, optionally only some measures and years"""
+
+    wanted = None if columns is None else set(columns) | {'market_key', 'price_date'}
+    fact = pd.read_csv(fact_path(country), usecols=None if wanted is None else lambda c: c in wanted,
+                       parse_dates=['price_date'])
+    if years is not None:
+        fact = fact[fact['price_date'].dt.year.isin(list(years))].reset_index(drop=True)
+    return fact
+
+def market_attributes(market_dim, keys, columns=None):
+    """Market (and its series) attributes for an array of market keys
+
+    Keys are numbered densely from 0 and the dimension is kept in key order,
+    so a key is its row position and each lookup is O(1) without a join.
+    """
+
+    rows = market_dim.iloc[np.asarray(keys)].reset_index(drop=True)
+    return rows if columns is None else rows[[c for c in columns if c in rows.columns]]
+
+def join_wide(fact, series_dim, market_dim, columns=None):
+    """Rebuild the wide cleaned layout (or just `columns` of it) from fact and dimension rows
+
+    Only the dimension columns that are asked for are joined.
+    """
+
+    def wanted(cols):
+        return [c for c in cols if columns is None or c in columns]
+
+    keys = fact['market_key'].to_numpy()
+    series_keys = market_dim['series_key'].to_numpy()[keys]
+    market_cols = wanted([c for c in market_dim.columns if c not in ('market_key', 'series_key', 'ISO3')])
+    series_cols = wanted([c for c in series_dim.columns if c != 'series_key'])
+
+    dates = fact['price_date']
+    # Few distinct months, so format each once
+    codes, months = pd.factorize(dates)
+    wide = pd.concat([
+        series_dim[series_cols].iloc[series_keys].reset_index(drop=True),
+        market_attributes(market_dim, keys, market_cols),
+        pd.DataFrame({'price_date': dates, 'year': dates.dt.year, 'month': dates.dt.month}),
+        fact.drop(columns=['market_key', 'price_date']).reset_index(drop=True),
+        pd.DataFrame({'year_month': months.strftime('%Y-%m').to_numpy()[codes]}),
+    ], axis=1)
+
+    if columns is not None:
+        return wide.reindex(columns=list(columns))
+    measures = [c for c in fact.columns if c not in ('market_key', 'price_date')]
+    return wide[[c for c in WIDE_PREFIX if c in wide.columns] + measures + ['year_month']]
+
+def load_wide(country, columns=None, years=None):
+    """Load one country from the star tables in the cleaned (wide) layout"""
+
+    series_dim, market_dim = load_dimensions()
+    if market_dim is None or not os.path.exists(fact_path(country)):
+        raise FileNotFoundError(f"No star tables for {country}; run star_schema.py first")
+    fact = load_fact(country, columns=columns, years=years)
+    return join_wide(fact, series_dim, market_dim, columns)
+
+def build_star(countries=None):
+    """Split every cleaned CSV into star tables"""
+
+    if countries is None:
+        countries = list(COUNTRY_REGISTRY)
+    written = []
+    for country in countries:
+        if not os.path.exists(get_processed_path(country)):
+            print(f" Skipping {country}: no cleaned csv data found")
+            continue
+        save_star(pd.read_csv(get_processed_path(country), parse_dates=['price_date']), country)
+        written.append(country)
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split cleaned data into dimension and fact tables")
+    parser.add_argument('countries', nargs='*', help="Default: every country in the registry")
+    args = parser.parse_args()
+
+    countries = build_star(args.countries or None)
+    series_dim, market_dim = load_dimensions()
+    print(f"Star tables in {STAR_DIR}: {len(series_dim)} series, {len(market_dim)} markets")
+
+    print(f"\n STAR VS WIDE STORAGE")
+    print("=" * 40)
+    for country in countries:
+        wide_size = os.path.getsize(get_processed_path(country))
+        star_size = os.path.getsize(fact_path(country))
+
+        start = time.perf_counter()
+        pd.read_csv(get_processed_path(country), parse_dates=['price_date'])
+        wide_time = time.perf_counter() - start
+        start = time.perf_counter()
+        load_wide(country)
+        star_time = time.perf_counter() - start
+
+        print(f"• {country}: fact {star_size / 1e6:.1f}MB vs wide {wide_size / 1e6:.1f}MB "
+              f"({1 - star_size / wide_size:.0%} smaller), full load {star_time:.3f}s vs {wide_time:.3f}s")
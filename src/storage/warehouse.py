@@ -0,0 +1,482 @@
+import os
+import sys
+import time
+import hashlib
+import sqlite3
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multi_country.country_registry import (COUNTRY_REGISTRY, PROCESSED_DIR, get_country_info, get_country_name,
+                                            get_processed_path)
+from storage.cache import file_digest
+from processing.rtfp_cleaner import commodity_columns
+
+WAREHOUSE_FILE = os.environ.get('PRICEPULSE_WAREHOUSE', os.path.join(PROCESSED_DIR, 'pricepulse.db'))
+
+# Per-item value families of a cleaned frame, stored next to the observed price
+ITEM_FIELDS = ['o', 'h', 'l', 'c', 'inflation', 'trust']
+PRICE_COLUMNS = ['price', 'open', 'high', 'low', 'close', 'inflation', 'trust']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS countries (
+    country_code TEXT PRIMARY KEY,
+    country TEXT NOT NULL,
+    region TEXT,
+    sub_region TEXT,
+    currency TEXT,
+    population_millions REAL
+);
+
+CREATE TABLE IF NOT EXISTS markets (
+    country_code TEXT NOT NULL,
+    mkt_name TEXT NOT NULL,
+    adm1_name TEXT,
+    adm2_name TEXT,
+    lat REAL,
+    lon REAL,
+    PRIMARY KEY (country_code, mkt_name)
+) WITHOUT ROWID;
+
+-- One row per country, commodity, market and month; the primary key is
+-- the clustered index point and range lookups walk
+CREATE TABLE IF NOT EXISTS prices (
+    country_code TEXT NOT NULL,
+    commodity TEXT NOT NULL,
+    mkt_name TEXT NOT NULL,
+    price_date TEXT NOT NULL,
+    price REAL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    inflation REAL,
+    trust REAL,
+    PRIMARY KEY (country_code, commodity, mkt_name, price_date)
+) WITHOUT ROWID;
+
+-- Cross-market and cross-country slices by date
+CREATE INDEX IF NOT EXISTS prices_by_country_date ON prices (country_code, commodity, price_date);
+CREATE INDEX IF NOT EXISTS prices_by_commodity_date ON prices (commodity, price_date);
+
+-- Materialized rollups, refreshed for the keys each sync touches
+CREATE TABLE IF NOT EXISTS monthly_prices (
+    country_code TEXT NOT NULL,
+    commodity TEXT NOT NULL,
+    month TEXT NOT NULL,
+    markets INTEGER NOT NULL,
+    observations INTEGER NOT NULL,
+    mean_price REAL,
+    min_price REAL,
+    max_price REAL,
+    PRIMARY KEY (country_code, commodity, month)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS monthly_by_commodity ON monthly_prices (commodity, month);
+
+CREATE TABLE IF NOT EXISTS market_summary (
+    country_code TEXT NOT NULL,
+    commodity TEXT NOT NULL,
+    mkt_name TEXT NOT NULL,
+    observations INTEGER NOT NULL,
+    mean_price REAL,
+    min_price REAL,
+    max_price REAL,
+    first_date TEXT,
+    last_date TEXT,
+    PRIMARY KEY (country_code, commodity, mkt_name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    country_code TEXT PRIMARY KEY,
+    source_digest TEXT NOT NULL,
+    last_date TEXT,
+    synced_at TEXT NOT NULL
+);
+
+-- Digest of each synced month's rows, so a changed source rewrites only
+-- the months that differ
+CREATE TABLE IF NOT EXISTS sync_months (
+    country_code TEXT NOT NULL,
+    month TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (country_code, month)
+) WITHOUT ROWID;
+
+-- The unified dataset's shape: observed prices with market and country metadata
+CREATE VIEW IF NOT EXISTS unified_prices AS
+SELECT p.country_code, c.country, c.region, c.sub_region, c.currency, p.mkt_name,
+       m.adm1_name, m.adm2_name, m.lat, m.lon, p.commodity, p.price_date, p.price
+FROM prices p
+JOIN countries c USING (country_code)
+LEFT JOIN markets m USING (country_code, mkt_name)
+WHERE p.price IS NOT NULL;
+"""
+
+def connect(path=WAREHOUSE_FILE):
+    """Open (and if needed create) the warehouse"""
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+def _month_start(month):
+    """'YYYY-MM' (or a date) -> 'YYYY-MM-01'"""
+    return pd.Timestamp(month).strftime('%Y-%m-01')
+
+def _month_end(month):
+    """First day after the month, for half-open date ranges"""
+    return (pd.Timestamp(month) + pd.offsets.MonthBegin(1)).strftime('%Y-%m-%d')
+
+def price_rows(df_clean, country):
+    """Long rows (one per commodity, market and month) from a cleaned country frame"""
+
+    iso3 = get_country_info(country)['iso3']
+    # Every commodity the cleaned file carries, not only the registry's list
+    commodities = commodity_columns(df_clean.columns)
+    dates = pd.to_datetime(df_clean['price_date']).dt.strftime('%Y-%m-%d')
+
+    parts = []
+    for commodity in commodities:
+        part = pd.DataFrame({
+            'country_code': iso3,
+            'commodity': commodity,
+            'mkt_name': df_clean['mkt_name'],
+            'price_date': dates,
+            'price': df_clean[commodity],
+        })
+        for field, column in zip(ITEM_FIELDS, PRICE_COLUMNS[1:]):
+            source = f"{field}_{commodity}"
+            part[column] = df_clean[source] if source in df_clean.columns else float('nan')
+        parts.append(part[part[PRICE_COLUMNS].notna().any(axis=1)])
+
+    if not parts:
+        return pd.DataFrame(columns=['country_code', 'commodity', 'mkt_name', 'price_date'] + PRICE_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+def _records(df):
+    """Rows as tuples with NaN turned into NULL"""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+def _upsert_metadata(conn, df_clean, country):
+    """Upsert a country's registry entry and its markets"""
+
+    info = get_country_info(country)
+    iso3 = info['iso3']
+    name = country if country in COUNTRY_REGISTRY else get_country_name(iso3)
+    currency = df_clean['currency'].dropna().iloc[0] if 'currency' in df_clean and len(df_clean) else None
+
+    conn.execute(
+        "INSERT INTO countries VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (country_code) DO UPDATE SET "
+        "country = excluded.country, region = excluded.region, sub_region = excluded.sub_region, "
+        "currency = COALESCE(excluded.currency, countries.currency), "
+        "population_millions = excluded.population_millions",
+        (iso3, name, info['region'], info['sub_region'], currency, info['population_millions']))
+
+    market_cols = ['mkt_name', 'adm1_name', 'adm2_name', 'lat', 'lon']
+    markets = df_clean.reindex(columns=market_cols).drop_duplicates('mkt_name', keep='last')
+    conn.executemany(
+        "INSERT INTO markets VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (country_code, mkt_name) DO UPDATE SET "
+        "adm1_name = excluded.adm1_name, adm2_name = excluded.adm2_name, lat = excluded.lat, lon = excluded.lon",
+        [(iso3,) + row for row in _records(markets)])
+    return iso3
+
+def upsert_country(conn, df_clean, country):
+    """Upsert one country's cleaned rows and refresh the rollups they touch; returns rows written"""
+
+    iso3 = _upsert_metadata(conn, df_clean, country)
+    rows = price_rows(df_clean, country)
+    updates = ', '.join(f"{col} = excluded.{col}" for col in PRICE_COLUMNS)
+    conn.executemany(
+        f"INSERT INTO prices VALUES ({', '.join('?' * (4 + len(PRICE_COLUMNS)))}) "
+        f"ON CONFLICT (country_code, commodity, mkt_name, price_date) DO UPDATE SET {updates}",
+        _records(rows))
+
+    if len(rows):
+        refresh_rollups(conn, iso3, rows['commodity'].unique(), rows['price_date'].min())
+    return len(rows)
+
+def month_digests(rows):
+    """{'YYYY-MM': digest} of long price rows, independent of row order"""
+
+    rows = rows.sort_values(['commodity', 'mkt_name', 'price_date'])
+    months = rows['price_date'].str[:7]
+    return {month: hashlib.sha256(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes()).hexdigest()
+            for month, part in rows.groupby(months, sort=True)}
+
+def replace_months(conn, df_clean, country, full=False):
+    """Make a country's stored rows match its cleaned frame, rewriting only the months that changed
+
+    A month is rewritten when its rows' digest differs from the one stored
+    at the last sync, including months that are new or gone from the
+    source; full rewrites every month. Markets no longer in the source are
+    dropped. Returns the number of rows written.
+    """
+
+    iso3 = _upsert_metadata(conn, df_clean, country)
+    rows = price_rows(df_clean, country)
+    digests = month_digests(rows)
+    stored = dict(conn.execute("SELECT month, digest FROM sync_months WHERE country_code = ?", (iso3,)))
+    changed = sorted(m for m in digests.keys() | stored.keys() if full or digests.get(m) != stored.get(m))
+
+    markets = df_clean['mkt_name'].dropna().unique().tolist()
+    conn.execute(f"DELETE FROM markets WHERE country_code = ? AND mkt_name NOT IN ({', '.join('?' * len(markets))})",
+                 [iso3] + markets)
+    if not changed:
+        return 0
+
+    # Commodities in the changed months before and after, for the rollups
+    ranges = [(iso3, _month_start(m), _month_end(m)) for m in changed]
+    touched = set()
+    for params in ranges:
+        touched.update(c for (c,) in conn.execute(
+            "SELECT DISTINCT commodity FROM prices WHERE country_code = ? AND price_date >= ? AND price_date < ?",
+            params))
+    conn.executemany("DELETE FROM prices WHERE country_code = ? AND price_date >= ? AND price_date < ?", ranges)
+
+    rows = rows[rows['price_date'].str[:7].isin(changed)]
+    conn.executemany(f"INSERT INTO prices VALUES ({', '.join('?' * (4 + len(PRICE_COLUMNS)))})", _records(rows))
+    touched.update(rows['commodity'].unique())
+    refresh_rollups(conn, iso3, sorted(touched), changed[0])
+
+    conn.executemany("DELETE FROM sync_months WHERE country_code = ? AND month = ?",
+                     [(iso3, m) for m in changed if m not in digests])
+    conn.executemany(
+        "INSERT INTO sync_months VALUES (?, ?, ?) ON CONFLICT (country_code, month) DO UPDATE SET "
+        "digest = excluded.digest",
+        [(iso3, m, digests[m]) for m in changed if m in digests])
+    return len(rows)
+
+def refresh_rollups(conn, iso3, commodities, since):
+    """Recompute the rollups of a country's commodities from the month of `since` on"""
+
+    month = since[:7]
+    for commodity in commodities:
+        conn.execute("DELETE FROM monthly_prices WHERE country_code = ? AND commodity = ? AND month >= ?",
+                     (iso3, commodity, month))
+        conn.execute(
+            "INSERT INTO monthly_prices "
+            "SELECT country_code, commodity, substr(price_date, 1, 7), COUNT(DISTINCT mkt_name), COUNT(price), "
+            "AVG(price), MIN(price), MAX(price) FROM prices "
+            "WHERE country_code = ? AND commodity = ? AND price_date >= ? AND price IS NOT NULL "
+            "GROUP BY country_code, commodity, substr(price_date, 1, 7)",
+            (iso3, commodity, _month_start(month)))
+
+        # Per-market totals span every month, so they are rebuilt whole
+        conn.execute("DELETE FROM market_summary WHERE country_code = ? AND commodity = ?", (iso3, commodity))
+        conn.execute(
+            "INSERT INTO market_summary "
+            "SELECT country_code, commodity, mkt_name, COUNT(price), AVG(price), MIN(price), MAX(price), "
+            "MIN(price_date), MAX(price_date) FROM prices "
+            "WHERE country_code = ? AND commodity = ? AND price IS NOT NULL "
+            "GROUP BY country_code, commodity, mkt_name",
+            (iso3, commodity))
+
+def sync_warehouse(countries=None, path=WAREHOUSE_FILE, full=False):
+    """Load changed cleaned countries into the warehouse
+
+    A country whose cleaned CSV is unchanged since its last sync is
+    skipped. Otherwise its months are compared with the last sync's and
+    only the ones that changed are rewritten (see replace_months), so
+    revisions to old months and deleted rows are picked up; full rewrites
+    everything. Each country is one transaction. Returns {country: rows
+    written}.
+    """
+
+    if countries is None:
+        countries = list(COUNTRY_REGISTRY)
+
+    conn = connect(path)
+    synced = {}
+    try:
+        state = dict(conn.execute("SELECT country_code, source_digest FROM sync_state"))
+        for country in countries:
+            source = get_processed_path(country)
+            if not os.path.exists(source):
+                print(f" Skipping {country}: no cleaned csv data found")
+                continue
+
+            iso3 = get_country_info(country)['iso3']
+            digest = file_digest(source)
+            if digest == state.get(iso3) and not full:
+                continue
+
+            df_clean = pd.read_csv(source, parse_dates=['price_date'])
+            with conn:
+                synced[country] = replace_months(conn, df_clean, country, full=full)
+                latest = df_clean['price_date'].max()
+                conn.execute(
+                    "INSERT INTO sync_state VALUES (?, ?, ?, ?) ON CONFLICT (country_code) DO UPDATE SET "
+                    "source_digest = excluded.source_digest, last_date = excluded.last_date, "
+                    "synced_at = excluded.synced_at",
+                    (iso3, digest, latest.strftime('%Y-%m-%d') if pd.notna(latest) else None,
+                     datetime.now().isoformat(timespec='seconds')))
+        conn.execute('PRAGMA optimize')
+    finally:
+        conn.close()
+    return synced
+
+def upsert_saved_warehouse(df_clean_new, country, path=WAREHOUSE_FILE):
+    """Upsert newly ingested cleaned rows into the warehouse, if there is one"""
+
+    if not os.path.exists(path):
+        return None
+    conn = connect(path)
+    try:
+        with conn:
+            return upsert_country(conn, df_clean_new, country)
+    finally:
+        conn.close()
+
+class Warehouse:
+    """Read-side query API over the warehouse; every method returns a DataFrame
+
+    Countries may be given as names or ISO3 codes and months as 'YYYY-MM'.
+    Queries run inside SQLite, so only the rows asked for reach Python.
+    """
+
+    def __init__(self, path=WAREHOUSE_FILE):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No warehouse at {path}; run storage/warehouse.py sync first")
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def query(self, sql, params=(), parse_dates=None):
+        """Run any read-only SQL"""
+        return pd.read_sql_query(sql, self.conn, params=params, parse_dates=parse_dates)
+
+    def price(self, country, commodity, market, month):
+        """One market's observed price for a month (an empty frame if there is none)"""
+        return self.query(
+            "SELECT * FROM prices WHERE country_code = ? AND commodity = ? AND mkt_name = ? AND price_date = ?",
+            (get_country_info(country)['iso3'], commodity, market, _month_start(month)),
+            parse_dates=['price_date'])
+
+    def series(self, country, commodity, market=None, start=None, end=None):
+        """Monthly rows for a commodity in one country (optionally one market), oldest first"""
+
+        sql = "SELECT * FROM prices WHERE country_code = ? AND commodity = ?"
+        params = [get_country_info(country)['iso3'], commodity]
+        if market is not None:
+            sql += " AND mkt_name = ?"
+            params.append(market)
+        if start is not None:
+            sql += " AND price_date >= ?"
+            params.append(_month_start(start))
+        if end is not None:
+            sql += " AND price_date < ?"
+            params.append(_month_end(end))
+        return self.query(sql + " ORDER BY mkt_name, price_date", params, parse_dates=['price_date'])
+
+    def monthly(self, commodity=None, country=None, start=None, end=None):
+        """The monthly_prices rollup, filtered"""
+
+        clauses, params = [], []
+        if commodity is not None:
+            clauses.append("commodity = ?")
+            params.append(commodity)
+        if country is not None:
+            clauses.append("country_code = ?")
+            params.append(get_country_info(country)['iso3'])
+        if start is not None:
+            clauses.append("month >= ?")
+            params.append(pd.Timestamp(start).strftime('%Y-%m'))
+        if end is not None:
+            clauses.append("month <= ?")
+            params.append(pd.Timestamp(end).strftime('%Y-%m'))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.query(f"SELECT * FROM monthly_prices{where} ORDER BY country_code, commodity, month", params)
+
+    def compare(self, commodity, month):
+        """Every country's mean price for a commodity in one month"""
+        return self.query(
+            "SELECT m.country_code, c.country, c.currency, m.markets, m.mean_price, m.min_price, m.max_price "
+            "FROM monthly_prices m JOIN countries c USING (country_code) "
+            "WHERE m.commodity = ? AND m.month = ? ORDER BY m.country_code",
+            (commodity, pd.Timestamp(month).strftime('%Y-%m')))
+
+    def market_summary(self, country, commodity=None):
+        """Per-market totals for a country from the market_summary rollup"""
+
+        sql = "SELECT * FROM market_summary WHERE country_code = ?"
+        params = [get_country_info(country)['iso3']]
+        if commodity is not None:
+            sql += " AND commodity = ?"
+            params.append(commodity)
+        return self.query(sql + " ORDER BY commodity, mkt_name", params)
+
+    def markets(self, country):
+        """A country's markets with their location"""
+        return self.query("SELECT * FROM markets WHERE country_code = ? ORDER BY mkt_name",
+                          (get_country_info(country)['iso3'],))
+
+def time_queries(warehouse, repeat=200):
+    """Median milliseconds of a point, range and rollup query on the first stored series"""
+
+    first = warehouse.query("SELECT country_code, commodity, mkt_name, price_date FROM prices LIMIT 1")
+    if len(first) == 0:
+        return {}
+    iso3, commodity, market, date = first.iloc[0]
+    year = date[:4]
+    queries = {
+        'point': lambda: warehouse.price(iso3, commodity, market, date[:7]),
+        'market range': lambda: warehouse.series(iso3, commodity, market, f"{year}-01", f"{year}-12"),
+        'country range': lambda: warehouse.series(iso3, commodity, start=f"{year}-01", end=f"{year}-12"),
+        'compare': lambda: warehouse.compare(commodity, date[:7]),
+    }
+    timings = {}
+    for name, run in queries.items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[name] = sorted(samples)[len(samples) // 2]
+    return timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedded SQLite warehouse of the cleaned price data")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sync = sub.add_parser('sync', help="Load changed cleaned countries into the warehouse")
+    sync.add_argument('countries', nargs='*', help="Default: every country in the registry")
+    sync.add_argument('--full', action='store_true', help="Rewrite every month, not just the changed ones")
+
+    query = sub.add_parser('query', help="Run SQL against the warehouse and print the result")
+    query.add_argument('sql')
+
+    sub.add_parser('bench', help="Time point, range and rollup queries")
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        start = time.perf_counter()
+        synced = sync_warehouse(args.countries or None, full=args.full)
+        print(f"\n WAREHOUSE SYNC ({WAREHOUSE_FILE})")
+        print("=" * 40)
+        for country, rows in synced.items():
+            print(f"• {country}: {rows:,} rows written")
+        if not synced:
+            print("• Everything up to date")
+        print(f"Done in {time.perf_counter() - start:.2f}s")
+    elif args.command == 'query':
+        with Warehouse() as warehouse:
+            print(warehouse.query(args.sql).to_string(index=False))
+    else:
+        with Warehouse() as warehouse:
+            print(f"\n WAREHOUSE QUERY LATENCY (median)")
+            print("=" * 40)
+            for name, ms in time_queries(warehouse).items():
+                print(f"• {name}: {ms:.2f}ms")